@@ -0,0 +1,161 @@
+"""
+Benchmarks of the compression codecs on the recorded fixtures (src.compression).
+
+Every payload kind which is stored (the Polygon financials, a single filing, the news,
+the details, the price frame and a pickled ticker of the shared cache) is compressed with
+every installed codec and level, with and without the financials dictionary. The ratio,
+the compression time and the decode time are reported. The dictionary is trained on the
+GOOGL and JNJ fixtures and the payloads are taken from MSFT, so it's measured on unseen data.
+
+The codecs which aren't installed (zstandard, lz4) are reported as unavailable.
+
+Usage (from the repository root):
+
+    python benchmarks/compression.py                  # print the results
+    python benchmarks/compression.py --save           # and update benchmarks/results/compression.json
+    python benchmarks/compression.py --check          # exit with 1 on decode regressions against the saved results
+    python benchmarks/compression.py -k financials    # run only the matching cases
+
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+from typing import Any, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.harness import ROOT_DIR, RESULTS_DIR, compare, environment, load_results, save_results, time_call
+
+
+RESULT_FILE = os.path.join(RESULTS_DIR, 'compression.json')
+
+TRAINING_TICKERS = ['GOOGL', 'JNJ']
+TICKER = 'MSFT'
+
+# (name, codec, level, with the dictionary)
+SETTINGS = [
+    ('zlib-1', 'zlib', 1, False),
+    ('zlib-6', 'zlib', 6, False),
+    ('zlib-9', 'zlib', 9, False),
+    ('zlib-6-dict', 'zlib', 6, True),
+    ('zstd-3', 'zstd', 3, False),
+    ('zstd-3-dict', 'zstd', 3, True),
+    ('zstd-19', 'zstd', 19, False),
+    ('lz4', 'lz4', 0, False),
+]
+
+
+def _compact(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+def _payloads() -> dict[str, bytes]:
+    """
+    The stored payloads of the benchmark ticker, in the form they are compressed.
+    """
+
+    from src.tests.test_data_processor import init_data_local
+
+    data = init_data_local(TICKER)
+    filings = sorted(data.financials, key=lambda filing: len(_compact(filing)))
+
+    return {
+        'financials': _compact(data.financials),
+        'financials.filing': _compact(filings[len(filings) // 2]),
+        'news': _compact(data.news),
+        'details': _compact(data.details),
+        'price_hist': _compact(data.price_hist.reset_index().to_json(orient='records')),
+        'bundle.pickle': pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL),
+    }
+
+
+def _dictionary() -> bytes:
+
+    from src.compression import train_dictionary
+    from src.tests.test_data_processor import init_data_local
+
+    return train_dictionary(_compact(init_data_local(ticker).financials) for ticker in TRAINING_TICKERS)
+
+
+def run(rounds: int = 5, min_time: float = 0.05, pattern: Optional[str] = None) -> dict[str, dict]:
+    """
+    Run every case (or the ones whose name contains the pattern). The per-call minimum
+    of a case (min_us) is its decode time, it's used for the regression check.
+    """
+
+    from src.compression import CODECS, compress, decompress
+
+    # The fixtures are read with paths relative to the repository root
+    os.chdir(ROOT_DIR)
+
+    payloads = _payloads()
+    dictionary = _dictionary()
+
+    results: dict[str, dict] = {}
+    for payload_name, payload in payloads.items():
+        for setting, codec, level, with_dictionary in SETTINGS:
+            name = f'{payload_name}.{setting}'
+            if pattern is not None and pattern not in name:
+                continue
+            if not CODECS[codec].available():
+                results[name] = {'error': 'unavailable'}
+                continue
+
+            used = dictionary if with_dictionary else None
+            frame = compress(payload, codec=codec, level=level, dictionary=used)
+            encode = time_call(lambda: compress(payload, codec=codec, level=level, dictionary=used), rounds, min_time)
+            decode = time_call(lambda: decompress(frame), rounds, min_time)
+
+            results[name] = {
+                'raw_bytes': len(payload),
+                'bytes': len(frame),
+                'ratio': round(len(payload) / len(frame), 2),
+                'compress_us': encode['min_us'],
+                'min_us': decode['min_us'],
+                'median_us': decode['median_us'],
+                'calls': decode['calls'],
+            }
+    return results
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the compression codecs on the recorded fixtures.")
+    parser.add_argument('-k', dest='pattern', default=None, help="Run only the cases containing this string.")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05, help="Minimum seconds per round.")
+    parser.add_argument('--save', action='store_true', help="Save the results to the results folder.")
+    parser.add_argument('--check', action='store_true', help="Exit with 1 on regressions against the saved results.")
+    parser.add_argument('--baseline', default=RESULT_FILE, help="Results file to compare with.")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%).")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    results = run(args.rounds, args.min_time, args.pattern)
+
+    print(f"{'case':<36}{'ratio':>8}{'bytes':>10}{'compress':>14}{'decode':>14}")
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:<36}{result['error']:>24}")
+        else:
+            print(
+                f"{name:<36}{result['ratio']:>8.2f}{result['bytes']:>10}"
+                f"{result['compress_us']:>11.1f} us{result['min_us']:>11.1f} us"
+            )
+
+    regressions = compare(results, baseline['results'], args.threshold) if baseline else []
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+
+    if args.save:
+        save_results(RESULT_FILE, {**environment(), 'results': results})
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
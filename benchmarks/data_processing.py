@@ -0,0 +1,206 @@
+"""
+Benchmarks of the data processing hot paths on the recorded fixtures.
+
+The DataProcessor methods and the figure builders of src.components are timed on the
+src/tests/test_resources/{GOOGL,MSFT,JNJ} fixtures, so the results are repeatable and
+don't depend on the APIs. The cases which raise an error on a fixture (e.g. the
+incorrect financial data of JNJ) are recorded with the error instead of a time.
+
+Usage (from the repository root):
+
+    python benchmarks/data_processing.py                  # print the results
+    python benchmarks/data_processing.py --save           # and update benchmarks/results/data_processing.json
+    python benchmarks/data_processing.py --check          # exit with 1 on regressions against the saved results
+    python benchmarks/data_processing.py -k get_ttm       # run only the matching cases
+
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.harness import ROOT_DIR, RESULTS_DIR, compare, environment, load_results, save_results, time_call
+
+
+RESULT_FILE = os.path.join(RESULTS_DIR, 'data_processing.json')
+
+TICKERS = ['GOOGL', 'MSFT', 'JNJ']
+
+SNAPSHOT_GETTERS = [
+    'get_name',
+    'get_market_cap',
+    'get_sic_desc',
+    'get_curr_prev_price',
+    'get_eps',
+    'get_pe',
+    'get_52week_low',
+    'get_52week_high',
+    'get_next_report_date',
+    'get_profit_margin',
+    'get_yearly_price_change',
+    'get_div_yield',
+    'get_roe',
+]
+
+CHART_START = datetime(2020, 1, 1, 9, 30)
+CHART_END = datetime(2023, 10, 15, 9, 30)
+
+
+def _cases(ticker: str) -> dict[str, tuple[Callable[[], Any], Optional[Callable[[], Any]]]]:
+    """
+    Build the (function, setup) pairs of a ticker.
+    """
+
+    import src.components as components
+    from src.data_processor import DataProcessor
+    from src.figure_cache import CachedFigure
+    from src.polygon_api import PolygonAPI
+    from src.daily_price_api import PriceAPI
+    from src.tests.test_data_processor import init_data_local
+
+    data = init_data_local(ticker)
+
+    fin_api = PolygonAPI(ticker)
+    fin_api.details, fin_api.financials, fin_api.news = data.details, data.financials, data.news
+    price_api = PriceAPI(ticker)
+    price_api.price_hist = data.price_hist
+    price_api.dividend_hist = data.dividend_hist
+    price_api.earning_dates = data.earning_dates
+
+    def clear_derived_cache() -> None:
+        data._derived_cache.clear()
+
+    def prepared(func: Callable[[], Any]) -> Callable[[], Any]:
+        """
+        Compute the input of a figure once, so only the figure construction is timed.
+        If the input can't be computed, the error is raised when the case runs.
+        """
+        try:
+            value = func()
+        except Exception as error:
+            def raise_error(error=error):
+                raise error
+            return raise_error
+        return lambda: value
+
+    revenues = prepared(lambda: data.calculate_quarterly_data('income_statement','revenues'))
+    margin = prepared(data.get_ttm_profit_margin)
+    valuation = prepared(data.get_valuation_history)
+    overlays = data.get_indicators(['SMA 50', 'Bollinger bands', 'RSI 14'])
+    candlestick_spec = components._candlestick_chart(data.price_hist, overlays).to_json()
+
+    cases: dict[str, tuple[Callable[[], Any], Optional[Callable[[], Any]]]] = {
+        'load_fixture': (lambda: init_data_local(ticker), None),
+        'construct': (lambda: DataProcessor(fin_api=fin_api, price_api=price_api), None),
+        'calculate_quarterly_data': (lambda: data.calculate_quarterly_data('income_statement','revenues'), None),
+        'get_ttm_data': (lambda: data.get_ttm_data('income_statement','revenues'), None),
+        'get_ttm_profit_margin': (data.get_ttm_profit_margin, None),
+        'get_valuation_history': (data.get_valuation_history, clear_derived_cache),
+        'get_news_html': (data.get_news_html, None),
+    }
+
+    for getter in SNAPSHOT_GETTERS:
+        cases[f'snapshot.{getter}'] = (getattr(data, getter), None)
+
+    cases.update({
+        'figure.quarterly_barplot': (lambda: components._quartely_barplot(revenues()), None),
+        'figure.yearly_lineplot': (lambda: components._yearly_lineplot(revenues()), None),
+        'figure.quarterly_lineplot': (lambda: components._quarterly_lineplot(margin()), None),
+        'figure.valuation_lineplot': (lambda: components._valuation_lineplot(valuation(), 'pe'), None),
+        'figure.candlestick_chart': (lambda: components._candlestick_chart(data.price_hist), None),
+        'figure.candlestick_chart_overlays': (
+            lambda: components._candlestick_chart(data.price_hist, overlays),
+            None
+        ),
+        # A move of the period slider: the cached chart is zoomed to the new period
+        'figure.candlestick_period': (
+            lambda: components._show_period(
+                CachedFigure(candlestick_spec), data.price_hist, CHART_START, CHART_END, overlays
+            ).to_dict(),
+            None
+        ),
+    })
+
+    return cases
+
+
+def _comparison_cases() -> dict[str, tuple[Callable[[], Any], Optional[Callable[[], Any]]]]:
+    """
+    Build the cases of the multi-ticker comparison.
+    """
+
+    import src.components as components
+    from src.comparison import ComparisonMatrix
+    from src.tests.test_data_processor import init_data_local
+
+    datas = [init_data_local(ticker) for ticker in TICKERS]
+    price = ComparisonMatrix().aligned('price', datas)
+
+    return {
+        'comparison.aligned_cold': (lambda: ComparisonMatrix().aligned('revenue', datas), None),
+        'figure.comparison_lineplot': (lambda: components._comparison_lineplot(price), None),
+    }
+
+
+def run(rounds: int = 5, min_time: float = 0.05, pattern: Optional[str] = None) -> dict[str, dict]:
+    """
+    Run every case (or the ones whose name contains the pattern).
+    """
+
+    # The fixtures are read with paths relative to the repository root
+    os.chdir(ROOT_DIR)
+
+    all_cases = {}
+    for ticker in TICKERS:
+        all_cases.update({f'{ticker}.{name}': case for name, case in _cases(ticker).items()})
+    all_cases.update(_comparison_cases())
+
+    results: dict[str, dict] = {}
+    for name, (func, setup) in all_cases.items():
+        if pattern is not None and pattern not in name:
+            continue
+        try:
+            results[name] = time_call(func, rounds=rounds, min_time=min_time, setup=setup)
+        except Exception as error:
+            results[name] = {'error': type(error).__name__}
+    return results
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the data processing on the recorded fixtures.")
+    parser.add_argument('-k', dest='pattern', default=None, help="Run only the cases containing this string.")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05, help="Minimum seconds per round.")
+    parser.add_argument('--save', action='store_true', help="Save the results to the results folder.")
+    parser.add_argument('--check', action='store_true', help="Exit with 1 on regressions against the saved results.")
+    parser.add_argument('--baseline', default=RESULT_FILE, help="Results file to compare with.")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%).")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    results = run(args.rounds, args.min_time, args.pattern)
+
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:<48}{result['error']:>24}")
+        else:
+            print(f"{name:<48}{result['min_us']:>14.1f} us  (median {result['median_us']:.1f} us)")
+
+    regressions = compare(results, baseline['results'], args.threshold) if baseline else []
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+
+    if args.save:
+        save_results(RESULT_FILE, {**environment(), 'results': results})
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
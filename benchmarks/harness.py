@@ -0,0 +1,129 @@
+"""
+Small timing harness shared by the benchmarks.
+
+Every case is run in several rounds, each round calls the function enough times
+to last at least min_time seconds. The per-call median and minimum are reported,
+the minimum is the least noisy one and it's used for the regression check.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def time_call(
+    func: Callable[[], Any],
+    rounds: int = 5,
+    min_time: float = 0.05,
+    setup: Optional[Callable[[], Any]] = None
+) -> dict[str, Any]:
+    """
+    Time the function. If setup is given, it's called before every call (outside of the timing).
+    Returns the per-call median and minimum in microseconds.
+    """
+
+    # Calibrate the number of calls per round with a single call
+    if setup is not None:
+        setup()
+    start = time.perf_counter()
+    func()
+    single = max(time.perf_counter() - start, 1e-7)
+    number = max(1, int(min_time / single))
+
+    per_call = []
+    for _ in range(rounds):
+        elapsed = 0.0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            elapsed += time.perf_counter() - start
+        per_call.append(elapsed / number)
+
+    return {
+        'median_us': round(statistics.median(per_call) * 1e6, 1),
+        'min_us': round(min(per_call) * 1e6, 1),
+        'calls': number * rounds,
+    }
+
+
+def git_revision() -> Optional[str]:
+    """
+    Return the current commit of the repository, if it's available.
+    """
+
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def environment() -> dict[str, Any]:
+    """
+    Describe the machine and the commit the results belong to.
+    """
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def compare(
+    current: dict[str, dict],
+    baseline: dict[str, dict],
+    threshold: float = 0.25
+) -> list[str]:
+    """
+    Compare the per-call minimums of the cases with a baseline.
+    Returns the cases which got slower than the threshold (0.25 = 25%).
+    """
+
+    regressions = []
+    for name, result in current.items():
+        # The cases which failed (e.g. an uninstalled codec) on either side aren't compared
+        if 'min_us' not in result or 'min_us' not in baseline.get(name, {}):
+            continue
+        before = baseline[name]['min_us']
+        ratio = result['min_us'] / before if before else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {before} us -> {result['min_us']} us ({ratio:.2f}x)")
+    return regressions
+
+
+def load_results(file: str) -> Optional[dict[str, Any]]:
+    """
+    Load the saved results, or None if the file doesn't exist.
+    """
+
+    if not os.path.exists(file):
+        return None
+    with open(file, 'r') as f:
+        return json.load(f)
+
+
+def save_results(file: str, results: dict[str, Any]) -> None:
+
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
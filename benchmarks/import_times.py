@@ -0,0 +1,196 @@
+"""
+Import time report and cold start budget of the dashboard.
+
+Every module is imported in a fresh interpreter with `python -X importtime`, so the
+numbers are the cold (first import) costs. The report contains:
+    - cold_start: importing main.py, i.e. everything loaded before the sidebar is drawn
+    - ticker_view: the modules loaded additionally when a ticker is chosen
+    - modules: the cumulative import time of every project module and heavy library
+
+Usage (from the repository root):
+
+    python benchmarks/import_times.py              # print the report
+    python benchmarks/import_times.py --save       # and update benchmarks/results/import_times.json
+    python benchmarks/import_times.py --check      # exit with 1 if the budget is exceeded
+
+The budget is stored in benchmarks/budget.json.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Any
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), 'budget.json')
+RESULT_FILE = os.path.join(os.path.dirname(__file__), 'results', 'import_times.json')
+
+MODULES = [
+    'streamlit',
+    'pandas',
+    'numpy',
+    'plotly.graph_objects',
+    'yfinance',
+    'requests',
+    'src.json_io',
+    'src.cache',
+    'src.sidebar',
+    'src.polygon_api',
+    'src.daily_price_api',
+    'src.indicators',
+    'src.data_processor',
+    'src.figure_cache',
+    'src.components',
+    'src.warmer',
+    'main',
+]
+
+HEAVY_MODULES = ['pandas', 'numpy', 'yfinance', 'requests', 'src.components', 'src.data_processor']
+
+TICKER_VIEW_IMPORTS = 'import main, src.data_processor, src.components'
+
+
+def _run_importtime(statement: str) -> tuple[float, list[str]]:
+    """
+    Run the import statement in a fresh interpreter.
+    Returns the summed cumulative time of the imported modules (ms) and the heavy modules loaded.
+    """
+
+    # The modules of the statement and their parent packages (e.g. src for src.cache).
+    # The interpreter's own startup imports (site, encodings) are left out.
+    targets = set()
+    for module in statement.replace('import ', '').split(','):
+        parts = module.strip().split('.')
+        targets.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+
+    code = (
+        f"{statement}\n"
+        "import sys, json\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # The imports of the statement are the top level (not indented) lines
+        if not name.startswith('  ') and name.strip() in targets:
+            total_us += int(cumulative)
+
+    return total_us / 1000, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _measure(statement: str, repeat: int) -> dict[str, Any]:
+    """
+    Return the median of the import time of the statement and the heavy modules it loads.
+    """
+
+    times = []
+    loaded: list[str] = []
+    for _ in range(repeat):
+        elapsed, loaded = _run_importtime(statement)
+        times.append(elapsed)
+
+    return {
+        'median_ms': round(statistics.median(times), 1),
+        'min_ms': round(min(times), 1),
+        'heavy_modules_loaded': loaded,
+    }
+
+
+def run(repeat: int = 3) -> dict[str, Any]:
+    """
+    Measure the cold start, the ticker view and every module of MODULES.
+    """
+
+    cold_start = _measure('import main', repeat)
+    ticker_view = _measure(TICKER_VIEW_IMPORTS, repeat)
+    ticker_view['extra_ms'] = round(ticker_view['median_ms'] - cold_start['median_ms'], 1)
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'cold_start': cold_start,
+        'ticker_view': ticker_view,
+        'modules': {
+            module: _measure(f'import {module}', repeat)['median_ms'] for module in MODULES
+        },
+    }
+
+
+def check_budget(report: dict[str, Any], budget: dict[str, Any]) -> list[str]:
+    """
+    Compare the report with the budget. Returns the list of violations.
+    """
+
+    violations = []
+    cold_start = report['cold_start']
+
+    if cold_start['median_ms'] > budget['cold_start_ms']:
+        violations.append(
+            f"cold start {cold_start['median_ms']} ms is over the budget of {budget['cold_start_ms']} ms"
+        )
+
+    for module in cold_start['heavy_modules_loaded']:
+        if module in budget['cold_start_forbidden_modules']:
+            violations.append(f"{module} is imported at cold start")
+
+    return violations
+
+
+def _print_report(report: dict[str, Any]) -> None:
+
+    print(f"cold start (import main): {report['cold_start']['median_ms']:>8.1f} ms")
+    print(f"ticker view extra:        {report['ticker_view']['extra_ms']:>8.1f} ms")
+    print()
+    for module, elapsed in sorted(report['modules'].items(), key=lambda item: -item[1]):
+        print(f"{module:<26}{elapsed:>8.1f} ms")
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Import time report of the dashboard.")
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per measurement.")
+    parser.add_argument('--save', action='store_true', help="Save the report to the results folder.")
+    parser.add_argument('--check', action='store_true', help="Exit with 1 if the budget is exceeded.")
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+    _print_report(report)
+
+    with open(BUDGET_FILE, 'r') as file:
+        budget = json.load(file)
+    report['budget'] = budget
+    violations = check_budget(report, budget)
+    report['within_budget'] = not violations
+
+    if args.save:
+        with open(RESULT_FILE, 'w') as file:
+            json.dump(report, file, indent=2)
+            file.write('\n')
+
+    for violation in violations:
+        print(f"BUDGET EXCEEDED: {violation}")
+
+    if args.check and violations:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""
+Concurrent-session load test of the Streamlit app.
+
+N simulated browser sessions drive the real main.py in parallel threads of a single
+process, like the sessions of one Streamlit server. Every session repeats the flow:
+
+    load        open the page (a new session)
+    select      choose a ticker in the sidebar
+    toggle      show the candlestick chart
+    slider      move the period slider of the chart
+    add         add a new ticker with the sidebar form
+    delete      delete the same ticker
+
+The data comes from local stand-ins, not the live APIs: the app runs in the offline
+snapshot mode (src.snapshot) on a temporary snapshot with the recorded fixtures and
+synthetic tickers (src.synthetic_data). The add/delete latencies include the
+success messages' sleeps of the sidebar form (0.7s and 0.5s).
+
+The sessions share the ticker list, like the users of a server do. When a session adds
+or deletes a ticker, the options of the other sessions' ticker selectbox change, which
+resets their selection, so their next step can't find the chart ("... isn't on the page").
+These are reported as errors.
+
+Every session count runs in a fresh worker process after a warm-up session, and
+the render latency percentiles (p50/p95/p99), the throughput, the CPU usage and the
+RSS of the process are reported.
+
+Usage (from the repository root):
+
+    python benchmarks/load_test.py                        # 1, 2, 4 and 8 sessions, 3 iterations each
+    python benchmarks/load_test.py --sessions 1 8 16 --iterations 5
+    python benchmarks/load_test.py --save                 # and update benchmarks/results/load_test.json
+
+The sessions use AppTest (streamlit.testing.v1). AppTest replaces the global Streamlit
+runtime on every run, so the sessions here share a single test runtime instead (see
+_SessionAppTest), which relies on the internals of the pinned Streamlit version.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from typing import Any
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.harness import ROOT_DIR, RESULTS_DIR, environment, save_results
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+    import resource
+
+
+RESULT_FILE = os.path.join(RESULTS_DIR, 'load_test.json')
+
+ACTIONS = ('load', 'select', 'toggle', 'slider', 'add', 'delete')
+
+# The recorded fixtures and the synthetic tickers which can be selected
+FIXTURE_TICKERS = ['MSFT', 'GOOGL']
+SYNTHETIC_TICKERS = 4
+
+
+def _rss_mb() -> float:
+    """
+    The current RSS of the process, or the peak RSS if psutil isn't installed.
+    """
+
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024**2
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024**2 if sys.platform == 'darwin' else maxrss / 1024
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+
+    import numpy as np
+
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50_ms': round(p50 * 1000, 1),
+        'p95_ms': round(p95 * 1000, 1),
+        'p99_ms': round(p99 * 1000, 1),
+        'max_ms': round(max(values) * 1000, 1),
+    }
+
+
+def build_stand_ins(directory: str, sessions: int) -> tuple[str, list[str], list[str]]:
+    """
+    Write the snapshot and the ticker file of the test.
+    Returns the ticker file, the selectable tickers and the tickers to add (one per session).
+    """
+
+    from src.snapshot import write_ticker
+    from src.synthetic_data import generate_ticker, make_data_processor, ticker_symbol
+    from src.tests.test_data_processor import init_data_local
+
+    snapshot_dir = os.path.join(directory, 'snapshot')
+    for ticker in FIXTURE_TICKERS:
+        write_ticker(snapshot_dir, init_data_local(ticker))
+
+    symbols = [ticker_symbol(index) for index in range(SYNTHETIC_TICKERS + sessions)]
+    for index, symbol in enumerate(symbols):
+        synthetic = generate_ticker(symbol, seed=index, years=6, end=date(2023, 10, 20), fiscal_year_end_month=12)
+        write_ticker(snapshot_dir, make_data_processor(synthetic))
+
+    selectable = FIXTURE_TICKERS + symbols[:SYNTHETIC_TICKERS]
+    ticker_file = os.path.join(directory, 'tickers.json')
+    with open(ticker_file, 'w') as file:
+        json.dump(selectable, file)
+
+    return ticker_file, selectable, symbols[SYNTHETIC_TICKERS:]
+
+
+def _session_app_test():
+    """
+    Create the AppTest subclass and install the shared test runtime.
+    """
+
+    from unittest.mock import MagicMock
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+
+    class _SessionAppTest(AppTest):
+
+        """AppTest which runs the script on the shared runtime, so the sessions can run in parallel."""
+
+        def _run(self, widget_state=None, timeout=None):
+            script_runner = LocalScriptRunner(
+                self._script_path,
+                self.session_state,
+                PagesManager(self._script_path, setup_watcher=False),
+                args=self.args,
+                kwargs=self.kwargs,
+            )
+            self._tree = script_runner.run(
+                widget_state, self.query_params, timeout or self.default_timeout, self._page_hash
+            )
+            self._tree._runner = self
+            return self
+
+    return _SessionAppTest
+
+
+def _session(
+    app_test_class,
+    selectable: list[str],
+    new_ticker: str,
+    iterations: int,
+    think_time: float,
+    seed: int,
+    samples: list[tuple[str, float]],
+    errors: list[str]
+) -> None:
+    """
+    Run the flow of a single session, the latencies are added to the samples.
+    """
+
+    rng = random.Random(seed)
+
+    def timed(action: str, step) -> Any:
+        start = time.perf_counter()
+        try:
+            at = step()
+        except Exception as error:
+            errors.append(f'{action}: {type(error).__name__}: {error}')
+            return None
+        samples.append((action, time.perf_counter() - start))
+        if at.exception:
+            errors.append(f'{action}: {at.exception[0].message[:200]}')
+        time.sleep(think_time)
+        return at
+
+    def by_label(elements, label: str):
+        for element in elements:
+            if element.label == label:
+                return element
+        # E.g. the chosen ticker is reset when another session changes the shared ticker list
+        raise LookupError(f"'{label}' isn't on the page")
+
+    for _ in range(iterations):
+        at = timed('load', lambda: app_test_class(os.path.join(ROOT_DIR, 'main.py'), default_timeout=120).run())
+        if at is None:
+            continue
+
+        ticker = rng.choice(selectable)
+        steps = [
+            ('select', lambda: by_label(at.sidebar.selectbox, 'Choose ticker').select(ticker).run()),
+            ('toggle', lambda: by_label(at.toggle, 'Show candlestick chart').set_value(True).run()),
+            ('slider', lambda: by_label(at.slider, 'Select period:').set_range(
+                datetime(2020 + rng.randint(0, 2), 1, 1, 9, 30),
+                datetime(2023, 1 + rng.randint(0, 8), 1, 9, 30)
+            ).run()),
+            ('add', lambda: (
+                by_label(at.sidebar.button, 'Add new ticker').click().run(),
+                by_label(at.sidebar.text_input, 'Add new ticker').input(new_ticker),
+                by_label(at.button, 'submit').click().run(),
+            )[-1]),
+            ('delete', lambda: (
+                by_label(at.sidebar.button, 'Delete ticker').click().run(),
+                by_label(at.selectbox, 'Choose ticker to delete').select(new_ticker),
+                by_label(at.button, 'delete').click().run(),
+            )[-1]),
+        ]
+        for action, step in steps:
+            if timed(action, step) is None:
+                break
+
+
+def run_level(sessions: int, iterations: int, think_time: float = 0.0) -> dict[str, Any]:
+    """
+    Run the sessions in parallel in this process, after a warm-up session.
+    The environment (SNAPSHOT_DIR, TICKER_FILE) has to be set before the call.
+    """
+
+    from streamlit.testing.v1.util import patch_config_options
+
+    # The sessions' threads don't have a script run context, which is logged as a warning
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    os.chdir(ROOT_DIR)
+    selectable = json.loads(os.environ['LOAD_TEST_SELECTABLE'])
+    new_tickers = json.loads(os.environ['LOAD_TEST_NEW_TICKERS'])
+    app_test_class = _session_app_test()
+
+    with patch_config_options({"global.appTest": True}):
+        # Fill the caches, like on a running server
+        _session(app_test_class, selectable, new_tickers[0], 1, 0.0, -1, [], [])
+
+        rss_before = _rss_mb()
+        samples: list[tuple[str, float]] = []
+        errors: list[str] = []
+        threads = [
+            threading.Thread(
+                target=_session,
+                args=(app_test_class, selectable, new_tickers[index], iterations, think_time, index, samples, errors)
+            )
+            for index in range(sessions)
+        ]
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+
+    rss = _rss_mb()
+    return {
+        'sessions': sessions,
+        'iterations': iterations,
+        'actions': len(samples),
+        'errors': len(errors),
+        'error_examples': errors[:5],
+        'wall_s': round(wall_time, 2),
+        'actions_per_s': round(len(samples) / wall_time, 2),
+        'cpu_percent': round(cpu_time / wall_time * 100, 1),
+        'rss_mb': round(rss, 1),
+        'rss_per_session_mb': round(max(rss - rss_before, 0) / sessions, 2),
+        'rss_is_peak': psutil is None,
+        'latency': _percentiles([duration for _, duration in samples]),
+        'by_action': {
+            action: _percentiles([duration for name, duration in samples if name == action])
+            for action in ACTIONS
+        },
+    }
+
+
+def _run_worker(args: argparse.Namespace) -> None:
+    result = run_level(args.sessions[0], args.iterations, args.think_time)
+    print(json.dumps(result))
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the Streamlit app.")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8], help="Session counts to test.")
+    parser.add_argument('--iterations', type=int, default=3, help="Flows per session.")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Seconds to wait after every action.")
+    parser.add_argument('--save', action='store_true', help="Save the results to the results folder.")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _run_worker(args)
+        return
+
+    directory = tempfile.mkdtemp(prefix='load-test-')
+    try:
+        ticker_file, selectable, new_tickers = build_stand_ins(directory, max(args.sessions))
+
+        env = {
+            **os.environ,
+            'SNAPSHOT_DIR': os.path.join(directory, 'snapshot'),
+            'TICKER_FILE': ticker_file,
+            # The APIs must never be called
+            'API_KEY': 'load-test',
+            'BASE_URL_POLYGON': 'http://127.0.0.1:9/',
+            'METRICS_PORT': '',
+            'TRACE_LOG_FILE': '',
+            'LOAD_TEST_SELECTABLE': json.dumps(selectable),
+            'LOAD_TEST_NEW_TICKERS': json.dumps(new_tickers),
+        }
+
+        results = []
+        for sessions in args.sessions:
+            # A fresh process per session count, so the CPU and the RSS belong to it
+            output = subprocess.run(
+                [
+                    sys.executable, os.path.abspath(__file__), '--worker',
+                    '--sessions', str(sessions),
+                    '--iterations', str(args.iterations),
+                    '--think-time', str(args.think_time),
+                ],
+                cwd=ROOT_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+
+            latency = result['latency']
+            print(
+                f"{sessions:>3} sessions: p50 {latency['p50_ms']:>8.1f} ms  p95 {latency['p95_ms']:>8.1f} ms  "
+                f"p99 {latency['p99_ms']:>8.1f} ms  {result['actions_per_s']:>6.2f} actions/s  "
+                f"CPU {result['cpu_percent']:>5.1f}%  RSS {result['rss_mb']:>7.1f} MB  errors {result['errors']}"
+            )
+            for error in result['error_examples']:
+                print(f"    {error}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.save:
+        save_results(RESULT_FILE, {**environment(), 'iterations': args.iterations, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
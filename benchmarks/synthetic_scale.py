@@ -0,0 +1,153 @@
+"""
+Scale benchmarks of the DataProcessor on synthetic data (src.synthetic_data).
+
+The recorded fixtures have a few years of filings, so the cost of a longer history
+isn't visible in benchmarks/data_processing.py. Here the hot paths are timed on a single
+ticker with 5 to 40 years of history (with the whole history requested, year_from=1900),
+and the throughput of a universe of tickers (construct + TTM profit margin + valuation
+history) is measured, like a screener going through many tickers would do.
+
+Usage (from the repository root):
+
+    python benchmarks/synthetic_scale.py                  # print the results
+    python benchmarks/synthetic_scale.py --save           # and update benchmarks/results/synthetic_scale.json
+    python benchmarks/synthetic_scale.py --check          # exit with 1 on regressions against the saved results
+    python benchmarks/synthetic_scale.py --universe 1000  # size of the universe
+
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+from typing import Any, Callable, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.harness import RESULTS_DIR, compare, environment, load_results, save_results, time_call
+
+
+RESULT_FILE = os.path.join(RESULTS_DIR, 'synthetic_scale.json')
+
+# A fixed "today", so the generated data (and the results) don't change with the date
+END = date(2023, 11, 10)
+
+HISTORY_YEARS = [5, 10, 20, 40]
+
+
+def _cases(years: int) -> dict[str, tuple[Callable[[], Any], Optional[Callable[[], Any]]]]:
+    """
+    Build the (function, setup) pairs of a ticker with the given years of history.
+    """
+
+    from src.synthetic_data import generate_ticker, make_data_processor
+
+    synthetic = generate_ticker('SYAAA', seed=years, years=years, end=END, fiscal_year_end_month=12, week_based=False)
+    data = make_data_processor(synthetic)
+
+    def clear_derived_cache() -> None:
+        data._derived_cache.clear()
+
+    return {
+        'generate': (lambda: generate_ticker('SYAAA', seed=years, years=years, end=END), None),
+        'construct': (lambda: make_data_processor(synthetic), None),
+        'calculate_quarterly_data': (
+            lambda: data.calculate_quarterly_data('income_statement','revenues', year_from=1900),
+            None
+        ),
+        'get_ttm_data': (lambda: data.get_ttm_data('income_statement','revenues', year_from=1900), None),
+        'get_ttm_profit_margin': (data.get_ttm_profit_margin, None),
+        'get_valuation_history': (data.get_valuation_history, clear_derived_cache),
+    }
+
+
+def universe_throughput(count: int, years: int = 20) -> dict[str, Any]:
+    """
+    Generate the universe, then process every ticker once. The generation isn't timed.
+    Returns the processed tickers per second and the number of the tickers with incorrect data.
+    """
+
+    from src.data_processor import IncorrectDataError
+    from src.synthetic_data import generate_universe, make_data_processor
+
+    universe = list(generate_universe(count, seed=0, years=years, end=END))
+
+    incorrect = 0
+    start = time.perf_counter()
+    for synthetic in universe:
+        data = make_data_processor(synthetic)
+        try:
+            data.get_ttm_profit_margin()
+            data.get_valuation_history()
+        except IncorrectDataError:
+            incorrect += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        'tickers': count,
+        'tickers_per_second': round(count / elapsed, 1),
+        'incorrect': incorrect,
+    }
+
+
+def run(rounds: int = 5, min_time: float = 0.05, pattern: Optional[str] = None) -> dict[str, dict]:
+    """
+    Run every case (or the ones whose name contains the pattern).
+    """
+
+    results: dict[str, dict] = {}
+    for years in HISTORY_YEARS:
+        for name, (func, setup) in _cases(years).items():
+            name = f'{years}y.{name}'
+            if pattern is not None and pattern not in name:
+                continue
+            try:
+                results[name] = time_call(func, rounds=rounds, min_time=min_time, setup=setup)
+            except Exception as error:
+                results[name] = {'error': type(error).__name__}
+    return results
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Scale benchmarks of the DataProcessor on synthetic data.")
+    parser.add_argument('-k', dest='pattern', default=None, help="Run only the cases containing this string.")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05, help="Minimum seconds per round.")
+    parser.add_argument('--universe', type=int, default=200, help="Number of the tickers of the throughput run (0 to skip).")
+    parser.add_argument('--save', action='store_true', help="Save the results to the results folder.")
+    parser.add_argument('--check', action='store_true', help="Exit with 1 on regressions against the saved results.")
+    parser.add_argument('--baseline', default=RESULT_FILE, help="Results file to compare with.")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%).")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    results = run(args.rounds, args.min_time, args.pattern)
+
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:<48}{result['error']:>24}")
+        else:
+            print(f"{name:<48}{result['min_us']:>14.1f} us  (median {result['median_us']:.1f} us)")
+
+    throughput = universe_throughput(args.universe) if args.universe else None
+    if throughput:
+        print(
+            f"universe: {throughput['tickers']} tickers, {throughput['tickers_per_second']} tickers/s, "
+            f"{throughput['incorrect']} with incorrect data"
+        )
+
+    regressions = compare(results, baseline['results'], args.threshold) if baseline else []
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+
+    if args.save:
+        save_results(RESULT_FILE, {**environment(), 'results': results, 'universe': throughput})
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,311 @@
 import streamlit as st
-from src.polygon_api import PolygonAPI
-from src.daily_price_api import PriceAPI
-from src.data_processor import DataProcessor
-from src.components import add_sidebar_ticker_form, basic_page_setup, add_center_panel
+from os import getenv
+from typing import TYPE_CHECKING, Callable, Optional
+from src.cache import BundleCache
+from src.circuit_breaker import CircuitOpenError, unavailable_sources
+from src.json_io import read_ticker_list, check_ticker_on_list
+from src.sidebar import add_sidebar_ticker_form, add_sidebar_comparison_form, basic_page_setup, add_sidebar_cache_stats, add_sidebar_debug_panel, TICKER_FILE
+from src.snapshot import SnapshotNotFoundError, bundle_version, has_ticker, read_manifest
+from src.timeouts import PAGE_DEADLINE, page_deadline, remaining
+from src.tracing import configure_json_log, start_metrics_server, trace
 
+# The data and chart modules pull in pandas, yfinance and requests, so they are
+# imported only when a ticker is loaded. It keeps the first render of the page fast.
+if TYPE_CHECKING:
+    from src.data_processor import DataProcessor
+    from src.price_stream import PriceStreamer
+    from src.shared_cache import SharedCache
+    from src.warmer import CacheWarmer, PageLoader
 
-@st.cache_data
-def init_load_data(ticker):
-    """ 
-    Initialize a dataprocessor object and calling the neccessarry requests. 
+# In the offline mode every ticker is loaded from this snapshot folder (see src/snapshot.py)
+SNAPSHOT_DIR = getenv("SNAPSHOT_DIR")
+# A ticker loaded while one of its data sources was down is reloaded after this many seconds
+DEGRADED_CACHE_TTL = float(getenv("DEGRADED_CACHE_TTL", 30))
+
+
+@st.cache_resource
+def get_bundle_cache() -> BundleCache:
+    """
+    Create the process-wide cache of the loaded tickers. The limits are read from the .env file.
+    """
+
+    ttl = getenv("CACHE_TTL")
+
+    return BundleCache(
+        max_bytes=int(getenv("CACHE_MAX_BYTES", 512 * 1024**2)),
+        max_entries=int(getenv("CACHE_MAX_ENTRIES", 100)),
+        ttl=float(ttl) if ttl else None,
+        policy=getenv("CACHE_POLICY", "lru")
+    )
+
+
+@st.cache_resource
+def get_shared_cache() -> Optional["SharedCache"]:
+    """
+    Create the cache of the loaded tickers shared by the replicas of the app (SHARED_CACHE_URL),
+    or None if it's not set.
+    """
+
+    from src.compression import financials_dictionary
+    from src.shared_cache import shared_cache_from_env
+
+    # The pickled financials have the same line items as the dictionary
+    return shared_cache_from_env('bundle', dictionary=financials_dictionary())
+
+
+def _data_loader(shared: Optional["SharedCache"]) -> Callable[..., "DataProcessor"]:
+    """
+    Create the function loading a ticker in the background threads. The shared cache is
+    resolved beforehand, in the script thread.
+    """
+
+    def load(ticker: str, parts: Optional[dict] = None) -> "DataProcessor":
+        """ 
+        Initialize a dataprocessor object from the APIs, or from the snapshot in the offline mode.
+        The tickers loaded from the APIs are shared with the other replicas through the shared cache.
+        The API objects are put into the optional parts dict, so the page can show the data loaded so far.
+        If one of the data sources is down, the ticker is loaded without it and it isn't shared.
+        """
+
+        from src.snapshot import load_from_apis, load_ticker
+
+        # The snapshot folder is already shared by the replicas
+        if SNAPSHOT_DIR:
+            return load_ticker(SNAPSHOT_DIR, ticker)
+
+        if shared is None:
+            return load_from_apis(ticker, parts, allow_partial=True)
+
+        data = shared.get_or_load(ticker, lambda key: load_from_apis(key, parts, allow_partial=True))
+        if data.unavailable:
+            shared.invalidate(ticker)
+        return data
+
+    return load
+
+
+@st.cache_resource
+def get_page_loader() -> "PageLoader":
+    """
+    Create the process-wide background loader of the tickers.
     """
 
-    fin_api = PolygonAPI(ticker)
-    fin_api.get_ticker_details()
-    fin_api.get_financials()
-    fin_api.get_news()
+    from src.snapshot import partial_data
+    from src.warmer import PageLoader
+
+    return PageLoader(
+        get_bundle_cache(),
+        _data_loader(get_shared_cache()),
+        partial_data,
+        degraded=lambda data: bool(data.unavailable),
+        degraded_ttl=DEGRADED_CACHE_TTL
+    )
+
 
-    price_api = PriceAPI(ticker)
-    price_api.get_history()
-    price_api.get_earnings_dates()
+def init_load_data(ticker: str) -> tuple[Optional["DataProcessor"], bool]:
+    """
+    Return the DataProcessor of the given ticker from the cache, or load it if it's not cached yet.
+    The page waits for the load only until its deadline: then the data loaded so far is returned
+    (None if there's nothing yet) with False as the second value, and the load goes on in the background.
+
+    In the offline mode the cached ticker is reloaded if its files have changed since
+    (e.g. the ingestion worker has written a newer bundle).
+    """
+
+    if SNAPSHOT_DIR:
+        cached = get_bundle_cache().get(ticker)
+        if cached is not None and cached.data_version != bundle_version(SNAPSHOT_DIR, ticker):
+            get_bundle_cache().invalidate(ticker)
+
+    return get_page_loader().load(ticker, timeout=remaining())
+
+
+@st.cache_resource
+def get_cache_warmer() -> "CacheWarmer":
+    """
+    Start the background warmer of the process with every saved ticker.
+    It runs once per server process, at the first page load.
+    """
 
+    from src.polygon_api import RATE_LIMITER
+    from src.rate_limit import RateLimiter
+    from src.warmer import CacheWarmer
 
-    return DataProcessor(
-        fin_api=fin_api,
-        price_api=price_api
+    page_loader = get_page_loader()
+    warmer = CacheWarmer(
+        cache=get_bundle_cache(),
+        # Through the page loader, so a page can show the parts loaded by the warmer so far
+        loader=lambda ticker: page_loader.load(ticker)[0],
+        # The snapshot is read from the disk, the Polygon limit doesn't apply to it
+        rate_limiter=RateLimiter(1000, 1) if SNAPSHOT_DIR else RATE_LIMITER,
+        should_warm=lambda ticker: check_ticker_on_list(TICKER_FILE, ticker),
+        # The page loader caches the data, a degraded ticker only for DEGRADED_CACHE_TTL
+        loader_caches=True
     )
+    warmer.start()
+    warmer.enqueue_many(read_ticker_list(TICKER_FILE))
+    return warmer
+
+
+@st.cache_resource
+def get_price_streamer() -> Optional["PriceStreamer"]:
+    """
+    Start the live price stream of the process (PRICE_STREAM), or None if it's off.
+    The trades are applied to the tickers of the bundle cache.
+    """
+
+    if not getenv("PRICE_STREAM"):
+        return None
+
+    from src.price_stream import PriceStreamer, feed_from_env
+
+    cache = get_bundle_cache()
+
+    def last_close(ticker: str) -> Optional[float]:
+        data = cache.peek(ticker)
+        if data is None or data.price_hist is None:
+            return None
+        return float(data.price_hist['Close'].iloc[-1])
+
+    streamer = PriceStreamer(feed_from_env(start_prices=last_close), resolve=cache.peek)
+    streamer.start()
+    return streamer
+
+
+# No spinner, it would be drawn before the page config is set
+@st.cache_resource(show_spinner=False)
+def start_metrics_export() -> None:
+    """
+    Start the Prometheus endpoint (METRICS_PORT) and the JSON request log (TRACE_LOG_FILE)
+    of the process, if they are set in the .env file.
+    """
+
+    port = getenv("METRICS_PORT")
+    if port:
+        start_metrics_server(int(port))
+
+    log_file = getenv("TRACE_LOG_FILE")
+    if log_file:
+        configure_json_log(log_file)
+
 
 def main():     
 
+    start_metrics_export()
+
+    # Every span of the script run is collected into this request trace.
+    # The external calls of the page have to fit into its deadline (PAGE_DEADLINE).
+    with trace('page') as request, page_deadline(PAGE_DEADLINE):
+        _render_page(request)
+
+
+def _snapshot_validator(ingested: bool):
+    """
+    Check of the new tickers in the offline mode. Only the tickers of a snapshot can be added,
+    but the ingestion worker loads any valid ticker of the watchlist.
+    """
+
+    def validator(ticker: str) -> bool:
+        if has_ticker(SNAPSHOT_DIR, ticker):
+            return True
+        if ingested:
+            from src.polygon_api import check_ticker_validity
+            return check_ticker_validity(ticker)
+        return False
+
+    return validator
+
+
+def _render_page(request) -> None:
 
     basic_page_setup()
 
+    manifest = (read_manifest(SNAPSHOT_DIR) or {}) if SNAPSHOT_DIR else {}
+    # The store of the ingestion worker (src/ingest.py) is kept up to date by the worker
+    ingested = manifest.get('source') == 'ingest'
+    if ingested:
+        st.sidebar.caption(f"Data updated at {manifest['created_at']}")
+    elif SNAPSHOT_DIR:
+        st.sidebar.info(f"Offline mode, snapshot of {manifest.get('created_at', SNAPSHOT_DIR)}")
+
     # Creating the ticker handling component to the sidebar
-    option = add_sidebar_ticker_form()
+    # The newly added tickers are loaded in the background right away
+    # In the offline mode only the tickers of the snapshot can be added
+    option = add_sidebar_ticker_form(
+        on_ticker_added=lambda ticker: get_cache_warmer().enqueue(ticker),
+        validator=_snapshot_validator(ingested) if SNAPSHOT_DIR else None
+    )
+    compared = add_sidebar_comparison_form()
+
+    # The warmer is started after the sidebar has been drawn
+    warmer = get_cache_warmer()
+    streamer = get_price_streamer()
+    figure_stats = None
+
+    try:
+        # If there are at least two tickers to compare
+        if len(compared) >= 2:
+            from src.components import add_comparison_panel, get_figure_cache, refresh_when_loaded
+
+            loaded = {ticker: init_load_data(ticker) for ticker in compared}
+            pending = [ticker for ticker, (_, complete) in loaded.items() if not complete]
+            # The metrics need both sources, the tickers loaded while one was down are left out
+            degraded = [ticker for ticker, (data, complete) in loaded.items() if complete and data.unavailable]
+            ready = [data for data, complete in loaded.values() if complete and not data.unavailable]
+
+            if pending:
+                st.info(f"Still loading: {', '.join(pending)}", icon="⏳")
+                refresh_when_loaded(lambda: not any(get_page_loader().is_loading(ticker) for ticker in pending))
+            if degraded:
+                st.warning(f"A data source is unavailable, not compared: {', '.join(degraded)}", icon="⚠️")
+            if len(ready) >= 2:
+                add_comparison_panel(ready)
+            figure_stats = get_figure_cache().stats()
+
+        # If there's a choosen ticker
+        elif option:
+            from src.components import add_center_panel, get_figure_cache, keep_streaming, refresh_when_loaded
+
+            data, complete = init_load_data(option)
+            # The main panel, where everything is shown (the sections loaded so far if it's not complete)
+            if data is None:
+                st.info(f"The data of {option} is still loading...", icon="⏳")
+            else:
+                add_center_panel(data, complete)
+            if not complete:
+                refresh_when_loaded(lambda: not get_page_loader().is_loading(option))
+            elif streamer is not None:
+                # The trades of the ticker are applied to its cached data while the page is open
+                keep_streaming(lambda: streamer.watch(option))
+            figure_stats = get_figure_cache().stats()
+
+    # A saved ticker which hasn't been exported into the snapshot (or loaded by the worker yet)
+    except SnapshotNotFoundError as error:
+        if ingested:
+            st.info("The data of the ticker is being loaded, please check back in a few minutes.")
+        else:
+            st.error(error.message)
+
+    # Both data sources are down
+    except CircuitOpenError as error:
+        st.error(f"The data sources are unavailable, please try again later ({error.message}).")
+
+    down = unavailable_sources()
+    if down:
+        st.sidebar.warning(f"Unavailable data sources: {', '.join(down)}", icon="⚠️")
 
     # Settings part on the sidebar
     st.sidebar.divider()
     st.sidebar.caption("Settings:")
-    candlestick_chart_status = st.sidebar.toggle('Show candlestick chart')
-
-    # If there's a choosen ticker
-    if option:
-        data = init_load_data(option)
-        # The main panel, where everything is shown
-        add_center_panel(data, candlestick_chart_status)
+    shared = get_shared_cache()
+    add_sidebar_cache_stats(
+        get_bundle_cache().stats(),
+        figure_stats,
+        warmer.stats(),
+        shared.stats() if shared is not None else None
+    )
+    add_sidebar_debug_panel(request, streamer.stats() if streamer is not None else None)
 
         
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,293 @@
+"""
+Headless batch report of the fundamentals of every saved ticker.
+
+The same PolygonAPI, PriceAPI and DataProcessor are used as by the dashboard, without
+Streamlit. For every ticker the header metrics of the page and the quarterly/TTM series
+are computed, then written into two tables:
+
+    <out>/header.<csv|parquet>      one row per ticker
+    <out>/series.<csv|parquet>      ticker, series, end_date, year, quarter, value
+
+The tickers are processed in a thread pool. The Polygon requests go through the
+process-wide rate limiter (src.polygon_api.RATE_LIMITER), so the workers only overlap
+the yfinance downloads and the computations, never exceed the limit.
+
+Every finished ticker is saved into <out>/checkpoints/<TICKER>.json right away. An
+interrupted run continues from the checkpoints, only the missing (or failed) tickers are
+loaded again (use --restart to start from scratch).
+
+Usage (from the repository root):
+
+    python -m src.batch_report /tmp/report
+    python -m src.batch_report /tmp/report --format parquet --workers 8
+    python -m src.batch_report /tmp/report --tickers MSFT GOOGL --snapshot /tmp/snapshot
+
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, Optional
+import pandas as pd
+
+from src.data_processor import DataProcessor
+
+
+CHECKPOINT_FOLDER = 'checkpoints'
+
+FORMATS = ('csv', 'parquet')
+
+# The metrics of the page header, by column name
+HEADER_METRICS: dict[str, Callable[[DataProcessor], Any]] = {
+    'name': lambda data: data.get_name(),
+    'sic_description': lambda data: data.get_sic_desc(),
+    'market_cap': lambda data: data.get_market_cap(),
+    'current_price': lambda data: data.get_curr_prev_price()['current'],
+    'previous_price': lambda data: data.get_curr_prev_price()['previous'],
+    'yearly_price_change': lambda data: data.get_yearly_price_change(),
+    '52week_high': lambda data: data.get_52week_high(),
+    '52week_low': lambda data: data.get_52week_low(),
+    'eps': lambda data: data.get_eps(),
+    'pe': lambda data: data.get_pe(),
+    'roe': lambda data: data.get_roe(),
+    'profit_margin': lambda data: data.get_profit_margin(),
+    'dividend_yield': lambda data: data.get_div_yield(),
+    'next_report_date': lambda data: data.get_next_report_date(),
+}
+
+# The quarterly and TTM series of the page, by series name
+SERIES: dict[str, Callable[[DataProcessor], pd.DataFrame]] = {
+    'revenue_quarterly': lambda data: data.calculate_quarterly_data('income_statement','revenues'),
+    'net_income_quarterly': lambda data: data.calculate_quarterly_data('income_statement','net_income_loss_attributable_to_parent'),
+    'revenue_ttm': lambda data: data.get_ttm_data('income_statement','revenues'),
+    'net_income_ttm': lambda data: data.get_ttm_data('income_statement','net_income_loss_attributable_to_parent'),
+    'cash_flow_ttm': lambda data: data.get_ttm_data('cash_flow_statement','net_cash_flow'),
+    'profit_margin_ttm': lambda data: data.get_ttm_profit_margin(),
+}
+
+SERIES_COLUMNS = ['ticker', 'series', 'end_date', 'year', 'quarter', 'value']
+
+
+def _jsonable(value: Any) -> Any:
+    """
+    Convert the numpy, pandas and datetime values to JSON serializable ones.
+    """
+
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, float)) or hasattr(value, 'item'):
+        value = value.item() if hasattr(value, 'item') else value
+        return None if isinstance(value, float) and math.isnan(value) else value
+    return str(value)
+
+
+def ticker_report(data: DataProcessor) -> dict[str, Any]:
+    """
+    Compute the header metrics and the series of a ticker.
+    A metric or a series which can't be computed (e.g. incorrect financial data) is
+    left empty, and its error is recorded.
+    """
+
+    header: dict[str, Any] = {'ticker': data.ticker}
+    errors: dict[str, str] = {}
+
+    for column, getter in HEADER_METRICS.items():
+        try:
+            header[column] = _jsonable(getter(data))
+        except Exception as error:
+            header[column] = None
+            errors[column] = type(error).__name__
+
+    series: list[dict[str, Any]] = []
+    for name, getter in SERIES.items():
+        try:
+            df = getter(data)
+        except Exception as error:
+            errors[name] = type(error).__name__
+            continue
+        for row in df[['end_date', 'year', 'quarter', 'value']].itertuples(index=False):
+            series.append({
+                'ticker': data.ticker,
+                'series': name,
+                'end_date': row.end_date.date().isoformat(),
+                'year': int(row.year),
+                'quarter': int(row.quarter),
+                'value': _jsonable(row.value),
+            })
+
+    header['errors'] = ', '.join(f'{name}: {error}' for name, error in errors.items()) or None
+    return {'header': header, 'series': series}
+
+
+def _checkpoint_file(out_dir: str, ticker: str) -> str:
+    return os.path.join(out_dir, CHECKPOINT_FOLDER, f'{ticker}.json')
+
+
+def _save_checkpoint(out_dir: str, ticker: str, report: dict[str, Any]) -> None:
+    """
+    Write the checkpoint atomically, so an interrupted run never leaves a broken one behind.
+    """
+
+    file = _checkpoint_file(out_dir, ticker)
+    handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(file), prefix='.tmp-')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(report, f)
+    os.replace(temp_file, file)
+
+
+def _load_checkpoint(out_dir: str, ticker: str) -> Optional[dict[str, Any]]:
+
+    file = _checkpoint_file(out_dir, ticker)
+    if not os.path.exists(file):
+        return None
+    with open(file, 'r') as f:
+        return json.load(f)
+
+
+def _print_progress(done: int, total: int, ticker: str, status: str) -> None:
+    print(f"[{done}/{total}] {ticker}: {status}", file=sys.stderr, flush=True)
+
+
+def run_batch(
+    tickers: Iterable[str],
+    out_dir: str,
+    loader: Callable[[str], DataProcessor],
+    workers: int = 4,
+    restart: bool = False,
+    progress: Optional[Callable[[int, int, str, str], None]] = _print_progress
+) -> dict[str, Any]:
+    """
+    Process the tickers which don't have a checkpoint yet, in parallel.
+
+    Args:
+        tickers: The tickers of the report.
+        out_dir: Output folder, the checkpoints are written into its 'checkpoints' subfolder.
+        loader: Function loading the data of a ticker, e.g. src.snapshot.load_from_apis.
+        workers: Number of the worker threads.
+        restart: Delete the earlier checkpoints first.
+        progress: Called with (done, total, ticker, status) after every ticker.
+
+    Returns the processed, the resumed (from a checkpoint) and the failed tickers (with the error).
+    """
+
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    checkpoint_dir = os.path.join(out_dir, CHECKPOINT_FOLDER)
+    if restart:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    resumed = [ticker for ticker in tickers if os.path.exists(_checkpoint_file(out_dir, ticker))]
+    todo = [ticker for ticker in tickers if ticker not in resumed]
+
+    def process(ticker: str) -> float:
+        start = time.perf_counter()
+        report = ticker_report(loader(ticker))
+        _save_checkpoint(out_dir, ticker, report)
+        return time.perf_counter() - start
+
+    processed: list[str] = []
+    failed: dict[str, str] = {}
+    done = len(resumed)
+    if progress is not None and resumed:
+        progress(done, len(tickers), ', '.join(resumed), 'resumed from checkpoint')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process, ticker): ticker for ticker in todo}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            done += 1
+            try:
+                elapsed = future.result()
+            except Exception as error:
+                failed[ticker] = f'{type(error).__name__}: {error}'
+                status = f'failed ({failed[ticker]})'
+            else:
+                processed.append(ticker)
+                status = f'done in {elapsed:.1f}s'
+            if progress is not None:
+                progress(done, len(tickers), ticker, status)
+
+    return {'processed': processed, 'resumed': resumed, 'failed': failed}
+
+
+def write_report(out_dir: str, tickers: Iterable[str], fmt: str = 'csv') -> list[str]:
+    """
+    Combine the checkpoints of the tickers into the header and the series tables.
+    The tickers without a checkpoint are left out. Returns the written files.
+    """
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    headers: list[dict[str, Any]] = []
+    series: list[dict[str, Any]] = []
+    for ticker in dict.fromkeys(ticker.upper() for ticker in tickers):
+        report = _load_checkpoint(out_dir, ticker)
+        if report is not None:
+            headers.append(report['header'])
+            series.extend(report['series'])
+
+    tables = {
+        'header': pd.DataFrame(headers, columns=['ticker', *HEADER_METRICS, 'errors']),
+        'series': pd.DataFrame(series, columns=SERIES_COLUMNS),
+    }
+    tables['series']['end_date'] = pd.to_datetime(tables['series']['end_date'])
+
+    files = []
+    for name, df in tables.items():
+        file = os.path.join(out_dir, f'{name}.{fmt}')
+        if fmt == 'csv':
+            df.to_csv(file, index=False)
+        else:
+            df.to_parquet(file, index=False)
+        files.append(file)
+    return files
+
+
+def main() -> None:
+
+    from dotenv import load_dotenv
+    from src.json_io import read_ticker_list
+    from src.snapshot import load_from_apis, load_ticker
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Batch report of the fundamentals of the saved tickers.")
+    parser.add_argument('out_dir', help="Output folder of the report and the checkpoints.")
+    parser.add_argument('--tickers', nargs='+', default=None, help="Defaults to the saved tickers (TICKER_FILE).")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoints of an earlier run.")
+    parser.add_argument(
+        '--snapshot',
+        default=os.getenv('SNAPSHOT_DIR') or None,
+        help="Load the tickers from this offline snapshot instead of the APIs (defaults to SNAPSHOT_DIR)."
+    )
+    args = parser.parse_args()
+
+    tickers = args.tickers or read_ticker_list(os.getenv('TICKER_FILE'))
+    loader = (lambda ticker: load_ticker(args.snapshot, ticker)) if args.snapshot else load_from_apis
+
+    summary = run_batch(tickers, args.out_dir, loader, workers=args.workers, restart=args.restart)
+    files = write_report(args.out_dir, tickers, args.format)
+
+    print(
+        f"{len(summary['processed'])} processed, {len(summary['resumed'])} resumed, "
+        f"{len(summary['failed'])} failed. Written: {', '.join(files)}"
+    )
+
+    # The failed tickers are retried by the next run
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Module containing a bounded, memory-aware cache for the loaded ticker bundles.
+
+Streamlit's st.cache_data keeps every ticker forever, so a long-running server
+grows with every ticker it has ever seen. The BundleCache measures the size of
+every stored bundle and evicts entries (LRU or LFU) to stay under a global
+memory ceiling and an entry limit. Every entry has its own time to live.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+POLICIES = ('lru', 'lfu')
+
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Estimate the memory footprint of an object in bytes.
+
+    DataFrames and Series are measured with their deep memory usage, containers
+    and plain objects (e.g. a DataProcessor) are walked recursively. Every
+    object is counted only once.
+    """
+
+    if _seen is None:
+        _seen = set()
+
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    # pandas objects (duck typed, so this module doesn't have to import pandas)
+    if hasattr(obj, 'memory_usage') and hasattr(obj, 'index'):
+        usage = obj.memory_usage(deep=True, index=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        size += sum(
+            estimate_size(key, _seen) + estimate_size(value, _seen)
+            for key, value in obj.items()
+        )
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), _seen)
+
+    return size
+
+
+class _Entry:
+
+    """A single cached value with its bookkeeping data."""
+
+    __slots__ = ('value', 'size', 'expires_at', 'hits')
+
+    def __init__(self, value: Any, size: int, expires_at: Optional[float]) -> None:
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class BundleCache:
+
+    """
+    A thread-safe cache with size-aware eviction.
+
+    Args:
+        max_bytes: The global memory ceiling of the stored values.
+        max_entries: The maximum number of stored values.
+        ttl: The default time to live of an entry in seconds (None means no expiry).
+        policy: 'lru' evicts the least recently used, 'lfu' the least frequently used entry.
+        clock: Time source, it can be replaced in the tests.
+
+    An example of usage:
+
+    cache = BundleCache(max_bytes=256 * 1024**2, max_entries=50, ttl=3600)
+    data = cache.get_or_load('MSFT', load_function)
+    cache.stats()
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 512 * 1024**2,
+        max_entries: int = 100,
+        ttl: Optional[float] = None,
+        policy: str = 'lru',
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}. Choose from {POLICIES}")
+
+        self.max_bytes: int = max_bytes
+        self.max_entries: int = max_entries
+        self.ttl: Optional[float] = ttl
+        self.policy: str = policy
+        self._clock = clock
+
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._bytes: int = 0
+        self._lock = threading.RLock()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+        self._expirations: int = 0
+        self._rejected: int = 0
+
+
+    def _is_expired(self, entry: _Entry) -> bool:
+        return entry.expires_at is not None and self._clock() >= entry.expires_at
+
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+    def _evict_one(self) -> None:
+        """
+        Remove a single entry based on the eviction policy. Expired entries go first.
+        """
+
+        expired = [key for key, entry in self._entries.items() if self._is_expired(entry)]
+        if expired:
+            self._remove(expired[0])
+            self._expirations += 1
+            return
+
+        if self.policy == 'lru':
+            # The OrderedDict is kept in the order of usage
+            key = next(iter(self._entries))
+        else:
+            # min() returns the first minimal item, so ties are broken by recency
+            key = min(self._entries, key=lambda k: self._entries[k].hits)
+
+        self._remove(key)
+        self._evictions += 1
+
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Return the cached value or None if it's missing or expired.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self._misses += 1
+                return None
+
+            if self._is_expired(entry):
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store the value. Returns False if the value alone exceeds the memory ceiling.
+        """
+
+        size = estimate_size(value)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else self._clock() + ttl
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            if size > self.max_bytes:
+                self._rejected += 1
+                return False
+
+            while self._entries and (
+                len(self._entries) >= self.max_entries
+                or self._bytes + size > self.max_bytes
+            ):
+                self._evict_one()
+
+            self._entries[key] = _Entry(value, size, expires_at)
+            self._bytes += size
+            return True
+
+
+    def get_or_load(self, key: Hashable, loader: Callable[[Hashable], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Return the cached value, or call the loader and cache its result.
+        Concurrent calls for the same key load the value only once.
+        """
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread could have loaded it while we were waiting
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and not self._is_expired(entry):
+                    return entry.value
+
+            value = loader(key)
+            self.put(key, value, ttl)
+
+        with self._lock:
+            self._key_locks.pop(key, None)
+
+        return value
+
+
+    def peek(self, key: Hashable) -> Any:
+        """
+        Return the cached value or None, without counting it as a hit or a miss
+        (e.g. for the background updates of the cached values).
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None or self._is_expired(entry) else entry.value
+
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._is_expired(entry)
+
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Remove the given key from the cache if it's present.
+        """
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+
+    def clear(self) -> None:
+        """
+        Remove every entry, the statistics are kept.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the hit/miss/eviction statistics and the current memory footprint.
+        """
+
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                'policy': self.policy,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / requests, 4) if requests else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'rejected': self._rejected,
+            }
@@ -0,0 +1,250 @@
+"""
+Module containing the circuit breakers of the data sources (Polygon and yfinance).
+
+When a source is down or rate limited, every new session would keep sending requests to it
+and wait for their timeouts and retries. A CircuitBreaker counts the consecutive failures
+of its source:
+
+    - closed: the calls go through, and the breaker opens (trips) after failure_threshold failures,
+    - open: the calls fail right away with CircuitOpenError, for recovery_timeout seconds,
+    - half-open: a single trial call goes through; it closes the breaker if it succeeds,
+      and opens it again if it fails.
+
+The page renders the sections of the sources which are available (src.snapshot.load_from_apis).
+The state and the trip counts are returned by breaker_stats() and exported to Prometheus.
+
+An example of usage:
+
+breaker = CircuitBreaker('polygon', failures=(ServerError, ConnectionError))
+response = breaker.call(requests.get, url)
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional, Union
+
+from src.tracing import METRIC_PREFIX, REGISTRY
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+# Every breaker of the process, for the statistics
+BREAKERS: dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, message="The data source is unavailable", source=None, retry_in=None):
+        self.message = message
+        self.source = source
+        # Seconds until the next trial call
+        self.retry_in = retry_in
+        super().__init__(self.message)
+
+
+class CircuitBreaker:
+
+    """
+    Fails the calls of a data source fast while the source is down.
+
+    Args:
+        name: Name of the source.
+        failures: The exception types which count as a failure of the source, or a function
+            deciding about an exception. The other errors pass through without being counted.
+        failure_threshold: The number of consecutive failures which open the breaker.
+        recovery_timeout: Seconds the breaker stays open before a trial call.
+        clock: Time source, it can be replaced in the tests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failures: Union[tuple, Callable[[Exception], bool]],
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+
+        self.name: str = name
+        self.failures = failures
+        self.failure_threshold: int = failure_threshold
+        self.recovery_timeout: float = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._state: str = CLOSED
+        self._consecutive_failures: int = 0
+        self._opened_at: float = 0.0
+        self._trial_running: bool = False
+
+        self._trips: int = 0
+        self._rejected: int = 0
+        self._successes: int = 0
+        self._failures: int = 0
+        self._last_error: Optional[str] = None
+
+        BREAKERS[name] = self
+
+
+    def is_failure(self, error: Exception) -> bool:
+
+        if isinstance(self.failures, tuple):
+            return isinstance(error, self.failures)
+        return self.failures(error)
+
+
+    @property
+    def state(self) -> str:
+        """
+        The current state. An open breaker is reported as half-open once its recovery timeout has passed.
+        """
+
+        with self._lock:
+            return self._current_state()
+
+
+    def _current_state(self) -> str:
+
+        if self._state == OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            return HALF_OPEN
+        return self._state
+
+
+    def _before_call(self) -> bool:
+        """
+        Check if the call can go through. Returns True if it's the trial call of a half-open breaker.
+        """
+
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and not self._trial_running:
+                self._state = HALF_OPEN
+                self._trial_running = True
+                return True
+
+            self._rejected += 1
+            retry_in = max(self.recovery_timeout - (self._clock() - self._opened_at), 0.0)
+
+        raise CircuitOpenError(
+            f"{self.name} is unavailable, the next try is in {retry_in:.0f} s",
+            source=self.name,
+            retry_in=retry_in
+        )
+
+
+    def _open(self) -> None:
+
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._trips += 1
+
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call the function through the breaker. Raises CircuitOpenError while the breaker is open.
+        """
+
+        trial = self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            with self._lock:
+                if trial:
+                    self._trial_running = False
+                # The other errors (e.g. the deadline of the page) say nothing about the source,
+                # a half-open breaker lets the next call make the trial
+                if self.is_failure(error):
+                    self._failures += 1
+                    self._consecutive_failures += 1
+                    self._last_error = f'{type(error).__name__}: {error}'
+                    if trial or (self._state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                        self._open()
+            raise
+
+        with self._lock:
+            if trial:
+                self._trial_running = False
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._successes += 1
+        return result
+
+
+    def reset(self) -> None:
+        """
+        Close the breaker (the statistics are kept).
+        """
+
+        with self._lock:
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._trial_running = False
+
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the state of the breaker and its trip counts.
+        """
+
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'trips': self._trips,
+                'consecutive_failures': self._consecutive_failures,
+                'failures': self._failures,
+                'successes': self._successes,
+                'rejected': self._rejected,
+                'last_error': self._last_error,
+            }
+
+
+def breaker_stats() -> dict[str, dict[str, Any]]:
+    """
+    The statistics of every breaker of the process, per source.
+    """
+
+    return {name: breaker.stats() for name, breaker in sorted(BREAKERS.items())}
+
+
+def unavailable_sources() -> list[str]:
+    """
+    The sources whose breaker is open.
+    """
+
+    return [name for name, stats in breaker_stats().items() if stats['state'] == OPEN]
+
+
+def _to_prometheus() -> str:
+
+    state = f'{METRIC_PREFIX}_circuit_breaker_state'
+    trips = f'{METRIC_PREFIX}_circuit_breaker_trips_total'
+    rejected = f'{METRIC_PREFIX}_circuit_breaker_rejected_total'
+
+    lines = [
+        f'# HELP {state} State of the circuit breaker of the source (0 closed, 1 half-open, 2 open).',
+        f'# TYPE {state} gauge',
+    ]
+    trip_lines = [
+        f'# HELP {trips} Number of the times the breaker of the source has opened.',
+        f'# TYPE {trips} counter',
+    ]
+    rejected_lines = [
+        f'# HELP {rejected} Number of the calls failed fast by the open breaker.',
+        f'# TYPE {rejected} counter',
+    ]
+    for name, stats in breaker_stats().items():
+        lines.append(f'{state}{{source="{name}"}} {STATES.index(stats["state"])}')
+        trip_lines.append(f'{trips}{{source="{name}"}} {stats["trips"]}')
+        rejected_lines.append(f'{rejected}{{source="{name}"}} {stats["rejected"]}')
+
+    return '\n'.join(lines + trip_lines + rejected_lines) + '\n'
+
+
+REGISTRY.add_collector(_to_prometheus)
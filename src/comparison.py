@@ -0,0 +1,210 @@
+"""
+Module containing the aligned data of the multi-ticker comparison view.
+
+The comparable series of every ticker (close price, TTM revenue, TTM net income
+and TTM profit margin) are extracted once per data version and kept as columns.
+The comparison frames are built from these columns with a single vectorized
+join (pd.concat on the index), so adding a ticker to the comparison only
+computes the columns of the new ticker.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+import pandas as pd
+
+from src.data_processor import IncorrectDataError
+
+
+# The comparable metrics with their labels. The price is aligned on the shared
+# trading days, the others on the shared calendar quarters.
+METRICS: dict[str, str] = {
+    'price': 'Price performance %',
+    'revenue': 'Revenue - TTM',
+    'net_income': 'Net income - TTM',
+    'profit_margin': 'Profit margin % - TTM',
+}
+
+
+def _quarterly_series(df: pd.DataFrame) -> pd.Series:
+    """
+    Convert the output of the src.data_processor's get_ttm_data method to a series indexed by the calendar quarter end.
+    """
+
+    series = pd.Series(df['value'].to_numpy(dtype=float), index=pd.DatetimeIndex(df['end_date']))
+    return series[~series.index.duplicated(keep='last')].sort_index()
+
+
+def _metric_version(data, metric: str) -> Hashable:
+    """
+    The version of the ticker's data which the metric depends on. The price also changes
+    with the live prices (price_version), the fundamentals only with the data version.
+    """
+
+    if metric == 'price':
+        return (data.data_version, data.price_version)
+    return data.data_version
+
+
+def _price_series(data) -> pd.Series:
+    """
+    The closing price of the ticker indexed by the trading day.
+    """
+
+    close = data.price_hist['Close']
+    index = pd.DatetimeIndex(close.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+
+    price = pd.Series(close.to_numpy(dtype=float), index=index.normalize())
+    return price[~price.index.duplicated(keep='last')].sort_index()
+
+
+def extract_columns(data) -> dict[str, pd.Series]:
+    """
+    Extract the comparable series of a single ticker (a src.data_processor.DataProcessor).
+
+    The price is indexed by the trading day, the fundamentals by the calendar quarter end.
+    If the financial data of the ticker is incorrect, its fundamentals are empty series.
+    """
+
+    price = _price_series(data)
+
+    try:
+        revenue = _quarterly_series(data.get_ttm_data('income_statement','revenues'))
+        income = _quarterly_series(data.get_ttm_data('income_statement','net_income_loss_attributable_to_parent'))
+    except IncorrectDataError:
+        revenue = income = pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+
+    # The division aligns the two series on the quarter end
+    margin = (income / revenue * 100).dropna()
+
+    return {
+        'price': price,
+        'revenue': revenue,
+        'net_income': income,
+        'profit_margin': margin,
+    }
+
+
+class ComparisonMatrix:
+
+    """
+    A thread-safe cache of the aligned comparison frames.
+
+    The columns of every ticker are stored with the data version they were extracted from,
+    so they are only recomputed when the data of the ticker changes (only the price column
+    when the live prices change). The aligned frames are cached by (metric, tickers,
+    versions of the metric).
+
+    An example of usage:
+
+    matrix = ComparisonMatrix()
+    df = matrix.aligned('revenue', [msft_data, googl_data, aapl_data])
+    """
+
+    def __init__(self, max_tickers: int = 50, max_frames: int = 64) -> None:
+
+        self.max_tickers: int = max_tickers
+        self.max_frames: int = max_frames
+        self._columns: OrderedDict[str, tuple[Hashable, dict[str, pd.Series]]] = OrderedDict()
+        self._frames: OrderedDict[tuple, pd.DataFrame] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._extractions: int = 0
+        self._frame_hits: int = 0
+        self._frame_misses: int = 0
+
+
+    def _ticker_columns(self, data) -> dict[str, pd.Series]:
+        """
+        Return the columns of the ticker, extracting them if they are missing or outdated.
+        """
+
+        version = (data.data_version, data.price_version)
+        with self._lock:
+            cached = self._columns.get(data.ticker)
+            if cached is not None and cached[0] == version:
+                self._columns.move_to_end(data.ticker)
+                return cached[1]
+
+        if cached is not None and cached[0][0] == data.data_version:
+            # Only the live prices changed, the fundamentals are kept
+            columns = {**cached[1], 'price': _price_series(data)}
+        else:
+            columns = extract_columns(data)
+
+        with self._lock:
+            self._extractions += 1
+            self._columns[data.ticker] = (version, columns)
+            while len(self._columns) > self.max_tickers:
+                self._columns.popitem(last=False)
+
+        return columns
+
+
+    def aligned(self, metric: str, datas: list) -> pd.DataFrame:
+        """
+        Get the aligned frame of the metric with a column for every ticker.
+
+        Only the dates shared by every ticker are kept. The tickers without any data of the
+        metric (e.g. incorrect financials) are left out. The price is normalized to the
+        percentage change since the first shared trading day.
+        """
+
+        if metric not in METRICS:
+            raise KeyError(f"Unknown metric: {metric}")
+
+        key = (metric, tuple((data.ticker, _metric_version(data, metric)) for data in datas))
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                self._frame_hits += 1
+                return frame.copy()
+
+        series = {data.ticker: self._ticker_columns(data)[metric] for data in datas}
+        series = {ticker: values for ticker, values in series.items() if not values.empty}
+
+        if series:
+            frame = pd.concat(series, axis=1, join='inner').sort_index()
+        else:
+            frame = pd.DataFrame(index=pd.DatetimeIndex([]))
+
+        if metric == 'price' and not frame.empty:
+            frame = (frame / frame.iloc[0] - 1) * 100
+
+        with self._lock:
+            self._frame_misses += 1
+            self._frames[key] = frame
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+
+        return frame.copy()
+
+
+    def invalidate(self, ticker: str) -> None:
+        """
+        Remove the columns and every aligned frame of the ticker.
+        """
+
+        with self._lock:
+            self._columns.pop(ticker, None)
+            stale = [key for key in self._frames if any(item[0] == ticker for item in key[1])]
+            for key in stale:
+                del self._frames[key]
+
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the number of the extracted tickers and the hit/miss statistics of the frames.
+        """
+
+        with self._lock:
+            return {
+                'tickers': len(self._columns),
+                'frames': len(self._frames),
+                'extractions': self._extractions,
+                'frame_hits': self._frame_hits,
+                'frame_misses': self._frame_misses,
+            }
@@ -1,10 +1,11 @@
 """
 This module containing components and tools for our Streamlit page 
-It will be initialized from the main.py file.
+It will be initialized from the main.py file, when a ticker is chosen.
+The page setup and the sidebar are in the lightweight src.sidebar module.
 """
 
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Callable, Optional
 import os 
 from os import getenv # type: ignore
 import pandas as pd
@@ -12,153 +13,53 @@ import plotly.graph_objects as go # type: ignore
 from plotly.graph_objs._figure import Figure  # type: ignore
 import streamlit as st # type: ignore
 
-from src.polygon_api import check_ticker_validity
-from src.json_io import check_ticker_on_list, delete_ticker, add_ticker, read_ticker_list
+from src.indicators import INDICATORS
+from src.figure_cache import FigureCache
+from src.shared_cache import shared_cache_from_env
+from src.comparison import ComparisonMatrix, METRICS
+from src.snapshot import SOURCE_ATTRIBUTES
+from src.tracing import traced
 
-import time 
 from dotenv import load_dotenv
-from streamlit.delta_generator import DeltaGenerator
 
-# Loading the .env file and the api key from it
+# Loading the .env file
 load_dotenv()
-TICKER_FILE: str = getenv("TICKER_FILE") # type: ignore
 
+# With the live price stream on (src/price_stream.py), the header metrics and the candlestick
+# chart are rerun every PRICE_STREAM_REFRESH seconds, to show the latest trades
+LIVE_REFRESH_INTERVAL: Optional[float] = float(getenv("PRICE_STREAM_REFRESH", 2)) if getenv("PRICE_STREAM") else None
 
-def _set_page_width() -> DeltaGenerator:
-    """
-    Workaround the set the streamlit page wider, because using streamlit wide mode doesn't result the desired page structure.
-    """
 
-    css="""
-    <style>
-        section.main > div {max-width:60rem}
-    </style>
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
     """
-    return st.markdown(css, unsafe_allow_html=True)
-
-
-def basic_page_setup() -> None:
-
-    # Basic page setups
-    st.set_page_config(page_title="Stonks$$",page_icon="📉",)
-    _set_page_width()
-
-
-
-def add_sidebar_ticker_form() -> Optional[str]:
-    """ 
-    Method to setup the streamlit sidebar part of the page.
-    Including:
-        - A selection box to choose from saved tickers.
-        - A ticker form to add new tickers and delete them from the saved tickers list
-
+    Create the process-wide cache of the serialized figures, backed by the shared cache
+    of the replicas if SHARED_CACHE_URL is set.
     """
 
-    ticker_options = read_ticker_list(TICKER_FILE)
-
-    option = st.sidebar.selectbox(
-        "Choose ticker",
-        ticker_options,
-        index=None,
-        placeholder="Select ticker...",
+    return FigureCache(
+        max_entries=int(getenv("FIGURE_CACHE_MAX_ENTRIES", 500)),
+        shared=shared_cache_from_env('figure')
     )
 
-    # Sidebar: add/delete ticker part
-
-    # Streamlit has a unique control flow. It runs the entire script from top to bottom
-    # every time there is interaction with a button. Due to this, I need to implement a workaround:
-    # I save the state of those buttons and store it in the session_state. When the script reruns,
-    # the button's state is retrieved from the session_state, preventing it from being forgotten.
-
-    def get_add_ticker_form_state() -> bool:
-        if 'add_ticker_form_state' not in st.session_state:
-            st.session_state['add_ticker_form_state'] = None
-        return st.session_state['add_ticker_form_state']
-
-    def get_delete_ticker_form_state() -> bool:
-        if 'delete_ticker_form_state' not in st.session_state:
-            st.session_state['delete_ticker_form_state'] = None
-        return st.session_state['delete_ticker_form_state']
-
-    # If the add_ticker button is active this method returns True
-    if get_add_ticker_form_state():
-        with st.sidebar.form('form'):
-            temp_add_input = st.text_input('Add new ticker')
-            cols = st.columns(2)
-            if cols[0].form_submit_button('submit'):
-                ticker_to_add = temp_add_input.upper()
-
-                # Checking if the given ticker is valid
-                if check_ticker_validity(ticker_to_add):
-
-                    # Checking if the given ticker is already in the ticker list
-                    if check_ticker_on_list(TICKER_FILE, ticker_to_add):
-
-                        st.warning('The ticker is already on the list!')
-                        # Keep the warning lane visibile for a while
-                        time.sleep(0.7)
-                    else:
-                        add_ticker(TICKER_FILE,ticker_to_add)
-                        st.success(f'{ticker_to_add} successfully saved!')
-                        # Keep the success lane visibile for a while
-                        time.sleep(0.7)
-
-                else:
-                    st.error(f'{ticker_to_add} is not a valid ticker or its not available!')
-                    # Keep the error lane visibile for a while
-                    time.sleep(1)
-                    st.rerun()
-                st.session_state['add_ticker_form_state']=False
-                st.rerun()
-
-            if cols[1].form_submit_button('cancel'):
-                st.session_state['add_ticker_form_state']=False
-                st.rerun()
-
-    # If the delete ticker button is active this method returns True
-    elif get_delete_ticker_form_state():
-        with st.sidebar.form('form'):
-            pass
-            temp_del_input = st.selectbox(
-                "Choose ticker to delete",
-                ticker_options,
-                index=None
-            )
-
-            cols = st.columns(2)
-            if cols[0].form_submit_button('delete'):
-                ticker_to_del = temp_del_input
-
-                if ticker_to_del is None:
-                    st.warning("Choose a ticker first!")
-        
-                else: 
-                    if delete_ticker(TICKER_FILE,ticker_to_del):
-                        st.success(f'{ticker_to_del} successfully deleted!')
-                        time.sleep(0.5)
-                    else:
-                        st.warning(f'The deletion was unsuccessful!')
-                        time.sleep(0.5)
 
-                st.session_state['delete_ticker_form_state']=False
-                st.rerun()
-
-            if cols[1].form_submit_button('cancel'):
-                st.session_state['delete_ticker_form_state']=False
-                st.rerun()
+@st.cache_resource
+def get_comparison_matrix() -> ComparisonMatrix:
+    """
+    Create the process-wide cache of the aligned comparison data.
+    """
 
-    else:
-        button_cols = st.sidebar.columns(2)
-        if button_cols[0].button('Add new ticker'):
-            st.session_state['add_ticker_form_state'] = True
-            st.rerun()
+    return ComparisonMatrix()
 
-        if button_cols[1].button('Delete ticker'):
-            st.session_state['delete_ticker_form_state'] = True
-            st.rerun()
 
+def _cached_figure(data, kind: str, builder: Callable[[], Figure], *params) -> Figure:
+    """
+    Return the figure from the figure cache, or build it with the builder.
+    The figure is identified by the ticker, the kind of the chart, the version of the data and the params.
+    """
 
-    return option
+    key = (data.ticker, kind, data.data_version, params)
+    return get_figure_cache().get_or_build(key, builder)
 
 
 def _configure_layout(fig: Figure) -> None:
@@ -170,6 +71,7 @@ def _configure_layout(fig: Figure) -> None:
 
 
 
+@traced('render.quarterly_barplot')
 def _quartely_barplot(data:pd.DataFrame) -> Figure:
     """
     Generate a quarterly bar plot using the given DataFrame.
@@ -208,6 +110,7 @@ def _quartely_barplot(data:pd.DataFrame) -> Figure:
 
 
 
+@traced('render.yearly_lineplot')
 def _yearly_lineplot(data:pd.DataFrame) -> Figure:
     """
     Generate a yearly line plot using the given DataFrame.
@@ -234,6 +137,7 @@ def _yearly_lineplot(data:pd.DataFrame) -> Figure:
     return fig
 
 
+@traced('render.quarterly_lineplot')
 def _quarterly_lineplot(data:pd.DataFrame) -> Figure:
     """
     Generate a quarterly line plot using the given DataFrame.
@@ -253,45 +157,135 @@ def _quarterly_lineplot(data:pd.DataFrame) -> Figure:
     return fig
 
 
-def _candlestick_chart(hist: pd.DataFrame, start_date: datetime, end_date: datetime) -> Figure:
+@traced('render.valuation_lineplot')
+def _valuation_lineplot(data: pd.DataFrame, column: str) -> Figure:
+    """
+    Generate a daily line plot of the given valuation ratio.
+
+    Args:
+        data: output df of the src.data_processor's get_valuation_history method
+        column: the ratio to plot ('pe', 'ps', 'pb' or 'earnings_yield')
+
+    """
+
+    fig = go.Figure(data=go.Scatter(x=data['date'], y=data[column]))
+    _configure_layout(fig)
+    return fig
+
+
+@traced('render.comparison_lineplot')
+def _comparison_lineplot(data: pd.DataFrame) -> Figure:
+    """
+    Generate a line plot with a line for every ticker.
+
+    Args:
+        data: output df of the src.comparison's ComparisonMatrix.aligned method
+
+    """
+
+    fig = go.Figure()
+    for ticker in data.columns:
+        fig.add_trace(go.Scatter(x=data.index, y=data[ticker], name=ticker, mode='lines'))
+
+    _configure_layout(fig)
+    return fig
+
+
+@traced('render.candlestick_chart')
+def _candlestick_chart(
+    hist: pd.DataFrame,
+    overlays: Optional[dict[str, pd.DataFrame]] = None
+) -> Figure:
     
     """
-    Generate a candlestick chart using the given DataFrame and date range.
+    Generate a candlestick chart of the whole price history. The shown period is set
+    with _show_period, so the figure can be cached for every period.
 
     Args:
         hist (pd.DataFrame): Input DataFrame with 'Open', 'High', 'Low', 'Close' columns.
-        start_date (datetime): Start date for filtering the data.
-        end_date (datetime): End date for filtering the data.
+        overlays (dict): Optional technical indicators to draw, output of the src.data_processor's get_indicators method.
 
     """
     
-    hist = hist.loc[
-        (hist.index >= pd.to_datetime(start_date)) & 
-        (hist.index <= pd.to_datetime(end_date))
-    ]
-    
     fig = go.Figure(
         data=[go.Candlestick(
             x=hist.index,
             open=hist['Open'], high=hist['High'],
-            low=hist['Low'], close=hist['Close'])
+            low=hist['Low'], close=hist['Close'],
+            name='Price')
         ]
     )
 
+    # Price based indicators share the price axis, the oscillators get a secondary axis
+    has_oscillator = False
+    for name, df in (overlays or {}).items():
+        on_price_axis = INDICATORS[name].panel == 'price'
+        has_oscillator = has_oscillator or not on_price_axis
+        for col in df.columns:
+            fig.add_trace(
+                go.Scatter(
+                    x=df.index,
+                    y=df[col],
+                    name=col,
+                    mode='lines',
+                    line=dict(width=1),
+                    yaxis='y' if on_price_axis else 'y2',
+                )
+            )
+
     fig.update_layout(
         xaxis_rangeslider_visible=False,
         margin=dict(l=20, r=20, t=5, b=40)
     )
 
+    if has_oscillator:
+        fig.update_layout(
+            yaxis2=dict(overlaying='y', side='right', showgrid=False)
+        )
+
     return fig
 
 
-def add_center_panel(data, candlestick_chart_status) -> None:
-    """ 
-    Method to setup the center part of the streamlit page. It containts
-    every information of the choosen ticker.
-    
+def _show_period(
+    fig: Figure,
+    hist: pd.DataFrame,
+    start_date: datetime,
+    end_date: datetime,
+    overlays: Optional[dict[str, pd.DataFrame]] = None
+) -> Figure:
     """
+    Zoom the candlestick chart (a fresh figure of the figure cache) to the period. The price
+    axis is fitted to the prices and the price based indicators of the period.
+    """
+
+    in_period = lambda df: df.loc[
+        (df.index >= pd.to_datetime(start_date)) & 
+        (df.index <= pd.to_datetime(end_date))
+    ]
+
+    prices = [in_period(hist)[['Low', 'High']]]
+    prices += [in_period(df) for name, df in (overlays or {}).items() if INDICATORS[name].panel == 'price']
+    low = pd.Series([df.min().min() for df in prices]).min()
+    high = pd.Series([df.max().max() for df in prices]).max()
+
+    fig.update_layout(xaxis=dict(range=[pd.Timestamp(start_date).isoformat(), pd.Timestamp(end_date).isoformat()]))
+    if pd.notna(low) and pd.notna(high):
+        margin = (high - low) * 0.05
+        fig.update_layout(yaxis=dict(range=[low - margin, high + margin]))
+    return fig
+
+
+# Every section of the center panel is a Streamlit fragment. An interaction with a widget
+# inside a fragment (e.g. the candlestick slider) reruns only that fragment instead of the
+# whole script, so the other figures aren't rebuilt and resent.
+
+@st.fragment(run_every=LIVE_REFRESH_INTERVAL)
+@traced('render.section.header')
+def _header_section(data) -> None:
+    """
+    Header with the name of the company and the main metrics under it.
+    """
+
     name = data.get_name()
     sic_desc = data.get_sic_desc()
 
@@ -340,53 +334,243 @@ def add_center_panel(data, candlestick_chart_status) -> None:
         """
     )
 
-    if candlestick_chart_status:
 
-        # Candlestick chart
-        start_time, end_time = st.slider(
-            "Select period:",
-            value=(datetime(2020, 1, 1, 9, 30),datetime(2023, 10, 15, 9, 30)),
-            format="YYYY/MM/DD"
-        )
-        st.plotly_chart(
-            _candlestick_chart(data.price_hist, start_time, end_time),
-            use_container_width=True
-        )
+@st.fragment(run_every=LIVE_REFRESH_INTERVAL)
+@traced('render.section.candlestick')
+def _candlestick_section(data) -> None:
+    """
+    Candlestick chart with its period slider and the technical indicator selector.
+    """
+
+    if not st.toggle('Show candlestick chart'):
+        return
+
+    end_default = datetime(2023, 10, 15, 9, 30)
+    if LIVE_REFRESH_INTERVAL is not None:
+        # The bar of the live prices is in the default period
+        end_default = max(end_default, data.price_hist.index[-1].to_pydatetime() + timedelta(hours=9, minutes=30))
+
+    start_time, end_time = st.slider(
+        "Select period:",
+        value=(datetime(2020, 1, 1, 9, 30), end_default),
+        format="YYYY/MM/DD"
+    )
+    selected_indicators = st.multiselect("Indicators:", list(INDICATORS))
+    overlays = data.get_indicators(selected_indicators)
+    # The whole history is cached, so moving the slider doesn't build a new figure
+    fig = _cached_figure(
+        data,
+        'candlestick',
+        lambda: _candlestick_chart(data.price_hist, overlays),
+        # The live prices update the last bar without a new data version
+        tuple(selected_indicators), data.price_version
+    )
+    st.plotly_chart(_show_period(fig, data.price_hist, start_time, end_time, overlays), use_container_width=True)
+
+
+@st.fragment
+@traced('render.section.income_revenue')
+def _income_revenue_section(data) -> None:
+    """
+    Quarterly and yearly net income and revenue charts.
+    """
+
+    # The dataframes are only calculated when the figures aren't cached yet
+    net_income = lambda: data.calculate_quarterly_data('income_statement','net_income_loss_attributable_to_parent')
+    revenues = lambda: data.calculate_quarterly_data('income_statement','revenues')
 
     # Net income part
     st.subheader("Net Income")
     col_ni = st.columns(2)
-    df = data.calculate_quarterly_data('income_statement','net_income_loss_attributable_to_parent')
     col_ni[0].caption("Quarterly")
-    col_ni[0].plotly_chart(_quartely_barplot(df),use_container_width=True)
+    col_ni[0].plotly_chart(
+        _cached_figure(data, 'net_income_quarterly', lambda: _quartely_barplot(net_income())),
+        use_container_width=True
+    )
     col_ni[1].caption("Yearly")
-    col_ni[1].plotly_chart(_yearly_lineplot(df),use_container_width=True)
+    col_ni[1].plotly_chart(
+        _cached_figure(data, 'net_income_yearly', lambda: _yearly_lineplot(net_income())),
+        use_container_width=True
+    )
 
     # Revenue part
     st.subheader("Revenue")
     col_charts = st.columns(2)
-    df = data.calculate_quarterly_data('income_statement','revenues')
     col_charts[0].caption("Quarterly")
-    col_charts[0].plotly_chart(_quartely_barplot(df),use_container_width=True)
+    col_charts[0].plotly_chart(
+        _cached_figure(data, 'revenue_quarterly', lambda: _quartely_barplot(revenues())),
+        use_container_width=True
+    )
     col_charts[1].caption("Yearly")
-    col_charts[1].plotly_chart(_yearly_lineplot(df),use_container_width=True)
+    col_charts[1].plotly_chart(
+        _cached_figure(data, 'revenue_yearly', lambda: _yearly_lineplot(revenues())),
+        use_container_width=True
+    )
+
+
+@st.fragment
+@traced('render.section.margins')
+def _margins_section(data) -> None:
+    """
+    TTM profit margin, the EPS reports and the TTM cash flow.
+    """
 
     # TTM profit line plot
-    df_profit_margin = data.get_ttm_profit_margin()
     cols = st.columns(2)
     cols[0].subheader("Profit margin %")
-    cols[0].plotly_chart(_quarterly_lineplot(df_profit_margin),use_container_width=True)
+    cols[0].plotly_chart(
+        _cached_figure(data, 'profit_margin', lambda: _quarterly_lineplot(data.get_ttm_profit_margin())),
+        use_container_width=True
+    )
 
     # EPS report table
     cols[1].subheader("EPS reports %")
     cols[1].dataframe(data.get_earnings_dates().iloc[:7],use_container_width=True)
 
     # TTM Cashflow lineplot
-    df = data.get_ttm_data('cash_flow_statement','net_cash_flow')
     st.subheader("Free cashflow - TTM")
-    st.plotly_chart(_quarterly_lineplot(df),use_container_width=True)
+    st.plotly_chart(
+        _cached_figure(
+            data,
+            'cash_flow_ttm',
+            lambda: _quarterly_lineplot(data.get_ttm_data('cash_flow_statement','net_cash_flow'))
+        ),
+        use_container_width=True
+    )
+
+
+@st.fragment
+@traced('render.section.valuation')
+def _valuation_section(data) -> None:
+    """
+    Historical valuation ratios with a ratio selector.
+    """
+
+    st.subheader("Valuation history")
+    valuation_ratios = {'P/E': 'pe', 'P/S': 'ps', 'P/B': 'pb', 'Earnings yield': 'earnings_yield'}
+    ratio = st.radio(
+        "Valuation ratio",
+        list(valuation_ratios),
+        horizontal=True,
+        label_visibility='collapsed'
+    )
+    fig = _cached_figure(
+        data,
+        'valuation',
+        lambda: _valuation_lineplot(data.get_valuation_history(), valuation_ratios[ratio]),
+        ratio, data.price_version
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+@traced('render.section.news')
+def _news_section(data) -> None:
+    """
+    News table with clickable links.
+    """
 
-    # News table with clickable links
     news_html = data.get_news_html()
     st.subheader("Relevant news")
-    st.markdown(news_html,unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(news_html,unsafe_allow_html=True)
+
+
+# The sections of the center panel with the data they need (the attributes of the DataProcessor)
+CENTER_SECTIONS = [
+    (_header_section, "Company overview", ('details', 'financials', 'price_hist', 'dividend_hist', 'earning_dates')),
+    (_candlestick_section, "Price chart", ('price_hist',)),
+    (_income_revenue_section, "Net income and revenue", ('financials',)),
+    (_margins_section, "Margins and cash flow", ('financials', 'earning_dates')),
+    (_valuation_section, "Valuation history", ('financials', 'price_hist', 'details')),
+    (_news_section, "News", ('news',)),
+]
+
+# Seconds between the checks of a ticker which is still loading in the background
+PENDING_REFRESH_INTERVAL = 2
+
+
+def add_center_panel(data, complete: bool = True) -> None:
+    """ 
+    Method to setup the center part of the streamlit page. It containts
+    every information of the choosen ticker.
+
+    If the data isn't complete (the deadline of the page ran out while it was loading),
+    the sections which have their data are rendered, the others are marked as pending.
+    If a data source was down (data.unavailable), its sections are marked as unavailable.
+    """
+
+    unavailable = data.unavailable
+    down = {attribute for source in unavailable for attribute in SOURCE_ATTRIBUTES[source]}
+
+    for section, title, sources in CENTER_SECTIONS:
+        missing = {source for source in sources if getattr(data, source) is None}
+        if down & missing:
+            st.warning(f"{title}: the data source is unavailable, it will show up when it's back.", icon="⚠️")
+        elif missing and not complete:
+            st.info(f"{title}: still loading...", icon="⏳")
+        else:
+            section(data)
+
+
+@st.fragment(run_every=PENDING_REFRESH_INTERVAL)
+def refresh_when_loaded(is_loaded: Callable[[], bool]) -> None:
+    """
+    Rerun the page when the pending data has been loaded in the background.
+    """
+
+    if is_loaded():
+        st.rerun()
+
+
+@st.fragment(run_every=LIVE_REFRESH_INTERVAL)
+def keep_streaming(watch: Callable[[], None]) -> None:
+    """
+    Keep the live prices of the page's ticker subscribed while the page is open.
+    """
+
+    watch()
+
+
+@st.fragment
+@traced('render.section.comparison_metric')
+def _comparison_metric_section(datas: list, metric: str) -> None:
+    """
+    Line plot of a single metric of the compared tickers.
+    """
+
+    df = get_comparison_matrix().aligned(metric, datas)
+
+    st.subheader(METRICS[metric])
+    missing = [data.ticker for data in datas if data.ticker not in df.columns]
+    if missing:
+        st.caption(f"No comparable data: {', '.join(missing)}")
+
+    # The figure is identified by every compared ticker and their data versions,
+    # the price one also by the versions of the live prices
+    key = (
+        tuple(data.ticker for data in datas),
+        f'comparison_{metric}',
+        tuple(data.data_version for data in datas),
+        tuple(data.price_version for data in datas) if metric == 'price' else ()
+    )
+    fig = get_figure_cache().get_or_build(key, lambda: _comparison_lineplot(df))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def add_comparison_panel(datas: list) -> None:
+    """
+    Method to setup the center part of the streamlit page for the comparison of many tickers.
+    The price performance, the TTM revenue, net income and profit margin are plotted together.
+
+    """
+
+    st.markdown(
+        f"""
+        # Comparison - {', '.join(data.ticker for data in datas)}
+
+        ---
+        """
+    )
+
+    for metric in METRICS:
+        _comparison_metric_section(datas, metric)
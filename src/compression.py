@@ -0,0 +1,330 @@
+"""
+Module containing the compression of the stored payloads (the snapshot files and the shared cache entries).
+
+The payloads are compressed with the fastest available codec:
+
+    - zstd (zstandard package) if it's installed: a better ratio and a faster decode than zlib,
+    - lz4 (lz4 package): the fastest decode, with a lower ratio,
+    - zlib from the standard library, if neither is installed.
+
+COMPRESSION_CODEC in the .env file chooses one ('auto' picks zstd, then zlib).
+
+The Polygon financials repeat the same line items (keys, labels, units) in every filing, so they
+are compressed with a shared dictionary trained on financials payloads (FINANCIALS_DICTIONARY).
+It's a raw content dictionary, so both zstd and zlib (as a preset dictionary) can use it.
+
+Every compressed payload is a self-describing frame: the codec and the id of the dictionary are
+in its header, so a reader decodes it with any configured codec, as long as the codec is installed.
+
+    <magic 2 bytes> <codec id 1 byte> <dictionary id 4 bytes, 0 = none> <compressed data>
+
+Train a new dictionary on the financials of a snapshot (from the repository root):
+
+    python -m src.compression train src/financials.dict /tmp/snapshot/*/financials.json.cz
+
+The trade-offs of the codecs (ratio, compress and decode time) are measured by benchmarks/compression.py.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import struct
+import zlib
+from collections import Counter
+from os import getenv
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+_MAGIC = b'CZ'
+_HEADER = struct.Struct('>2sBI')
+
+# The dictionary trained on the Polygon financials of the test fixtures
+FINANCIALS_DICTIONARY = os.path.join(os.path.dirname(__file__), 'financials.dict')
+# zlib only uses the last 32 KiB of a preset dictionary
+DICTIONARY_SIZE = 32 * 1024
+
+# The registered dictionaries by their id
+_DICTIONARIES: dict[int, bytes] = {}
+
+
+class CompressionError(Exception):
+    def __init__(self, message="The payload can't be decompressed"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class Codec:
+
+    """
+    A compression algorithm. The dictionary is a raw content dictionary (or None).
+    """
+
+    name: str = ''
+    id: int = 0
+    module: Optional[str] = None
+    default_level: int = 0
+
+    def available(self) -> bool:
+        return self.module is None or importlib.util.find_spec(self.module) is not None
+
+    def compress(self, data: bytes, level: int, dictionary: Optional[bytes]) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes, dictionary: Optional[bytes]) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibCodec(Codec):
+
+    name = 'zlib'
+    id = 1
+    default_level = 6
+
+    def compress(self, data: bytes, level: int, dictionary: Optional[bytes]) -> bytes:
+        compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes, dictionary: Optional[bytes]) -> bytes:
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+class ZstdCodec(Codec):
+
+    name = 'zstd'
+    id = 2
+    module = 'zstandard'
+    default_level = 3
+
+    def _dictionary(self, dictionary: Optional[bytes]):
+
+        import zstandard  # type: ignore
+
+        if not dictionary:
+            return None
+        return zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+    def compress(self, data: bytes, level: int, dictionary: Optional[bytes]) -> bytes:
+
+        import zstandard  # type: ignore
+
+        return zstandard.ZstdCompressor(level=level, dict_data=self._dictionary(dictionary)).compress(data)
+
+    def decompress(self, data: bytes, dictionary: Optional[bytes]) -> bytes:
+
+        import zstandard  # type: ignore
+
+        return zstandard.ZstdDecompressor(dict_data=self._dictionary(dictionary)).decompress(data)
+
+
+class LZ4Codec(Codec):
+
+    """The lz4 frames don't support a dictionary, it's ignored."""
+
+    name = 'lz4'
+    id = 3
+    module = 'lz4'
+    default_level = 0
+
+    def compress(self, data: bytes, level: int, dictionary: Optional[bytes]) -> bytes:
+
+        import lz4.frame  # type: ignore
+
+        return lz4.frame.compress(data, compression_level=level)
+
+    def decompress(self, data: bytes, dictionary: Optional[bytes]) -> bytes:
+
+        import lz4.frame  # type: ignore
+
+        return lz4.frame.decompress(data)
+
+
+CODECS: dict[str, Codec] = {codec.name: codec for codec in (ZlibCodec(), ZstdCodec(), LZ4Codec())}
+_CODECS_BY_ID: dict[int, Codec] = {codec.id: codec for codec in CODECS.values()}
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """
+    The codec of the given name, or of COMPRESSION_CODEC. 'auto' is zstd if it's installed, otherwise zlib.
+    """
+
+    name = (name or getenv("COMPRESSION_CODEC") or 'auto').lower()
+    if name == 'auto':
+        return CODECS['zstd'] if CODECS['zstd'].available() else CODECS['zlib']
+
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Unknown compression codec: {name}. Choose from {sorted(CODECS)} or auto")
+    if not codec.available():
+        raise ValueError(f"The {name} codec needs the {codec.module} package")
+    return codec
+
+
+def dictionary_id(dictionary: bytes) -> int:
+    # 0 means no dictionary
+    return zlib.crc32(dictionary) or 1
+
+
+def register_dictionary(dictionary: bytes) -> int:
+    """
+    Make the dictionary available for the decompression. Returns its id.
+    """
+
+    key = dictionary_id(dictionary)
+    _DICTIONARIES[key] = dictionary
+    return key
+
+
+_financials_dictionary: Optional[bytes] = None
+
+
+def financials_dictionary() -> Optional[bytes]:
+    """
+    The shared dictionary of the Polygon financials (registered at the first call), or None if the file is missing.
+    """
+
+    global _financials_dictionary
+
+    if _financials_dictionary is None and os.path.exists(FINANCIALS_DICTIONARY):
+        with open(FINANCIALS_DICTIONARY, 'rb') as f:
+            _financials_dictionary = f.read()
+        register_dictionary(_financials_dictionary)
+    return _financials_dictionary
+
+
+def compress(
+    data: bytes,
+    codec: Optional[str] = None,
+    level: Optional[int] = None,
+    dictionary: Optional[bytes] = None
+) -> bytes:
+    """
+    Compress the data into a frame, with the codec of the given name (or COMPRESSION_CODEC).
+    """
+
+    chosen = get_codec(codec)
+    key = 0
+    if dictionary and not isinstance(chosen, LZ4Codec):
+        key = register_dictionary(dictionary)
+    else:
+        dictionary = None
+
+    payload = chosen.compress(data, chosen.default_level if level is None else level, dictionary)
+    return _HEADER.pack(_MAGIC, chosen.id, key) + payload
+
+
+def is_compressed(data: bytes) -> bool:
+    return data[:2] == _MAGIC and len(data) >= _HEADER.size
+
+
+def decompress(frame: bytes) -> bytes:
+    """
+    Decompress a frame of compress(). Raises CompressionError if it isn't a frame, its codec
+    isn't installed or its dictionary isn't registered.
+    """
+
+    if not is_compressed(frame):
+        raise CompressionError("The payload isn't a compressed frame")
+
+    _, codec_id, key = _HEADER.unpack_from(frame)
+    codec = _CODECS_BY_ID.get(codec_id)
+    if codec is None or not codec.available():
+        raise CompressionError(f"The payload was compressed with an unavailable codec ({codec_id})")
+
+    dictionary = None
+    if key:
+        if key not in _DICTIONARIES:
+            # The shipped dictionary is registered when it's read
+            financials_dictionary()
+        dictionary = _DICTIONARIES.get(key)
+        if dictionary is None:
+            raise CompressionError(f"The dictionary {key} of the payload isn't registered")
+
+    try:
+        return codec.decompress(frame[_HEADER.size:], dictionary)
+    except Exception as error:
+        raise CompressionError(f"The payload can't be decompressed: {error}") from error
+
+
+# The pieces of a JSON payload between the separators, e.g. "unit":"USD"
+_SEGMENT = re.compile(rb'[^,{}\[\]]{4,}')
+# The values of a segment start at its first digit, e.g. "value":165000000.0 or "end_date":"2023-09-30"
+_NUMERIC = re.compile(rb'[-+]?\d')
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Build a raw content dictionary from the repeated segments of the JSON samples.
+    The numeric values (amounts, dates) are cut off, so the dictionary holds the structure of
+    the payloads and not the values of the samples. The segments are ranked by the bytes they
+    would save (count * length), and the most valuable ones are put at the end, where the
+    matches are the cheapest.
+    """
+
+    counts: Counter = Counter()
+    for sample in samples:
+        for segment in _SEGMENT.findall(sample):
+            value = _NUMERIC.search(segment)
+            if value:
+                segment = segment[:value.start()]
+            if len(segment) >= 4:
+                counts[segment] += 1
+
+    ranked = sorted(
+        (segment for segment, count in counts.items() if count > 1),
+        key=lambda segment: counts[segment] * len(segment),
+        reverse=True
+    )
+
+    chosen = []
+    total = 0
+    for segment in ranked:
+        if total + len(segment) + 1 > size:
+            continue
+        chosen.append(segment)
+        total += len(segment) + 1
+
+    return b','.join(reversed(chosen))
+
+
+def _read_sample(file: str) -> bytes:
+    """
+    Read a JSON file of a snapshot (compressed or not) into compact JSON bytes.
+    """
+
+    with open(file, 'rb') as f:
+        content = f.read()
+    if is_compressed(content):
+        content = decompress(content)
+    elif content[:2] == b'\x1f\x8b':
+        import gzip
+        content = gzip.decompress(content)
+    return json.dumps(json.loads(content), separators=(',', ':')).encode()
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Compression dictionaries of the stored payloads.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train = subparsers.add_parser('train', help="Train a dictionary on JSON payloads.")
+    train.add_argument('output', help="The dictionary file to write.")
+    train.add_argument('files', nargs='+', help="The JSON files (e.g. the financials of a snapshot).")
+    train.add_argument('--size', type=int, default=DICTIONARY_SIZE, help="The maximum size in bytes.")
+
+    args = parser.parse_args()
+
+    dictionary = train_dictionary((_read_sample(file) for file in args.files), args.size)
+    with open(args.output, 'wb') as f:
+        f.write(dictionary)
+    print(f"{args.output}: {len(dictionary)} bytes, id {dictionary_id(dictionary)}")
+
+
+if __name__ == '__main__':
+    main()
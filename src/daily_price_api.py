@@ -1,6 +1,59 @@
 import yfinance as yf # type: ignore
 import pandas as pd
+import requests
+from os import getenv
 from typing import Optional
+from src.circuit_breaker import CircuitBreaker
+from src.retry import RetryPolicy
+from src.timeouts import request_timeout
+from src.tracing import traced
+
+
+def _is_transient(error: Exception) -> bool:
+    """
+    The dropped connections, the timeouts and the rate limited or server error responses of Yahoo.
+    """
+
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class _TimeoutSession(requests.Session):
+
+    """
+    Session of the yfinance requests. Every request gets the connect and read timeouts
+    (cut to the rest of the page deadline), even where yfinance doesn't set one.
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        connect, read = request_timeout()
+        timeout = kwargs.get('timeout')
+        if isinstance(timeout, (int, float)):
+            read = min(read, timeout)
+        kwargs['timeout'] = (connect, read)
+        return super().request(method, url, *args, **kwargs)
+
+
+SESSION: requests.Session = _TimeoutSession()
+
+RETRY_POLICY: RetryPolicy = RetryPolicy(
+    'yfinance',
+    retryable=_is_transient,
+    max_attempts=int(getenv("RETRY_MAX_ATTEMPTS", 4)),
+    deadline=float(getenv("RETRY_DEADLINE", 60)),
+    budget_per_minute=int(getenv("RETRY_BUDGET_PER_MINUTE", 10))
+)
+
+# The transient errors count as the failures of the source (see src/circuit_breaker.py)
+BREAKER: CircuitBreaker = CircuitBreaker(
+    'yfinance',
+    failures=_is_transient,
+    failure_threshold=int(getenv("BREAKER_FAILURE_THRESHOLD", 5)),
+    recovery_timeout=float(getenv("BREAKER_RECOVERY_TIMEOUT", 30))
+)
 
 
 class PriceAPI():
@@ -14,30 +67,32 @@ class PriceAPI():
     def __init__(self,ticker:str) -> None:
 
         self.ticker: str = ticker
-        self.data: yf.Ticker = yf.Ticker(self.ticker)
+        self.data: yf.Ticker = yf.Ticker(self.ticker, session=SESSION)
         self.price_hist: Optional[pd.DataFrame] = None
         self.dividend_hist: Optional[pd.DataFrame] = None
         self.earning_dates: Optional[pd.DataFrame] = None
         
 
+    @traced('yfinance.get_history')
     def get_history(self) -> None:
         """
         Retrieve historical price and dividend data for the specified stock for the last 5 years.
         The results are stored in the dividend_hist and the price_hist attributes
         """
         
-        df = self.data.history(period='5y')
+        df = RETRY_POLICY.call('yfinance.history', BREAKER.call, self.data.history, period='5y')
         df.index = pd.to_datetime(df.index, utc=True).tz_convert('America/New_York').tz_localize(None)
         self.price_hist = df[['Open','High','Low','Close','Volume']]
         self.dividend_hist = df[['Dividends']]
 
+    @traced('yfinance.get_earnings_dates')
     def get_earnings_dates(self) -> None:
 
         """
         Retrieve earnings dates data for the specified stock.
         """
 
-        df = self.data.get_earnings_dates()
+        df = RETRY_POLICY.call('yfinance.earnings_dates', BREAKER.call, self.data.get_earnings_dates)
         df.index = pd.to_datetime(df.index, utc=True).tz_convert('America/New_York').tz_localize(None)
         self.earning_dates = df
 
@@ -1,12 +1,21 @@
 import pandas as pd 
 import numpy as np
 import re
+import functools
+import uuid
 from datetime import datetime, timedelta
 from src.polygon_api import PolygonAPI
 from src.daily_price_api import PriceAPI
+from src.indicators import IndicatorEngine
+from src.tracing import traced
 from typing import Optional, Any
 
 
+# When a filing has no filing date, its data is used only this long after the end of the period
+# (the deadline of the annual reports is 60-90 days, of the quarterly ones 40-45 days)
+FILING_LAG = timedelta(days=90)
+
+
 
 class IncorrectDataError(Exception):
     def __init__(self, message="IncompleteDataError"):
@@ -20,6 +29,24 @@ class MissingAttributeError(Exception):
         super().__init__(self.message)
 
 
+def _memoize(method):
+    """
+    Cache the result of a DataProcessor method per arguments on the instance.
+    A copy is returned, so the callers can modify the result in place.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        # The cache can be replaced by a price update meanwhile (update_last_bar)
+        cache = self._derived_cache
+        if key not in cache:
+            cache[key] = method(self, *args, **kwargs)
+        return cache[key].copy()
+
+    return wrapper
+
+
 def fiscal_to_calender_converter(date: str) -> str:
 
     """ 
@@ -91,7 +118,14 @@ class DataProcessor:
         self.dividend_hist: Optional[pd.DataFrame] = price_api.dividend_hist
         self.earning_dates: Optional[pd.DataFrame] = price_api.earning_dates
         self.news: Optional[list[dict]] = fin_api.news
-
+        self._indicator_engine: Optional[IndicatorEngine] = None
+        self._derived_cache: dict[tuple, Any] = {}
+        # Identifies the current state of the data, e.g. for the figure cache
+        self.data_version: str = uuid.uuid4().hex
+        # The sources which were down when the ticker was loaded, with their errors
+        self.unavailable: dict[str, str] = {}
+        # Increased by every update of the prices (see update_last_bar), e.g. for the figure cache
+        self.price_version: int = 0
 
 
     def _fin_content(self) -> dict[str,list]:
@@ -105,10 +139,13 @@ class DataProcessor:
         return { i[0]:list(i[1].keys()) for i in self.financials[0]['financials'].items()}
     
 
-    def _extract_from_fin(self, financial: str, metric: str) -> dict:
+    def _extract_from_fin(self, financial: str, metric: str, year_from: Optional[int] = None) -> dict:
 
         """
         Extracts financial data for a given metric.
+        With year_from, only the filings of the fiscal years from the year before it are read
+        (a fiscal year can end in the next calendar year), so a long history isn't processed
+        for the recent years, and the older filings can't fail the extraction.
         """
 
         if self.financials is None:
@@ -117,6 +154,7 @@ class DataProcessor:
         result: dict = {
             'start_date': [],
             'end_date': [],
+            'filing_date': [],
             'timeframe':[],
             'fiscal_period':[],
             'fiscal_year':[],
@@ -124,10 +162,13 @@ class DataProcessor:
         }
 
         for i in self.financials:
+            if year_from is not None and int(i['fiscal_year']) < year_from - 1:
+                continue
             value = i['financials'][financial].get(metric)
             if value is not None:
                 result['start_date'].append(i['start_date'])
                 result['end_date'].append(i['end_date'])
+                result['filing_date'].append(i.get('filing_date'))
                 result['timeframe'].append(i['timeframe'])
                 result['fiscal_period'].append(i['fiscal_period'])
                 result['fiscal_year'].append(i['fiscal_year'])
@@ -138,6 +179,7 @@ class DataProcessor:
         return result
 
     
+    @traced('data_processor.calculate_quarterly_data')
     def calculate_quarterly_data(self, financial: str, metric: str, year_from:int =2018) -> pd.DataFrame:
 
         """ 
@@ -148,7 +190,7 @@ class DataProcessor:
         last quarters. If the required data is not available, an exception is raised.
         """
 
-        data = self._extract_from_fin(financial, metric)
+        data = self._extract_from_fin(financial, metric, year_from)
         df = pd.DataFrame(data)
 
         quarterly_df = df[df['timeframe'] == 'quarterly']
@@ -207,7 +249,11 @@ class DataProcessor:
         df['end_date'] = pd.to_datetime(df['end_date'])
         df['quarter'] = df['end_date'].dt.quarter
         df['year'] = df['end_date'].dt.year
-        df = df[['fiscal_end_date','end_date','year','quarter', 'value']]
+        # The date the data became public, the Q4 values with the annual report
+        df['filing_date'] = pd.to_datetime(df['filing_date']).fillna(
+            pd.to_datetime(df['fiscal_end_date']) + FILING_LAG
+        )
+        df = df[['fiscal_end_date','end_date','year','quarter', 'value', 'filing_date']]
 
         # Filtering the df based on the input parameter
         result = df.loc[df.year >= year_from]
@@ -229,6 +275,7 @@ class DataProcessor:
 
 
 
+    @traced('data_processor.get_ttm_data')
     def get_ttm_data(self,financial: str, metric: str, year_from:int =2018) -> pd.DataFrame:
         """
         Retrieves trailing twelve months (TTM) data for the given metric.
@@ -243,6 +290,7 @@ class DataProcessor:
         return df
     
     
+    @traced('data_processor.get_yearly_avg_data')
     def get_yearly_avg_data(self,financial: str, metric: str, year_from:int =2018) -> pd.DataFrame:
         """ 
         
@@ -255,6 +303,7 @@ class DataProcessor:
 
         return df
 
+    @traced('data_processor.get_name')
     def get_name(self) -> str:
         """
         Get the name of the company
@@ -266,6 +315,7 @@ class DataProcessor:
         return self.details['name']
     
 
+    @traced('data_processor.get_market_cap')
     def get_market_cap(self) -> float:
         """
         Get the market capitalization.
@@ -277,6 +327,7 @@ class DataProcessor:
         return self.details['market_cap']
     
 
+    @traced('data_processor.get_sic_desc')
     def get_sic_desc(self) -> str:
         """
         Get the SIC (Standard Industrial Classification) description.
@@ -288,6 +339,7 @@ class DataProcessor:
         return self.details['sic_description']
     
 
+    @traced('data_processor.get_curr_prev_price')
     def get_curr_prev_price(self) -> dict[str,float]:
         """
         Get the current and previous (daily) closing prices.
@@ -302,6 +354,50 @@ class DataProcessor:
         }
     
 
+    @traced('data_processor.get_indicators')
+    def get_indicators(self, names: list[str]) -> dict[str, pd.DataFrame]:
+        """
+        Get the given technical indicators (see src.indicators.INDICATORS) over the price history.
+        The indicators are computed once and cached together with the other data of the ticker.
+        """
+
+        if self.price_hist is None:
+            raise MissingAttributeError("Missing the the required attributes: price_hist")
+
+        if self._indicator_engine is None:
+            self._indicator_engine = IndicatorEngine(self.price_hist)
+
+        return {name: self._indicator_engine.get(name) for name in names}
+
+
+    @traced('data_processor.update_last_bar')
+    def update_last_bar(self, bars: pd.DataFrame) -> None:
+        """
+        Append new daily bars to the price history, or replace the last (still forming) one
+        if the first bar has its date, e.g. with the trades of the live price stream.
+        The indicators are updated incrementally, and price_version is increased.
+
+        The price history and the indicators are replaced, not modified in place,
+        so the sessions reading them at the same time see either the old or the new state.
+        """
+
+        if self.price_hist is None:
+            raise MissingAttributeError("Missing the the required attributes: price_hist")
+
+        if self._indicator_engine is None:
+            engine = IndicatorEngine(self.price_hist)
+        else:
+            engine = self._indicator_engine.copy()
+        engine.append(bars)
+
+        self._indicator_engine = engine
+        self.price_hist = engine.price_hist
+        # The memoized results are derived from the prices
+        self._derived_cache = {}
+        self.price_version += 1
+
+
+    @traced('data_processor.get_eps')
     def get_eps(self) -> float:
         """
         Get the earnings per share (EPS)
@@ -317,6 +413,7 @@ class DataProcessor:
         return ttm_incomes / self.details['weighted_shares_outstanding']
     
     
+    @traced('data_processor.get_pe')
     def get_pe(self) -> float:
         """
         Get the price-to-earnings (P/E) ratio.
@@ -324,6 +421,7 @@ class DataProcessor:
         return self.get_curr_prev_price()['current']  / self.get_eps()
     
 
+    @traced('data_processor.get_52week_low')
     def get_52week_low(self) -> float:
         """
         Get the 52-week low price.
@@ -337,6 +435,7 @@ class DataProcessor:
         return df[df.index >= date]['Low'].min()
     
 
+    @traced('data_processor.get_52week_high')
     def get_52week_high(self) -> float:
         """ 
         Get the 52-week high price.
@@ -350,6 +449,7 @@ class DataProcessor:
         return df[df.index >= date]['High'].max()
     
 
+    @traced('data_processor.get_next_report_date')
     def get_next_report_date(self) -> str:
         """
         Get the date of the next earnings report.
@@ -363,6 +463,7 @@ class DataProcessor:
         return df.index[-1].date().strftime('%Y-%m-%d')
     
 
+    @traced('data_processor.get_earnings_dates')
     def get_earnings_dates(self) -> pd.DataFrame:
         """
         Get a DataFrame of earnings dates containing historically the reported and the estimated EPS
@@ -376,6 +477,7 @@ class DataProcessor:
         return df
 
 
+    @traced('data_processor.get_ttm_profit_margin')
     def get_ttm_profit_margin(self) -> pd.DataFrame:
         """
         Get the trailing twelve months (TTM) profit margin.
@@ -398,6 +500,60 @@ class DataProcessor:
         return df[['end_date','year','quarter','value']]
         
     
+    @traced('data_processor.get_valuation_history')
+    @_memoize
+    def get_valuation_history(self, year_from: int = 2018) -> pd.DataFrame:
+        """
+        Get the daily historical valuation ratios: P/E, P/S, P/B and earnings yield.
+
+        Every trading day is matched with the latest TTM net income, TTM revenue and equity
+        which had already been filed on that day, using a single as-of join, so no value is
+        used before it was public. The market capitalization is estimated with the current
+        weighted shares outstanding.
+        """
+
+        if self.price_hist is None:
+            raise MissingAttributeError("Missing the the required attributes: price_hist")
+
+        if self.details is None:
+            raise MissingAttributeError("Missing the the required attributes: details")
+
+        income = self.get_ttm_data('income_statement','net_income_loss_attributable_to_parent', year_from)
+        revenue = self.get_ttm_data('income_statement','revenues', year_from)
+        equity = self.calculate_quarterly_data('balance_sheet','equity_attributable_to_parent', year_from)
+
+        fundamentals = (
+            income[['end_date','value','filing_date']].rename(columns={'value':'income','filing_date':'income_filed'})
+            .merge(revenue[['end_date','value','filing_date']].rename(columns={'value':'revenue','filing_date':'revenue_filed'}), on='end_date')
+            .merge(equity[['end_date','value','filing_date']].rename(columns={'value':'equity','filing_date':'equity_filed'}), on='end_date')
+            .sort_values(by='end_date')
+        )
+        # A quarter is known when all of its values have been filed, and not before the earlier quarters
+        fundamentals['filing_date'] = fundamentals[['income_filed','revenue_filed','equity_filed']].max(axis=1).cummax()
+
+        prices = self.price_hist[['Close']].sort_index()
+        prices = prices.rename_axis('date').reset_index()
+        prices['date'] = pd.to_datetime(prices['date'])
+
+        df = pd.merge_asof(
+            prices,
+            fundamentals,
+            left_on='date',
+            right_on='filing_date',
+            direction='backward'
+        )
+        df = df.loc[df['end_date'].notnull()]
+
+        market_cap = df['Close'] * self.details['weighted_shares_outstanding']
+        df['pe'] = market_cap / df['income']
+        df['ps'] = market_cap / df['revenue']
+        df['pb'] = market_cap / df['equity']
+        df['earnings_yield'] = df['income'] / market_cap
+
+        return df[['date','end_date','pe','ps','pb','earnings_yield']].reset_index(drop=True)
+
+
+    @traced('data_processor.get_profit_margin')
     def get_profit_margin(self) -> float:
         """
         Get the current profit margin.
@@ -405,6 +561,7 @@ class DataProcessor:
         return self.get_ttm_profit_margin().iloc[-1]['value']
     
 
+    @traced('data_processor.get_yearly_price_change')
     def get_yearly_price_change(self) -> float:
         """ 
         Get the percentage change in price over the last year.
@@ -425,6 +582,7 @@ class DataProcessor:
         return (curr_price/ly_price -1)
     
     
+    @traced('data_processor.get_div_yield')
     def get_div_yield(self) -> float:
         """
         Get the current dividend yield.
@@ -441,6 +599,7 @@ class DataProcessor:
         return (div_ttm / self.get_curr_prev_price()['current'])
 
 
+    @traced('data_processor.get_roe')
     def get_roe(self) -> float:
         """
         Get the return on equity (ROE).
@@ -453,6 +612,7 @@ class DataProcessor:
         return (last_ttm_net_income / avg_equity_sh)
     
 
+    @traced('data_processor.get_news_df')
     def get_news_df(self) -> pd.DataFrame:
         """
         Get a DataFrame of news articles and its urls regarding the relevant company
@@ -477,6 +637,7 @@ class DataProcessor:
         })
 
 
+    @traced('data_processor.get_news_html')
     def get_news_html(self) -> str:
         """
         Get an HTML representation of news articles with clickable links.
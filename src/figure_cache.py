@@ -0,0 +1,204 @@
+"""
+Module containing a cache for the serialized Plotly figures of the page.
+
+Building a figure (pivot tables, trace validation) takes tens of milliseconds and the
+result only changes when the data of the ticker changes. The FigureCache stores the
+JSON spec of every figure keyed by (ticker, chart kind, data version, parameters) and
+serves it back without rebuilding or revalidating the figure. With a SharedCache
+(src.shared_cache) the specs built by one replica of the app are served to the others.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import plotly.graph_objects as go # type: ignore
+from plotly.graph_objs._figure import Figure  # type: ignore
+from src.shared_cache import SharedCache
+
+
+class CachedFigure(go.Figure):
+
+    """
+    A render-only figure built from a cached JSON spec.
+
+    Streamlit's st.plotly_chart serializes a figure through its to_dict method, so
+    returning the cached spec from there skips the expensive trace validation.
+    The traces aren't loaded into the object itself (e.g. fig.data is empty), but
+    update_layout works: its updates are merged into the layout of the spec.
+    """
+
+    def __init__(self, spec: str) -> None:
+        self._layout_updates: dict[str, Any] = {}
+        super().__init__()
+        self._spec = spec
+
+    def update_layout(self, dict1: Optional[dict] = None, overwrite: bool = False, **kwargs) -> "CachedFigure":
+        for key, value in {**(dict1 or {}), **kwargs}.items():
+            if isinstance(value, dict) and not overwrite:
+                self._layout_updates.setdefault(key, {}).update(value)
+            else:
+                self._layout_updates[key] = value
+        return self
+
+    def to_dict(self) -> dict:
+        spec = json.loads(self._spec)
+        layout = spec.setdefault('layout', {})
+        for key, value in self._layout_updates.items():
+            if isinstance(value, dict) and isinstance(layout.get(key), dict):
+                layout[key] = {**layout[key], **value}
+            else:
+                layout[key] = value
+        return spec
+
+    def to_plotly_json(self) -> dict:
+        return self.to_dict()
+
+    def to_json(self, *args, **kwargs) -> str:
+        return json.dumps(self.to_dict()) if self._layout_updates else self._spec
+
+
+class _Entry:
+
+    """A cached figure spec with the time it took to build it."""
+
+    __slots__ = ('spec', 'build_time')
+
+    def __init__(self, spec: str, build_time: float) -> None:
+        self.spec = spec
+        self.build_time = build_time
+
+
+class FigureCache:
+
+    """
+    A thread-safe LRU cache of serialized figures.
+
+    The key is (ticker, kind, data_version, params). When a new data version of a ticker
+    shows up, the entries of the older versions are dropped.
+
+    Args:
+        max_entries: The maximum number of figures kept in the memory.
+        shared: Optional cache shared by the replicas, checked on a local miss.
+
+    An example of usage:
+
+    cache = FigureCache(max_entries=500)
+    fig = cache.get_or_build(('MSFT', 'revenue_bar', data.data_version, ()), build_function)
+    """
+
+    def __init__(self, max_entries: int = 500, shared: Optional[SharedCache] = None) -> None:
+
+        self.max_entries: int = max_entries
+        self.shared: Optional[SharedCache] = shared
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._versions: dict[Hashable, Hashable] = {}
+        self._lock = threading.Lock()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._shared_hits: int = 0
+        self._invalidations: int = 0
+        self._time_saved: float = 0.0
+        self._last_saved: float = 0.0
+
+
+    def _drop_old_versions(self, ticker: Hashable, version: Hashable) -> None:
+        """
+        Remove the entries of the ticker which belong to another data version.
+        """
+
+        if self._versions.get(ticker, version) != version:
+            stale = [key for key in self._entries if key[0] == ticker and key[2] != version]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+
+        self._versions[ticker] = version
+
+
+    def get_or_build(self, key: tuple, builder: Callable[[], Figure]) -> Figure:
+        """
+        Return the cached figure of the key, or build, serialize and store it.
+        """
+
+        ticker, _, version, _ = key
+        start = time.perf_counter()
+
+        with self._lock:
+            self._drop_old_versions(ticker, version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None:
+            fig = CachedFigure(entry.spec)
+            saved = entry.build_time - (time.perf_counter() - start)
+            with self._lock:
+                self._hits += 1
+                self._time_saved += saved
+                self._last_saved = saved
+            return fig
+
+        # Built by another replica, with the build time of that replica
+        shared_key = repr(key)
+        shared_entry = self.shared.get(shared_key) if self.shared is not None else None
+        if shared_entry is not None:
+            spec, build_time = shared_entry
+            with self._lock:
+                self._shared_hits += 1
+                self._store(key, _Entry(spec, build_time))
+            return CachedFigure(spec)
+
+        fig = builder()
+        spec = fig.to_json()
+        build_time = time.perf_counter() - start
+
+        with self._lock:
+            self._misses += 1
+            self._store(key, _Entry(spec, build_time))
+
+        if self.shared is not None:
+            self.shared.put(shared_key, (spec, build_time))
+
+        return fig
+
+
+    def _store(self, key: tuple, entry: _Entry) -> None:
+
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+    def invalidate(self, ticker: Hashable) -> None:
+        """
+        Remove every cached figure of the given ticker.
+        """
+
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == ticker]
+            for key in stale:
+                del self._entries[key]
+            self._versions.pop(ticker, None)
+            self._invalidations += len(stale)
+
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the hit/miss statistics and the rendering time saved by the cache.
+        """
+
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'shared_hits': self._shared_hits,
+                'invalidations': self._invalidations,
+                'time_saved_ms': round(self._time_saved * 1000, 2),
+                'avg_saved_per_hit_ms': round(self._time_saved / self._hits * 1000, 2) if self._hits else 0.0,
+                'last_saved_ms': round(self._last_saved * 1000, 2),
+            }
@@ -0,0 +1,359 @@
+"""
+Module containing vectorized technical indicators computed over the price history
+of the PriceAPI (price_hist DataFrame with 'Open', 'High', 'Low', 'Close', 'Volume' columns).
+
+Every indicator function has the same signature: it gets a chunk of bars (a DataFrame or a
+dict of NumPy arrays) and the state returned by the previous call, and it returns the indicator
+columns of the chunk together with the new state. This makes it possible to extend the indicators
+incrementally when new bars are appended, without recomputing the whole history.
+"""
+
+from typing import Any, Callable, NamedTuple, Optional
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+State = Optional[dict[str, Any]]
+Columns = dict[str, np.ndarray]
+
+BAR_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def _col(bars: Any, name: str) -> np.ndarray:
+    return np.asarray(bars[name], dtype=float)
+
+
+def _ewm(values: np.ndarray, alpha: float, seed: Optional[float] = None) -> np.ndarray:
+    """
+    Exponentially weighted mean (y = (1 - alpha) * y_prev + alpha * x), optionally continued from a seed.
+    NaN values are skipped and keep the previous mean, like in pandas' ewm(adjust=False, ignore_na=True).
+
+    The recursion is solved in closed form over blocks: inside a block
+    y_j = d^(j+1) * (y_prev + alpha * sum(x_m / d^(m+1))) where d = 1 - alpha. The block length
+    is chosen so that 1 / d^(m+1) stays below 1e9: the large terms are scaled back by d^(j+1),
+    so the relative error stays at the level of the float64 rounding error.
+    """
+
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+
+    if seed is not None and np.isnan(seed):
+        seed = None
+
+    valid = np.flatnonzero(~np.isnan(values))
+    # The values before the first valid one keep the seed
+    out[:valid[0] if len(valid) else len(values)] = np.nan if seed is None else seed
+    if len(valid) == 0:
+        return out
+
+    # The recursion runs over the valid values only
+    compact = values[valid]
+    means = np.empty(len(compact))
+    start = 0
+
+    if seed is None:
+        seed = compact[0]
+        means[0] = seed
+        start = 1
+
+    decay = 1 - alpha
+    block = max(1, int(np.log(1e9) / -np.log(decay))) if decay > 0 else 1
+    powers = decay ** np.arange(1, block + 1)
+
+    prev = seed
+    for i in range(start, len(compact), block):
+        chunk = compact[i:i + block]
+        weights = powers[:len(chunk)]
+        if decay > 0:
+            means[i:i + len(chunk)] = weights * (prev + alpha * np.cumsum(chunk / weights))
+        else:
+            means[i:i + len(chunk)] = chunk
+        prev = means[i + len(chunk) - 1]
+
+    # Every later value gets the mean as of the last valid value up to it
+    last_valid = np.searchsorted(valid, np.arange(valid[0], len(values)), side='right') - 1
+    out[valid[0]:] = means[last_valid]
+
+    return out
+
+
+def _last(values: np.ndarray, default: Optional[float]) -> Optional[float]:
+    return float(values[-1]) if len(values) else default
+
+
+def _rolling(values: np.ndarray, tail: Optional[np.ndarray], window: int,
+             func: Callable[[np.ndarray], np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Apply func on the rolling windows ending at each element of values.
+    The tail contains the last (window - 1) values of the previous chunk.
+
+    Returns the results (NaN where the window isn't full) and the new tail.
+    """
+
+    tail = np.array([], dtype=float) if tail is None else tail
+    full = np.concatenate([tail, values]).astype(float)
+    out = np.full(len(values), np.nan)
+
+    if len(full) >= window and len(values) > 0:
+        windowed = func(sliding_window_view(full, window))
+        # The window of values[j] ends at full[len(tail) + j]
+        first = len(tail) - window + 1
+        start = max(first, 0)
+        out[start - first:] = windowed[start:start + len(values) - (start - first)]
+
+    new_tail = full[len(full) - (window - 1):] if window > 1 else np.array([], dtype=float)
+    return out, new_tail
+
+
+def sma(bars: Any, state: State = None, window: int = 20) -> tuple[Columns, dict]:
+    """
+    Simple moving average of the closing price.
+    """
+
+    state = state or {}
+    values, tail = _rolling(_col(bars, 'Close'), state.get('tail'), window, lambda w: w.mean(axis=1))
+    return {f'SMA {window}': values}, {'tail': tail}
+
+
+def ema(bars: Any, state: State = None, span: int = 20) -> tuple[Columns, dict]:
+    """
+    Exponential moving average of the closing price.
+    """
+
+    state = state or {}
+    values = _ewm(_col(bars, 'Close'), 2 / (span + 1), state.get('ema'))
+    return (
+        {f'EMA {span}': values},
+        {'ema': _last(values, state.get('ema'))}
+    )
+
+
+def rsi(bars: Any, state: State = None, window: int = 14) -> tuple[Columns, dict]:
+    """
+    Relative strength index with Wilder's smoothing.
+    """
+
+    state = state or {}
+    close = _col(bars, 'Close')
+    prev_close = state.get('prev_close')
+
+    delta = np.diff(close, prepend=np.nan if prev_close is None else prev_close)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    # The very first bar has no previous close
+    gain[np.isnan(delta)] = np.nan
+    loss[np.isnan(delta)] = np.nan
+
+    avg_gain = _ewm(gain, 1 / window, state.get('avg_gain'))
+    avg_loss = _ewm(loss, 1 / window, state.get('avg_loss'))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    values[np.isnan(avg_gain)] = np.nan
+
+    return {f'RSI {window}': values}, {
+        'prev_close': _last(close, prev_close),
+        'avg_gain': _last(avg_gain, state.get('avg_gain')),
+        'avg_loss': _last(avg_loss, state.get('avg_loss')),
+    }
+
+
+def macd(bars: Any, state: State = None, fast: int = 12, slow: int = 26,
+         signal: int = 9) -> tuple[Columns, dict]:
+    """
+    Moving average convergence divergence with its signal line and histogram.
+    """
+
+    state = state or {}
+    close = _col(bars, 'Close')
+
+    fast_ema = _ewm(close, 2 / (fast + 1), state.get('fast'))
+    slow_ema = _ewm(close, 2 / (slow + 1), state.get('slow'))
+    macd_line = fast_ema - slow_ema
+    signal_line = _ewm(macd_line, 2 / (signal + 1), state.get('signal'))
+
+    return {
+        'MACD': macd_line,
+        'MACD signal': signal_line,
+        'MACD hist': macd_line - signal_line,
+    }, {
+        'fast': _last(fast_ema, state.get('fast')),
+        'slow': _last(slow_ema, state.get('slow')),
+        'signal': _last(signal_line, state.get('signal')),
+    }
+
+
+def bollinger(bars: Any, state: State = None, window: int = 20,
+              num_std: float = 2) -> tuple[Columns, dict]:
+    """
+    Bollinger bands: rolling mean of the closing price +/- num_std rolling standard deviations.
+    """
+
+    state = state or {}
+    close = _col(bars, 'Close')
+    middle, tail = _rolling(close, state.get('tail'), window, lambda w: w.mean(axis=1))
+    std, _ = _rolling(close, state.get('tail'), window, lambda w: w.std(axis=1))
+
+    return {
+        'BB upper': middle + num_std * std,
+        'BB middle': middle,
+        'BB lower': middle - num_std * std,
+    }, {'tail': tail}
+
+
+def atr(bars: Any, state: State = None, window: int = 14) -> tuple[Columns, dict]:
+    """
+    Average true range with Wilder's smoothing.
+    """
+
+    state = state or {}
+    high = _col(bars, 'High')
+    low = _col(bars, 'Low')
+    close = _col(bars, 'Close')
+    prev_close = state.get('prev_close')
+
+    shifted = np.concatenate([[np.nan if prev_close is None else prev_close], close])[:-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - shifted), np.abs(low - shifted)))
+    values = _ewm(true_range, 1 / window, state.get('atr'))
+
+    return {f'ATR {window}': values}, {
+        'prev_close': _last(close, prev_close),
+        'atr': _last(values, state.get('atr')),
+    }
+
+
+def vwap(bars: Any, state: State = None, window: int = 20) -> tuple[Columns, dict]:
+    """
+    Rolling volume weighted average price of the typical price ((High + Low + Close) / 3).
+    """
+
+    state = state or {}
+    typical = (_col(bars, 'High') + _col(bars, 'Low') + _col(bars, 'Close')) / 3
+    volume = _col(bars, 'Volume')
+
+    price_volume, pv_tail = _rolling(typical * volume, state.get('pv_tail'), window, lambda w: w.sum(axis=1))
+    volume_sum, v_tail = _rolling(volume, state.get('v_tail'), window, lambda w: w.sum(axis=1))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = price_volume / volume_sum
+
+    return (
+        {f'VWAP {window}': values},
+        {'pv_tail': pv_tail, 'v_tail': v_tail}
+    )
+
+
+class IndicatorSpec(NamedTuple):
+    func: Callable[..., tuple[Columns, dict]]
+    params: dict[str, Any]
+    # 'price' indicators are drawn on the price axis, 'oscillator' ones on a secondary axis
+    panel: str
+
+
+INDICATORS: dict[str, IndicatorSpec] = {
+    'SMA 20': IndicatorSpec(sma, {'window': 20}, 'price'),
+    'SMA 50': IndicatorSpec(sma, {'window': 50}, 'price'),
+    'SMA 200': IndicatorSpec(sma, {'window': 200}, 'price'),
+    'EMA 20': IndicatorSpec(ema, {'span': 20}, 'price'),
+    'EMA 50': IndicatorSpec(ema, {'span': 50}, 'price'),
+    'Bollinger bands': IndicatorSpec(bollinger, {'window': 20, 'num_std': 2}, 'price'),
+    'VWAP 20': IndicatorSpec(vwap, {'window': 20}, 'price'),
+    'RSI 14': IndicatorSpec(rsi, {'window': 14}, 'oscillator'),
+    'MACD': IndicatorSpec(macd, {'fast': 12, 'slow': 26, 'signal': 9}, 'oscillator'),
+    'ATR 14': IndicatorSpec(atr, {'window': 14}, 'oscillator'),
+}
+
+
+class IndicatorEngine:
+
+    """
+    Computes and caches the indicators of a single ticker's price history.
+
+    The engine stores every indicator's state as of the second to last bar, so appending
+    new bars (or replacing the last, still forming bar) only recomputes the tail.
+
+    An example of usage:
+
+    engine = IndicatorEngine(price_api.price_hist)
+    engine.get('RSI 14')
+    engine.append(new_bars)
+    """
+
+    def __init__(self, price_hist: pd.DataFrame) -> None:
+
+        self.price_hist: pd.DataFrame = price_hist
+        self._bars: Columns = {col: _col(price_hist, col) for col in BAR_COLUMNS}
+        self._results: dict[str, Columns] = {}
+        self._states: dict[str, State] = {}
+
+
+    @staticmethod
+    def _run(spec: IndicatorSpec, bars: Columns, state: State) -> tuple[Columns, State]:
+        """
+        Compute the indicator over the bars. Returns the values and the state before the last bar.
+        """
+
+        head, state_before_last = spec.func({k: v[:-1] for k, v in bars.items()}, state, **spec.params)
+        last, _ = spec.func({k: v[-1:] for k, v in bars.items()}, state_before_last, **spec.params)
+        return {col: np.concatenate([head[col], last[col]]) for col in head}, state_before_last
+
+
+    def get(self, name: str) -> pd.DataFrame:
+        """
+        Get the values of the given indicator (see INDICATORS) over the whole price history.
+        """
+
+        if name not in INDICATORS:
+            raise KeyError(f"Unknown indicator: {name}")
+
+        if name not in self._results:
+            self._results[name], self._states[name] = self._run(INDICATORS[name], self._bars, None)
+
+        return pd.DataFrame(self._results[name], index=self.price_hist.index)
+
+
+    def copy(self) -> "IndicatorEngine":
+        """
+        A copy which can be appended to while the original one is being read (e.g. by another session).
+        """
+
+        engine = IndicatorEngine.__new__(IndicatorEngine)
+        engine.price_hist = self.price_hist
+        engine._bars = dict(self._bars)
+        engine._results = dict(self._results)
+        engine._states = dict(self._states)
+        return engine
+
+
+    def append(self, bars: pd.DataFrame) -> None:
+        """
+        Append new bars to the price history and update the computed indicators incrementally.
+        If the first new bar has the same index as the last stored bar, it replaces it.
+        """
+
+        if bars.empty:
+            return
+
+        last_index = self.price_hist.index[-1]
+        if bars.index[0] < last_index:
+            raise ValueError("Only bars after the last stored bar can be appended")
+
+        # The stored states are as of the second to last bar, so the
+        # recomputed tail starts with the old last bar (or its replacement)
+        kept = len(self.price_hist) - 1
+        self.price_hist = pd.concat([
+            self.price_hist.iloc[:kept] if bars.index[0] == last_index else self.price_hist,
+            bars[self.price_hist.columns]
+        ])
+        self._bars = {
+            col: np.concatenate([self._bars[col][:kept], _col(self.price_hist.iloc[kept:], col)])
+            for col in BAR_COLUMNS
+        }
+        tail = {col: values[kept:] for col, values in self._bars.items()}
+
+        for name, result in self._results.items():
+            values, self._states[name] = self._run(INDICATORS[name], tail, self._states[name])
+            self._results[name] = {
+                col: np.concatenate([result[col][:kept], values[col]]) for col in result
+            }
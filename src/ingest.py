@@ -0,0 +1,267 @@
+"""
+Standalone ingestion worker, decoupled from the web process.
+
+The worker owns every PolygonAPI/PriceAPI call. It loads the saved tickers on a
+schedule and writes their bundles into a shared snapshot folder (src.snapshot).
+The dashboard reads that folder in the offline mode (SNAPSHOT_DIR), so its page
+loads never wait for the APIs. Every replica of the dashboard reads the same store,
+so the work isn't repeated.
+
+A ticker is loaded again when
+    - it hasn't been loaded yet (e.g. it has just been added to the watchlist),
+    - the market has closed since its last load (CLOSE_TIME on weekdays, New York time),
+    - its next report date (plus FILING_DELAY for the filing to show up) has passed since its last load.
+A failed ticker is retried after RETRY_DELAY.
+
+The times of the loads and the next report dates are kept in <store>/ingest_state.json.
+The filings of a backfill (python -m src.snapshot backfill) are kept, the loads add the new ones.
+
+Usage (from the repository root):
+
+    python -m src.ingest /srv/stock-store            # run forever, the watchlist is checked every minute
+    python -m src.ingest /srv/stock-store --once     # a single pass, e.g. from cron
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, time as day_time, timedelta, timezone
+from typing import Any, Callable, Optional
+from zoneinfo import ZoneInfo
+
+from src.snapshot import load_from_apis, update_manifest, write_ticker
+
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'ingest_state.json'
+
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+# Some time after the 16:00 close, when the daily bar is final
+CLOSE_TIME = day_time(16, 30)
+# The filings show up in the Polygon API a few days after the earnings report
+FILING_DELAY = timedelta(days=2)
+RETRY_DELAY = timedelta(minutes=15)
+
+
+def last_close(now: datetime, close_time: day_time = CLOSE_TIME) -> datetime:
+    """
+    The last weekday's close_time (New York time) before now.
+    """
+
+    local = now.astimezone(MARKET_TIMEZONE)
+    close = datetime.combine(local.date(), close_time, tzinfo=MARKET_TIMEZONE)
+    if close > local:
+        close -= timedelta(days=1)
+    while close.weekday() >= 5:
+        close -= timedelta(days=1)
+    return close
+
+
+def due_reason(entry: Optional[dict[str, Any]], now: datetime, close_time: day_time = CLOSE_TIME) -> Optional[str]:
+    """
+    Why the ticker has to be loaded (with the state entry of its last load), or None if it's up to date.
+    """
+
+    if entry is None:
+        return 'new'
+
+    if entry.get('error'):
+        failed_at = datetime.fromisoformat(entry['failed_at'])
+        return 'retry' if now - failed_at >= RETRY_DELAY else None
+
+    loaded_at = datetime.fromisoformat(entry['loaded_at'])
+    if loaded_at < last_close(now, close_time):
+        return 'market close'
+
+    report_date = entry.get('next_report_date')
+    if report_date:
+        filing_time = datetime.combine(
+            datetime.fromisoformat(report_date).date(), close_time, tzinfo=MARKET_TIMEZONE
+        ) + FILING_DELAY
+        if loaded_at < filing_time <= now:
+            return 'filing'
+
+    return None
+
+
+class IngestionWorker:
+
+    """
+    Loads the due tickers into the store, one by one (the Polygon requests go through the
+    process-wide rate limiter).
+
+    Args:
+        store_dir: The shared snapshot folder.
+        tickers: Returns the tickers to keep up to date (e.g. the saved ones).
+        loader: Function loading the data of a ticker from the APIs.
+        close_time: Time of the daily refresh after the market close (New York time).
+        clock: Returns the current time (timezone aware), for the tests.
+
+    An example of usage:
+
+    worker = IngestionWorker('/srv/stock-store', lambda: read_ticker_list(TICKER_FILE))
+    worker.run_forever(poll_interval=60)
+    """
+
+    def __init__(
+        self,
+        store_dir: str,
+        tickers: Callable[[], list[str]],
+        loader: Callable[[str], Any] = load_from_apis,
+        close_time: day_time = CLOSE_TIME,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc)
+    ) -> None:
+
+        self.store_dir: str = store_dir
+        self.tickers = tickers
+        self.loader = loader
+        self.close_time: day_time = close_time
+        self.clock = clock
+        self._stop = threading.Event()
+
+        os.makedirs(store_dir, exist_ok=True)
+        self.state: dict[str, dict[str, Any]] = self._read_state()
+
+
+    def _read_state(self) -> dict[str, dict[str, Any]]:
+
+        file = os.path.join(self.store_dir, STATE_FILE)
+        if not os.path.exists(file):
+            return {}
+        with open(file, 'r') as f:
+            return json.load(f)
+
+
+    def _save_state(self) -> None:
+
+        handle, temp_file = tempfile.mkstemp(dir=self.store_dir, prefix='.tmp-')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temp_file, os.path.join(self.store_dir, STATE_FILE))
+
+
+    def due_tickers(self) -> dict[str, str]:
+        """
+        The tickers which have to be loaded, with the reason.
+        """
+
+        now = self.clock()
+        due = {}
+        for ticker in dict.fromkeys(ticker.upper() for ticker in self.tickers()):
+            reason = due_reason(self.state.get(ticker), now, self.close_time)
+            if reason is not None:
+                due[ticker] = reason
+        return due
+
+
+    def ingest(self, ticker: str) -> None:
+        """
+        Load the ticker and write it into the store. The errors are recorded in the state.
+        """
+
+        now = self.clock()
+        try:
+            data = self.loader(ticker)
+            write_ticker(self.store_dir, data)
+        except Exception as error:
+            entry = self.state.setdefault(ticker, {})
+            entry.update({'error': f'{type(error).__name__}: {error}', 'failed_at': now.isoformat()})
+            logger.warning("Loading %s failed: %s", ticker, entry['error'])
+            return
+
+        # The filings of the upcoming report trigger the next load
+        try:
+            next_report_date: Optional[str] = data.get_next_report_date()
+        except Exception:
+            next_report_date = None
+
+        self.state[ticker] = {'loaded_at': now.isoformat(), 'next_report_date': next_report_date}
+
+
+    def run_once(self) -> dict[str, Any]:
+        """
+        Load every due ticker, then update the manifest of the store.
+        Returns the loaded tickers (with the reason) and the failed ones (with the error).
+        """
+
+        due = self.due_tickers()
+        loaded: dict[str, str] = {}
+        failed: dict[str, str] = {}
+
+        for ticker, reason in due.items():
+            if self._stop.is_set():
+                break
+            self.ingest(ticker)
+            error = self.state[ticker].get('error')
+            if error:
+                failed[ticker] = error
+            else:
+                loaded[ticker] = reason
+                logger.info("Loaded %s (%s)", ticker, reason)
+            # Saved after every ticker, so a restarted worker doesn't load them again
+            self._save_state()
+
+        if due:
+            update_manifest(self.store_dir, loaded, failed, source='ingest')
+        return {'loaded': loaded, 'failed': failed}
+
+
+    def run_forever(self, poll_interval: float = 60) -> None:
+        """
+        Run a pass every poll_interval seconds, until stop() is called.
+        """
+
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("The ingestion pass failed")
+            self._stop.wait(poll_interval)
+
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main() -> None:
+
+    from dotenv import load_dotenv
+    from src.json_io import read_ticker_list
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    parser = argparse.ArgumentParser(description="Load the saved tickers into the shared store on a schedule.")
+    parser.add_argument('store_dir', nargs='?', default=os.getenv('SNAPSHOT_DIR'), help="Defaults to SNAPSHOT_DIR.")
+    parser.add_argument('--once', action='store_true', help="Run a single pass and exit.")
+    parser.add_argument('--poll', type=float, default=60, help="Seconds between the checks of the watchlist.")
+    parser.add_argument(
+        '--close-time',
+        type=day_time.fromisoformat,
+        default=CLOSE_TIME,
+        help="Time of the daily refresh (New York time, HH:MM)."
+    )
+    args = parser.parse_args()
+
+    if not args.store_dir:
+        parser.error("the store folder is required (or set SNAPSHOT_DIR)")
+
+    ticker_file = os.getenv('TICKER_FILE')
+    worker = IngestionWorker(args.store_dir, lambda: read_ticker_list(ticker_file), close_time=args.close_time)
+
+    if args.once:
+        summary = worker.run_once()
+        print(f"{len(summary['loaded'])} loaded, {len(summary['failed'])} failed")
+    else:
+        try:
+            worker.run_forever(args.poll)
+        except KeyboardInterrupt:
+            worker.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,176 @@
 Simple module to handle JSON i/o operation to store the tickers which 
 have been added
 
+The content of the files is cached in the memory of the process. A file is only
+read again if its modification time, inode or size changes (i.e. someone else
+modified it), the writes of this module update the cache directly.
+
+Every modification holds an exclusive lock on a "<file>.lock" file and replaces the
+file atomically (write to a temporary file, then rename), so concurrent sessions
+can't lose each other's updates or leave a half written file behind. The reads
+don't need the lock, they always see either the old or the new file.
+
+If the ticker file has a SQLite extension (.db, .sqlite, .sqlite3), the functions
+use the src.watchlist_store module instead, with the default user.
+
 """
 
 import json
 import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from src.watchlist_store import WatchlistStore, SQLITE_SUFFIXES
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# path -> (file signature, tickers as list, tickers as set)
+_watchlist_cache: dict[str, tuple[tuple, list, set]] = {}
+_cache_lock = threading.Lock()
+
+
+_stores: dict[str, WatchlistStore] = {}
+
+
+def _sqlite_store(ticker_file:str) -> Optional[WatchlistStore]:
+    """
+    Return the SQLite store of the file, or None if it's a JSON file.
+    On the first use, the JSON file with the same name is migrated into the store (if it exists).
+    """
+
+    if os.path.splitext(ticker_file)[1] not in SQLITE_SUFFIXES:
+        return None
+
+    path = os.path.abspath(ticker_file)
+    with _cache_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = WatchlistStore(path)
+            json_file = os.path.splitext(path)[0] + '.json'
+            if os.path.exists(json_file):
+                store.migrate_from_json(json_file)
+    return store
+
+
+def _file_signature(stat: os.stat_result) -> tuple:
+    """
+    Return the properties of the file which change when it's rewritten.
+    """
+
+    return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+
+def _remember(ticker_file:str, tickers:list, signature:tuple) -> None:
+    """
+    Store the freshly written or read content of the file in the cache.
+    """
+
+    with _cache_lock:
+        _watchlist_cache[os.path.abspath(ticker_file)] = (
+            signature, list(tickers), set(tickers)
+        )
+
+
+def _load(ticker_file:str) -> tuple[list, set]:
+    """
+    Return the cached content of the file, or read it if it has changed since the last read.
+    """
+
+    path = os.path.abspath(ticker_file)
+    signature = _file_signature(os.stat(ticker_file))
+
+    with _cache_lock:
+        cached = _watchlist_cache.get(path)
+
+    if cached is not None and cached[0] == signature:
+        return cached[1], cached[2]
+
+    with open(ticker_file, "r") as file:
+        tickers = json.load(file)
+        # The signature of the opened file, even if it has been replaced since the stat call
+        signature = _file_signature(os.fstat(file.fileno()))
+
+    _remember(ticker_file, tickers, signature)
+    return tickers, set(tickers)
+
+
+@contextmanager
+def file_lock(file:str) -> Iterator[None]:
+    """
+    Hold an exclusive lock of the file (through a separate "<file>.lock" file) until the block ends.
+    It's shared by the processes, e.g. the sessions of the app and the ingestion worker.
+    """
+
+    with open(file + '.lock', 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _umask() -> int:
+    """
+    The umask of the process. It's read from /proc on Linux, as setting it to read it back
+    would change it for the other threads for a moment.
+    """
+
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def _atomic_write(ticker_file:str, tickers:list) -> None:
+    """
+    Replace the content of the file atomically and update the cache. The caller must hold the lock.
+    """
+
+    directory = os.path.dirname(os.path.abspath(ticker_file))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tickers-', suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(tickers, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+            # The temporary file is created owner-only, the file keeps its permissions
+            # and a new file gets the permissions of a regular open()
+            if os.path.exists(ticker_file):
+                shutil.copymode(ticker_file, tmp_path)
+            else:
+                os.chmod(tmp_path, 0o666 & ~_umask())
+            # Renaming keeps the inode and the mtime of the temporary file
+            signature = _file_signature(os.fstat(file.fileno()))
+        os.replace(tmp_path, ticker_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    _remember(ticker_file, tickers, signature)
 
 
 def _create_file_if_not_exists(ticker_file:str):
@@ -14,8 +180,10 @@ def _create_file_if_not_exists(ticker_file:str):
     """
         
     if not os.path.exists(ticker_file):
-        with open(ticker_file, "w") as file:
-                json.dump([], file)  # Create an empty JSON array
+        with file_lock(ticker_file):
+            # Another session could have created it while we were waiting for the lock
+            if not os.path.exists(ticker_file):
+                _atomic_write(ticker_file, [])  # Create an empty JSON array
       
 
 def read_ticker_list(ticker_file:str) -> list:
@@ -23,12 +191,14 @@ def read_ticker_list(ticker_file:str) -> list:
     Opens the JSON file containing tickers and returns its content as a list.
     """
 
+    store = _sqlite_store(ticker_file)
+    if store is not None:
+        return store.read_ticker_list()
     
     _create_file_if_not_exists(ticker_file)
 
-    with open(ticker_file, "r+") as file:
-        tickers = json.load(file)
-        return tickers
+    tickers, _ = _load(ticker_file)
+    return list(tickers)
 
 
 # Function to add ticker to the list
@@ -36,12 +206,15 @@ def add_ticker(ticker_file:str, ticker_to_add:str) -> None:
     """
     Add the given ticker to the specified JSON file.
     """
-    with open(ticker_file, "r+") as file:
-        tickers = json.load(file)
-        if ticker_to_add.upper() not in tickers:
-            tickers.append(ticker_to_add.upper())
-            file.seek(0)
-            json.dump(tickers, file, indent=2)
+
+    store = _sqlite_store(ticker_file)
+    if store is not None:
+        return store.add_ticker(ticker_to_add)
+
+    with file_lock(ticker_file):
+        tickers, tickers_set = _load(ticker_file)
+        if ticker_to_add.upper() not in tickers_set:
+            _atomic_write(ticker_file, tickers + [ticker_to_add.upper()])
 
 
 # Function to delete ticker from the list
@@ -50,25 +223,24 @@ def delete_ticker(ticker_file:str, ticker_to_delete:str) -> bool:
     Delete the given ticker 
     """
 
-    try:
-        with open(ticker_file, 'r+') as file:
-            data = json.load(file)
+    store = _sqlite_store(ticker_file)
+    if store is not None:
+        return store.delete_ticker(ticker_to_delete)
 
-        # Check if the entry exists in the data
-        if ticker_to_delete not in data:
-            #I.e. not a succesfully delete
-            return False
-        
-        # Remove the entry
-        data.remove(ticker_to_delete)
+    try:
+        with file_lock(ticker_file):
+            tickers, tickers_set = _load(ticker_file)
 
-        # Write the updated data back to the file
-        with open(ticker_file, 'w') as file:
-            json.dump(data, file, indent=2)
+            # Check if the entry exists in the data
+            if ticker_to_delete not in tickers_set:
+                #I.e. not a succesfully delete
+                return False
 
-        return True
+            # Write the list without the entry back to the file
+            _atomic_write(ticker_file, [i for i in tickers if i != ticker_to_delete])
+            return True
 
-    except:
+    except (OSError, ValueError):
         return False
 
         
@@ -78,9 +250,14 @@ def check_ticker_on_list(ticker_file:str, ticker:str) -> bool:
     """
     Check if the given ticker is in the list stored in the JSON file.
     """
-    with open(ticker_file, "r+") as file:
-        tickers = json.load(file)
 
+    store = _sqlite_store(ticker_file)
+    if store is not None:
+        return store.check_ticker_on_list(ticker)
+
+    _, tickers = _load(ticker_file)
+
+    # Set lookup instead of scanning the list
     if ticker in tickers:
         return True
     else:
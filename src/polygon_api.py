@@ -1,7 +1,12 @@
 import requests
-from typing import Optional
+from typing import Iterator, Optional
 from os import getenv
 from dotenv import load_dotenv 
+from src.circuit_breaker import CircuitBreaker
+from src.rate_limit import RateLimiter
+from src.retry import RetryPolicy, parse_retry_after
+from src.timeouts import DeadlineExceededError, remaining, request_timeout
+from src.tracing import traced
 
 
 # Loading the .env file and the api key from it
@@ -10,9 +15,29 @@ API_KEY: str  = getenv("API_KEY") # type: ignore
 BASE_URL_POLYGON: str = getenv("BASE_URL_POLYGON") # type: ignore
 HEADER: dict = {'Authorization': f'Bearer {API_KEY}'}
 
+# Every request of the process goes through this limiter (the free subscription allows 5 requests per minute)
+RATE_LIMITER: RateLimiter = RateLimiter(
+    max_calls=int(getenv("POLYGON_CALLS_PER_MINUTE", 5)),
+    period=60
+)
+
+
+# The largest page of the financials endpoint
+FINANCIALS_PAGE_SIZE: int = 100
+# The fields of a filing which are kept by the full history (see normalize_filing)
+FILING_FIELDS: tuple = ('id', 'start_date', 'end_date', 'filing_date', 'timeframe', 'fiscal_period', 'fiscal_year')
+
 
 class LimitReachedError(Exception):
-    def __init__(self, message="You have reached the API limit"):
+    def __init__(self, message="You have reached the API limit", retry_after=None):
+        self.message = message
+        # Seconds to wait, if the response had a Retry-After header
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class ServerError(Exception):
+    def __init__(self, message="The Polygon API returned a server error"):
         self.message = message
         super().__init__(self.message)
 
@@ -23,6 +48,48 @@ class TickerNotFoundError(Exception):
         super().__init__(self.message)
 
 
+# The transient errors are retried with backoff (see src/retry.py), the other ones fail right away
+RETRY_POLICY: RetryPolicy = RetryPolicy(
+    'polygon',
+    retryable=(LimitReachedError, ServerError, requests.ConnectionError, requests.Timeout),
+    max_attempts=int(getenv("RETRY_MAX_ATTEMPTS", 4)),
+    deadline=float(getenv("RETRY_DEADLINE", 60)),
+    budget_per_minute=int(getenv("RETRY_BUDGET_PER_MINUTE", 10))
+)
+
+
+# The source is failed fast while it's down (see src/circuit_breaker.py).
+# Every attempt goes through the breaker, CircuitOpenError isn't retried.
+BREAKER: CircuitBreaker = CircuitBreaker(
+    'polygon',
+    failures=(LimitReachedError, ServerError, requests.ConnectionError, requests.Timeout),
+    failure_threshold=int(getenv("BREAKER_FAILURE_THRESHOLD", 5)),
+    recovery_timeout=float(getenv("BREAKER_RECOVERY_TIMEOUT", 30))
+)
+
+
+def _get(url: str) -> requests.Response:
+    """
+    A single attempt of a request. The rate limited and the server errors are raised for the retry policy.
+    Neither the wait for the rate limiter nor the request can go beyond the deadline of the page.
+    """
+
+    if not RATE_LIMITER.acquire(timeout=remaining()):
+        raise DeadlineExceededError("The deadline of the page ran out waiting for the Polygon rate limit")
+    response = requests.get(url, headers=HEADER, timeout=request_timeout())
+
+    if response.status_code == 429:
+        raise LimitReachedError(
+            response.json()['error'],
+            retry_after=parse_retry_after(response.headers.get('Retry-After'))
+        )
+    if response.status_code >= 500:
+        raise ServerError(f"The Polygon API returned {response.status_code}")
+
+    return response
+
+
+@traced('polygon.check_ticker_validity')
 def check_ticker_validity(ticker:str) -> bool:
     """ 
     A simple method to check if the given ticker is available in Polygon's database.
@@ -32,10 +99,7 @@ def check_ticker_validity(ticker:str) -> bool:
     ticker = ticker.upper()
     url = f'{BASE_URL_POLYGON}v3/reference/tickers?ticker={ticker}&market=stocks&active=true&limit=1'
 
-    response = requests.get(url, headers=HEADER)
-
-    if response.status_code == 429:
-            raise LimitReachedError(response.json()['error'])
+    response = RETRY_POLICY.call('polygon.tickers', BREAKER.call, _get, url)
     print(response.json())
     if len(response.json()['results']) == 1:
         # if the given ticker is available
@@ -46,6 +110,23 @@ def check_ticker_validity(ticker:str) -> bool:
 
 
 
+def normalize_filing(filing: dict) -> dict:
+    """
+    The compact form of a filing: its period fields, and only the value and the unit of every line item
+    (the labels, the display orders and the SEC links are dropped). DataProcessor reads both forms.
+    """
+
+    normalized = {field: filing[field] for field in FILING_FIELDS if field in filing}
+    normalized['financials'] = {
+        statement: {
+            metric: {'value': item.get('value'), 'unit': item.get('unit')}
+            for metric, item in items.items()
+        }
+        for statement, items in filing.get('financials', {}).items()
+    }
+    return normalized
+
+
 class PolygonAPI():
 
     """Class for interacting with the Polygon API."""
@@ -59,16 +140,15 @@ class PolygonAPI():
         self.news: Optional[list[dict]] = None
 
 
-    def _request_data(self, url:str) -> dict:
+    def _request_data(self, url:str, endpoint:str) -> dict:
 
         """ 
         MMake a request and handling common errors.
+        The transient errors are retried, the endpoint has its own retry budget.
+        Raises CircuitOpenError right away while the Polygon API is down.
         """
 
-        response = requests.get(url, headers=HEADER)
-
-        if response.status_code == 429:
-            raise LimitReachedError(response.json()['error'])
+        response = RETRY_POLICY.call(endpoint, BREAKER.call, _get, url)
         
         # Unfortunately the polygons API doesn't provide a consistent
         # behaviour when a non existing ticker is called during a request.
@@ -83,28 +163,76 @@ class PolygonAPI():
         return response.json()
 
 
-    def get_financials(self) -> None:
+    @traced('polygon.get_financials')
+    def get_financials(self, full_history: bool = False) -> None:
 
-        """Get financial data for the specified ticker."""
+        """
+        Get financial data for the specified ticker.
+        With full_history, every filing of the ticker is loaded (in the normalized form, see iter_financials).
+        """
+
+        if full_history:
+            self.financials = list(self.iter_financials())
+            return
 
         url = f"{self.base_url}vX/reference/financials?ticker={self.ticker}&filing_date.gte=2010-10-01&limit=100"
-        self.financials = self._request_data(url)['results']
+        self.financials = self._request_data(url, 'polygon.financials')['results']
+
+
+    def iter_financials(self, filed_from: Optional[str] = None) -> Iterator[dict]:
+
+        """
+        Yield every filing of the ticker (filed on or after filed_from, if given), the latest first,
+        normalized by normalize_filing. The pages are requested one by one, following the next_url
+        of the responses, so only the current page is held in memory.
+        """
+
+        url: Optional[str] = (
+            f"{self.base_url}vX/reference/financials?ticker={self.ticker}"
+            f"&order=desc&sort=filing_date&limit={FINANCIALS_PAGE_SIZE}"
+        )
+        if filed_from is not None:
+            url += f"&filing_date.gte={filed_from}"
+
+        found = False
+        while url:
+            page = self._request_page(url, 'polygon.financials')
+            for filing in page.get('results') or []:
+                found = True
+                yield normalize_filing(filing)
+            url = page.get('next_url')
+
+        # Like the other requests, a ticker without any filing isn't found
+        if not found and filed_from is None:
+            raise TickerNotFoundError()
+
+
+    @traced('polygon.request_page')
+    def _request_page(self, url: str, endpoint: str) -> dict:
+
+        """
+        Request a page of a listing, with the same retries as _request_data. An empty page isn't an error.
+        """
+
+        return RETRY_POLICY.call(endpoint, BREAKER.call, _get, url).json()
 
 
+    @traced('polygon.get_ticker_details')
     def get_ticker_details(self) -> None:
 
         """Get details for the specified ticker."""
 
         url = f"{self.base_url}v3/reference/tickers/{self.ticker}"
-        self.details = self._request_data(url)['results']
+        self.details = self._request_data(url, 'polygon.details')['results']
 
 
+    @traced('polygon.get_news')
     def get_news(self) -> None:
 
         """Get news for the specified ticker."""
 
         url = f"{self.base_url}v2/reference/news?ticker={self.ticker}&limit=10&sort=published_utc"
-        self.news = self._request_data(url)['results']
+        self.news = self._request_data(url, 'polygon.news')['results']
 
     
 
@@ -0,0 +1,483 @@
+"""
+Module containing the live price stream of the dashboard.
+
+The prices of a loaded ticker are the daily bars fetched by PriceAPI.get_history. With the
+stream turned on (PRICE_STREAM in the .env file), the trades of the watched tickers arrive
+from a feed, and the PriceStreamer folds them into the last daily bar of the cached
+DataProcessor (DataProcessor.update_last_bar), instead of reloading the whole ticker:
+
+    - polygon: the trades of the Polygon websocket (POLYGON_WS_URL),
+    - local: a stand-in feed with a random walk around the last close, for demos and tests.
+
+The trades are applied in batches (every FLUSH_INTERVAL seconds), so a busy ticker costs a
+single incremental update per batch. The header metrics and the candlestick chart are
+fragments rerun by the open sessions every PRICE_STREAM_REFRESH seconds (src.components),
+the other sections aren't touched.
+
+An example of usage:
+
+streamer = PriceStreamer(LocalFeed(), resolve=bundle_cache.peek)
+streamer.start()
+streamer.watch('MSFT')
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from os import getenv
+from typing import TYPE_CHECKING, Any, Callable, Iterable, NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from src.data_processor import DataProcessor
+
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+POLYGON_WS_URL: str = getenv("POLYGON_WS_URL", "wss://socket.polygon.io/stocks")
+
+# The daily bars of the PriceAPI are in the exchange's time zone
+MARKET_TIMEZONE = 'America/New_York'
+FLUSH_INTERVAL = 1.0
+# A ticker is unsubscribed when no page has shown it for this long
+IDLE_TIMEOUT = 300.0
+
+
+class StreamError(Exception):
+    def __init__(self, message="The price stream failed"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class Tick(NamedTuple):
+    ticker: str
+    price: float
+    size: float
+    # Epoch seconds of the trade
+    timestamp: float
+
+
+def ticks_to_bars(price_hist: "pd.DataFrame", ticks: Iterable[Tick]) -> "pd.DataFrame":
+    """
+    Fold the trades into daily bars, in the layout of the price history. The bar of the day of
+    the last stored bar continues from it (its high, low and volume), the bars of the later days
+    open at their first trade. The trades before the last stored day are dropped.
+    """
+
+    import pandas as pd
+
+    last_day = price_hist.index[-1]
+    last = price_hist.iloc[-1]
+
+    bars: dict[Any, dict[str, float]] = {}
+    for tick in sorted(ticks, key=lambda tick: tick.timestamp):
+        day = pd.Timestamp(tick.timestamp, unit='s', tz='UTC').tz_convert(MARKET_TIMEZONE).tz_localize(None).normalize()
+        if day < last_day:
+            continue
+
+        bar = bars.get(day)
+        if bar is None:
+            if day == last_day:
+                bar = {col: float(last[col]) for col in ('Open', 'High', 'Low', 'Close', 'Volume')}
+            else:
+                bar = {'Open': tick.price, 'High': tick.price, 'Low': tick.price, 'Close': tick.price, 'Volume': 0.0}
+            bars[day] = bar
+
+        bar['High'] = max(bar['High'], tick.price)
+        bar['Low'] = min(bar['Low'], tick.price)
+        bar['Close'] = tick.price
+        bar['Volume'] += tick.size
+
+    df = pd.DataFrame.from_dict(bars, orient='index', columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+    df.index.name = price_hist.index.name
+    return df.astype(price_hist.dtypes.to_dict())
+
+
+class PriceFeed(ABC):
+
+    """
+    A source of trades. run() calls on_tick with every trade of the subscribed tickers
+    until the stop event is set. The subscriptions can be changed from other threads.
+    """
+
+    def __init__(self) -> None:
+        self._tickers: set[str] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, tickers: Iterable[str]) -> None:
+        with self._lock:
+            self._tickers.update(ticker.upper() for ticker in tickers)
+
+    def unsubscribe(self, tickers: Iterable[str]) -> None:
+        with self._lock:
+            self._tickers.difference_update(ticker.upper() for ticker in tickers)
+
+    def tickers(self) -> set[str]:
+        with self._lock:
+            return set(self._tickers)
+
+    @abstractmethod
+    def run(self, on_tick: Callable[[Tick], None], stop: threading.Event) -> None:
+        ...
+
+
+class LocalFeed(PriceFeed):
+
+    """
+    A stand-in feed without any network. The trades are put with push() (e.g. in the tests),
+    or, with random_walk, generated around the given start prices every interval seconds.
+
+    An example of usage:
+
+    feed = LocalFeed()
+    feed.push(Tick('MSFT', 370.5, 100, time.time()))
+    """
+
+    def __init__(
+        self,
+        random_walk: bool = False,
+        interval: float = 1.0,
+        start_prices: Optional[Callable[[str], Optional[float]]] = None,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+
+        super().__init__()
+        self.random_walk: bool = random_walk
+        self.interval: float = interval
+        self.start_prices = start_prices
+        self._clock = clock
+        self._queue: queue.Queue = queue.Queue()
+        self._prices: dict[str, float] = {}
+
+
+    def push(self, tick: Tick) -> None:
+        self._queue.put(tick)
+
+
+    def _walk(self) -> None:
+
+        for ticker in self.tickers():
+            price = self._prices.get(ticker)
+            if price is None:
+                price = self.start_prices(ticker) if self.start_prices is not None else None
+                if price is None:
+                    continue
+            # At most 0.1% per step
+            price = round(price * (1 + random.uniform(-0.001, 0.001)), 2)
+            self._prices[ticker] = price
+            self.push(Tick(ticker, price, float(random.randint(1, 10) * 100), self._clock()))
+
+
+    def run(self, on_tick: Callable[[Tick], None], stop: threading.Event) -> None:
+
+        while not stop.is_set():
+            if self.random_walk:
+                self._walk()
+            try:
+                tick = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            while True:
+                if tick.ticker.upper() in self.tickers():
+                    on_tick(tick)
+                try:
+                    tick = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if self.random_walk:
+                stop.wait(self.interval)
+
+
+class PolygonFeed(PriceFeed):
+
+    """
+    The trades of the Polygon websocket API. The connection is authenticated with the API key,
+    and it's reopened with a growing wait (at most max_backoff seconds) if it drops.
+
+    An example of usage:
+
+    feed = PolygonFeed(API_KEY)
+    feed.subscribe(['MSFT'])
+    feed.run(on_tick, stop_event)
+    """
+
+    def __init__(self, api_key: str, url: str = POLYGON_WS_URL, max_backoff: float = 30.0) -> None:
+
+        super().__init__()
+        self.api_key: str = api_key
+        self.url: str = url
+        self.max_backoff: float = max_backoff
+        self._subscribed: set[str] = set()
+
+
+    @staticmethod
+    def parse_messages(raw: str) -> list[Tick]:
+        """
+        The trades of a websocket message (a JSON list of events). Raises StreamError if the authentication failed.
+        """
+
+        ticks = []
+        for event in json.loads(raw):
+            if event.get('ev') == 'T':
+                ticks.append(Tick(event['sym'], float(event['p']), float(event.get('s', 0)), event['t'] / 1000))
+            elif event.get('ev') == 'status' and event.get('status') in ('auth_failed', 'auth_timeout'):
+                raise StreamError(f"The Polygon websocket refused the connection: {event.get('message')}")
+        return ticks
+
+
+    async def _sync_subscriptions(self, conn) -> None:
+        """
+        Send the changes of the subscriptions since the last call.
+        """
+
+        wanted = self.tickers()
+        added, removed = wanted - self._subscribed, self._subscribed - wanted
+        if added:
+            await conn.write_message(json.dumps({'action': 'subscribe', 'params': ','.join(f'T.{t}' for t in sorted(added))}))
+        if removed:
+            await conn.write_message(json.dumps({'action': 'unsubscribe', 'params': ','.join(f'T.{t}' for t in sorted(removed))}))
+        self._subscribed = wanted
+
+
+    async def _session(self, on_tick: Callable[[Tick], None], stop: threading.Event) -> None:
+
+        from tornado.websocket import websocket_connect
+
+        conn = await websocket_connect(self.url)
+        try:
+            await conn.write_message(json.dumps({'action': 'auth', 'params': self.api_key}))
+            self._subscribed = set()
+
+            # A single read is pending at a time, so no message is lost between the checks of the stop event
+            read = asyncio.ensure_future(conn.read_message())
+            while not stop.is_set():
+                await self._sync_subscriptions(conn)
+                done, _ = await asyncio.wait({read}, timeout=0.5)
+                if not done:
+                    continue
+
+                raw = read.result()
+                if raw is None:
+                    raise StreamError("The Polygon websocket was closed")
+                for tick in self.parse_messages(raw):
+                    on_tick(tick)
+                read = asyncio.ensure_future(conn.read_message())
+            read.cancel()
+        finally:
+            conn.close()
+
+
+    async def _run(self, on_tick: Callable[[Tick], None], stop: threading.Event) -> None:
+
+        backoff = 1.0
+        while not stop.is_set():
+            try:
+                await self._session(on_tick, stop)
+                backoff = 1.0
+            except Exception as error:
+                logger.warning("The price stream was interrupted: %s", error)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+
+    def run(self, on_tick: Callable[[Tick], None], stop: threading.Event) -> None:
+        asyncio.run(self._run(on_tick, stop))
+
+
+class PriceStreamer:
+
+    """
+    Applies the trades of a feed to the cached tickers in the background.
+
+    Args:
+        feed: The source of the trades.
+        resolve: Function returning the loaded DataProcessor of a ticker, or None if it isn't loaded.
+            It's called from the background thread, so it can't be a st.cache_resource getter.
+        flush_interval: Seconds between the batches of updates.
+        idle_timeout: A ticker is unsubscribed when it hasn't been watched for this long.
+        clock: Time source, it can be replaced in the tests.
+
+    An example of usage:
+
+    streamer = PriceStreamer(feed, resolve=bundle_cache.peek)
+    streamer.start()
+    streamer.watch('MSFT')
+    """
+
+    def __init__(
+        self,
+        feed: PriceFeed,
+        resolve: Callable[[str], Optional["DataProcessor"]],
+        flush_interval: float = FLUSH_INTERVAL,
+        idle_timeout: float = IDLE_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+
+        self.feed: PriceFeed = feed
+        self.resolve = resolve
+        self.flush_interval: float = flush_interval
+        self.idle_timeout: float = idle_timeout
+        self._clock = clock
+
+        self._pending: dict[str, list[Tick]] = {}
+        self._last_seen: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+        self._ticks: int = 0
+        self._updates: int = 0
+        self._dropped: int = 0
+        self._errors: int = 0
+        self._last_trade: dict[str, float] = {}
+
+
+    def start(self) -> None:
+        """
+        Start the feed and the updates in daemon threads.
+        """
+
+        if self._threads:
+            return
+
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self.feed.run, args=(self._on_tick, self._stop), name='price-feed', daemon=True),
+            threading.Thread(target=self._flush_loop, name='price-stream', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+    def watch(self, ticker: str) -> None:
+        """
+        Subscribe to the trades of the ticker (if it isn't subscribed yet). Called by every page showing it.
+        """
+
+        ticker = ticker.upper()
+        with self._lock:
+            new = ticker not in self._last_seen
+            self._last_seen[ticker] = self._clock()
+        if new:
+            self.feed.subscribe([ticker])
+
+
+    def _on_tick(self, tick: Tick) -> None:
+
+        with self._lock:
+            self._pending.setdefault(tick.ticker.upper(), []).append(tick)
+            self._ticks += 1
+
+
+    def _unsubscribe_idle(self) -> None:
+
+        now = self._clock()
+        with self._lock:
+            idle = [ticker for ticker, seen in self._last_seen.items() if now - seen > self.idle_timeout]
+            for ticker in idle:
+                del self._last_seen[ticker]
+                self._pending.pop(ticker, None)
+        if idle:
+            self.feed.unsubscribe(idle)
+
+
+    def flush(self) -> list[str]:
+        """
+        Apply the trades received since the last flush. Returns the updated tickers.
+        The trades of the tickers which aren't loaded (e.g. evicted from the cache) are dropped.
+        """
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            updated = []
+            for ticker, ticks in pending.items():
+                data = self.resolve(ticker)
+                if data is None or data.price_hist is None:
+                    with self._lock:
+                        self._dropped += len(ticks)
+                    continue
+
+                try:
+                    bars = ticks_to_bars(data.price_hist, ticks)
+                    if not bars.empty:
+                        data.update_last_bar(bars)
+                        updated.append(ticker)
+                except Exception as error:
+                    logger.warning("Couldn't apply the trades of %s: %s", ticker, error)
+                    with self._lock:
+                        self._errors += 1
+                    continue
+
+                with self._lock:
+                    self._updates += 1
+                    self._last_trade[ticker] = max(tick.timestamp for tick in ticks)
+
+            self._unsubscribe_idle()
+            return updated
+
+
+    def _flush_loop(self) -> None:
+
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+    def last_trade(self, ticker: str) -> Optional[datetime]:
+        """
+        The time of the last applied trade of the ticker, or None.
+        """
+
+        with self._lock:
+            timestamp = self._last_trade.get(ticker.upper())
+        return None if timestamp is None else datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the watched tickers and the number of the received, applied and dropped trades.
+        """
+
+        with self._lock:
+            return {
+                'watched': sorted(self._last_seen),
+                'ticks': self._ticks,
+                'updates': self._updates,
+                'dropped': self._dropped,
+                'errors': self._errors,
+            }
+
+
+def feed_from_env(start_prices: Optional[Callable[[str], Optional[float]]] = None) -> Optional[PriceFeed]:
+    """
+    Create the feed of PRICE_STREAM ('polygon' or 'local'), or None if the stream is off.
+    The local feed starts its random walks from the given start prices (e.g. the last closes).
+    """
+
+    kind = (getenv("PRICE_STREAM") or '').lower()
+    if not kind:
+        return None
+    if kind == 'polygon':
+        return PolygonFeed(getenv("API_KEY") or '')
+    if kind == 'local':
+        return LocalFeed(random_walk=True, start_prices=start_prices)
+    raise ValueError(f"Unknown PRICE_STREAM: {kind}. Choose from polygon or local")
@@ -0,0 +1,95 @@
+"""
+Module containing a thread-safe sliding window rate limiter.
+
+Polygon's free subscription allows only a few requests per minute, so every part
+of the application which calls the API (the page itself and the background jobs)
+shares a single limiter per process.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+
+class RateLimiter:
+
+    """
+    Allows at most max_calls calls in any period long time window.
+
+    An example of usage:
+
+    limiter = RateLimiter(max_calls=5, period=60)
+    limiter.acquire()   # blocks until a call is allowed
+    """
+
+    def __init__(
+        self,
+        max_calls: int,
+        period: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ) -> None:
+
+        if max_calls < 1:
+            raise ValueError("max_calls must be at least 1")
+
+        self.max_calls: int = max_calls
+        self.period: float = period
+        self._clock = clock
+        self._sleep = sleep
+        self._calls: deque[float] = deque()
+        self._lock = threading.Lock()
+
+
+    def _expire(self, now: float) -> None:
+        while self._calls and self._calls[0] <= now - self.period:
+            self._calls.popleft()
+
+
+    def available(self) -> int:
+        """
+        Return the number of calls which are allowed right now.
+        """
+
+        with self._lock:
+            self._expire(self._clock())
+            return self.max_calls - len(self._calls)
+
+
+    def try_acquire(self) -> bool:
+        """
+        Register a call if it's allowed right now, without waiting.
+        """
+
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            if len(self._calls) < self.max_calls:
+                self._calls.append(now)
+                return True
+            return False
+
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until a call is allowed and register it. Returns False if the timeout has passed.
+        """
+
+        deadline = None if timeout is None else self._clock() + timeout
+
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._expire(now)
+                if len(self._calls) < self.max_calls:
+                    self._calls.append(now)
+                    return True
+                wait = self._calls[0] + self.period - now
+
+            if deadline is not None:
+                if now >= deadline:
+                    return False
+                wait = min(wait, deadline - now)
+
+            self._sleep(max(wait, 0.01))
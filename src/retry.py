@@ -0,0 +1,279 @@
+"""
+Module containing the retry policy of the Polygon and the yfinance requests.
+
+A rate limited (429) response, a server error (5xx) or a dropped connection is usually
+over in a few seconds, so the request is repeated instead of failing the whole page:
+
+    - the waits grow exponentially with full jitter (a random part of the backoff),
+      so the retries of the replicas and the warmer don't arrive at the same time,
+    - a Retry-After header (seconds or an HTTP date) is respected,
+    - a call gives up when its next retry would end after its total deadline
+      (or after the deadline of the page, see src.timeouts),
+    - every endpoint has a budget of retries per minute, so an outage of the API
+      doesn't multiply the requests (a retry storm).
+
+Every backoff wait is recorded as a 'retry.<endpoint>' span (src.tracing), so the number
+and the length of the retries are in the debug panel and the Prometheus export. The retry
+rate and the latency of the calls are returned by retry_stats().
+
+An example of usage:
+
+policy = RetryPolicy('polygon', retryable=(ConnectionError, ServerError))
+response = policy.call('polygon.news', requests.get, url)
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional, Union
+
+from src.rate_limit import RateLimiter
+from src.timeouts import check_deadline, remaining
+from src.tracing import span
+
+
+# Every policy of the process, for the statistics
+POLICIES: dict[str, "RetryPolicy"] = {}
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Seconds to wait based on a Retry-After header (delay seconds or an HTTP date), or None.
+    """
+
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - (now or datetime.now(timezone.utc))).total_seconds(), 0.0)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    The wait requested by the server with the error: its retry_after attribute,
+    or the Retry-After header of its response (e.g. a requests.HTTPError).
+    """
+
+    seconds = getattr(error, 'retry_after', None)
+    if seconds is not None:
+        return float(seconds)
+
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if headers is not None:
+        return parse_retry_after(headers.get('Retry-After'))
+    return None
+
+
+class _EndpointStats:
+
+    """The counters of a single endpoint."""
+
+    __slots__ = ('calls', 'retries', 'failures', 'gave_up', 'latency_sum', 'latency_max', 'wait_sum')
+
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.retries: int = 0
+        self.failures: int = 0
+        self.gave_up: dict[str, int] = {'attempts': 0, 'deadline': 0, 'budget': 0}
+        self.latency_sum: float = 0.0
+        self.latency_max: float = 0.0
+        self.wait_sum: float = 0.0
+
+
+class RetryPolicy:
+
+    """
+    Calls a function and repeats it after the transient errors.
+
+    Args:
+        name: Name of the policy in the statistics.
+        retryable: The transient exception types, or a function deciding about an exception.
+        max_attempts: The maximum number of attempts of a call (the first one included).
+        base_delay: The backoff of the first retry in seconds, it's doubled for every retry.
+        max_delay: The upper limit of the backoff in seconds.
+        deadline: The total time of a call in seconds, the waits and the attempts included.
+        budget_per_minute: The number of retries allowed per endpoint in any minute.
+        clock, sleep, rand: Time source, sleep and random functions, they can be replaced in the tests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        retryable: Union[tuple, Callable[[Exception], bool]],
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        deadline: float = 60.0,
+        budget_per_minute: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        rand: Callable[[], float] = random.random
+    ) -> None:
+
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        self.name: str = name
+        self.retryable = retryable
+        self.max_attempts: int = max_attempts
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.deadline: float = deadline
+        self.budget_per_minute: int = budget_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._rand = rand
+
+        self._lock = threading.Lock()
+        self._budgets: dict[str, RateLimiter] = {}
+        self._stats: dict[str, _EndpointStats] = {}
+
+        POLICIES[name] = self
+
+
+    def is_retryable(self, error: Exception) -> bool:
+
+        if isinstance(self.retryable, tuple):
+            return isinstance(error, self.retryable)
+        return self.retryable(error)
+
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """
+        The wait before the next attempt, after the given (1-based) attempt failed with the error.
+        """
+
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        # Full jitter: anything between 0 and the exponential backoff
+        delay = self._rand() * ceiling
+
+        requested = retry_after(error)
+        if requested is not None:
+            # Not earlier than the server asked, but the clients are still spread a bit
+            delay = requested + self._rand() * self.base_delay
+        return delay
+
+
+    def _budget(self, endpoint: str) -> RateLimiter:
+
+        with self._lock:
+            budget = self._budgets.get(endpoint)
+            if budget is None:
+                budget = self._budgets[endpoint] = RateLimiter(self.budget_per_minute, 60, clock=self._clock)
+            return budget
+
+
+    def _endpoint_stats(self, endpoint: str) -> _EndpointStats:
+
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = _EndpointStats()
+        return stats
+
+
+    def _finish(self, endpoint: str, start: float, failed: bool, gave_up: Optional[str] = None) -> None:
+
+        latency = self._clock() - start
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            stats.calls += 1
+            stats.latency_sum += latency
+            stats.latency_max = max(stats.latency_max, latency)
+            if failed:
+                stats.failures += 1
+            if gave_up is not None:
+                stats.gave_up[gave_up] += 1
+
+
+    def call(self, endpoint: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call the function with the arguments and repeat it after the transient errors.
+        The last error is raised if the call gives up. No attempt is started after the
+        deadline of the page (DeadlineExceededError).
+        """
+
+        start = self._clock()
+        deadline_at = start + self.deadline
+        page_left = remaining()
+        if page_left is not None:
+            deadline_at = min(deadline_at, start + page_left)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                check_deadline()
+                result = func(*args, **kwargs)
+            except Exception as error:
+                if not self.is_retryable(error):
+                    self._finish(endpoint, start, failed=True)
+                    raise
+
+                delay = self.backoff(attempt, error)
+                if attempt >= self.max_attempts:
+                    gave_up: Optional[str] = 'attempts'
+                elif self._clock() + delay > deadline_at:
+                    gave_up = 'deadline'
+                elif not self._budget(endpoint).try_acquire():
+                    gave_up = 'budget'
+                else:
+                    gave_up = None
+
+                if gave_up is not None:
+                    self._finish(endpoint, start, failed=True, gave_up=gave_up)
+                    raise
+
+                with span(f'retry.{endpoint}', stage='retry'):
+                    self._sleep(delay)
+
+                with self._lock:
+                    stats = self._endpoint_stats(endpoint)
+                    stats.retries += 1
+                    stats.wait_sum += delay
+                continue
+
+            self._finish(endpoint, start, failed=False)
+            return result
+
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Get the retry rate and the latency (the retries included) of the calls per endpoint.
+        """
+
+        with self._lock:
+            return {
+                endpoint: {
+                    'calls': stats.calls,
+                    'retries': stats.retries,
+                    'retry_rate': round(stats.retries / stats.calls, 4) if stats.calls else 0.0,
+                    'failures': stats.failures,
+                    'gave_up': dict(stats.gave_up),
+                    'avg_latency_ms': round(stats.latency_sum / stats.calls * 1000, 2) if stats.calls else 0.0,
+                    'max_latency_ms': round(stats.latency_max * 1000, 2),
+                    'retry_wait_ms': round(stats.wait_sum * 1000, 2),
+                }
+                for endpoint, stats in sorted(self._stats.items())
+            }
+
+
+def retry_stats() -> dict[str, dict[str, Any]]:
+    """
+    The statistics of every retry policy of the process, per endpoint.
+    """
+
+    stats = {}
+    for policy in list(POLICIES.values()):
+        stats.update(policy.stats())
+    return stats
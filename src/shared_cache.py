@@ -0,0 +1,546 @@
+"""
+Module containing a cache shared by every replica of the app.
+
+The BundleCache and the FigureCache live in the memory of a single Streamlit process,
+so running several replicas behind a load balancer repeats every API call and every
+figure build per replica. The SharedCache stores the loaded tickers and the figure
+specs in a backend which every replica can reach:
+
+    - SQLiteBackend: a database file on a local or shared disk (replicas on the same host),
+    - RedisBackend: a Redis (or any RESP compatible) server, with a minimal built-in client.
+
+The backend is chosen by SHARED_CACHE_URL in the .env file:
+
+    SHARED_CACHE_URL = "sqlite:///var/cache/stock/cache.db"
+    SHARED_CACHE_URL = "redis://:password@localhost:6379/0"
+
+The values are pickled and compressed (src.compression, zstd if it's installed, otherwise zlib;
+the tickers with the shared financials dictionary). Every entry carries FORMAT_VERSION in its key
+and in its header, so the replicas of a newer release don't read the entries of an older one
+(increase it when the layout of the cached classes changes). The backend must be trusted,
+the entries are unpickled.
+
+The shared cache sits behind the in-process caches: a replica only reads it on a local miss.
+When a value is missing, a single replica loads it while the others wait for the result.
+"""
+
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from os import getenv
+from typing import Any, Callable, Optional
+from urllib.parse import unquote, urlparse
+
+from src.compression import compress, decompress
+
+
+FORMAT_VERSION = 2
+_MAGIC = b'SC'
+
+# A replica waits this long for another one loading the same value
+LOCK_TIMEOUT = 30.0
+LOCK_POLL_INTERVAL = 0.1
+
+
+class CacheFormatError(Exception):
+    def __init__(self, message="The cached value has an unknown format"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class RedisError(Exception):
+    def __init__(self, message="The Redis server returned an error"):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _pack(raw: bytes, dictionary: Optional[bytes] = None) -> bytes:
+    return _MAGIC + bytes([FORMAT_VERSION]) + compress(raw, dictionary=dictionary)
+
+
+def encode_value(value: Any, dictionary: Optional[bytes] = None) -> bytes:
+    """
+    Serialize the value into a versioned, compressed entry (with the optional compression dictionary).
+    """
+
+    return _pack(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), dictionary)
+
+
+def decode_value(entry: bytes) -> Any:
+    """
+    Deserialize an entry of encode_value. Raises CacheFormatError if it's from another format version.
+    """
+
+    if entry[:2] != _MAGIC or len(entry) < 3:
+        raise CacheFormatError()
+    if entry[2] != FORMAT_VERSION:
+        raise CacheFormatError(f"The cached value has the format version {entry[2]}, expected {FORMAT_VERSION}")
+    return pickle.loads(decompress(entry[3:]))
+
+
+class CacheBackend:
+
+    """
+    The storage of the SharedCache. The values are bytes, the ttl is in seconds (None means no expiry).
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """
+        Set the value only if the key is missing. Returns True if it was set.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class SQLiteBackend(CacheBackend):
+
+    """
+    Cache entries in a SQLite database, shared by the processes of the same host.
+
+    Every thread gets its own connection. The database runs in WAL mode, so readers
+    don't block the writer.
+    """
+
+    def __init__(self, db_file: str, clock: Callable[[], float] = time.time) -> None:
+
+        self.db_file: str = db_file
+        self._clock = clock
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL
+                ) WITHOUT ROWID
+                """
+            )
+
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return the connection of the current thread.
+        """
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        return None if ttl is None else self._clock() + ttl
+
+
+    def get(self, key: str) -> Optional[bytes]:
+
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, self._clock())
+        ).fetchone()
+        return None if row is None else bytes(row[0])
+
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, self._expires_at(ttl))
+            )
+
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, self._clock()))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, self._expires_at(ttl))
+            )
+            return cursor.rowcount == 1
+
+
+    def delete(self, key: str) -> None:
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+    def purge_expired(self) -> int:
+        """
+        Remove the expired entries. Returns their number.
+        """
+
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM cache WHERE expires_at <= ?", (self._clock(),)).rowcount
+
+
+class RedisBackend(CacheBackend):
+
+    """
+    Cache entries in a Redis server, through a minimal client of the RESP protocol
+    (only the GET, SET, DEL, AUTH and SELECT commands are used).
+
+    Every thread gets its own connection, a broken connection is opened again once.
+    """
+
+    def __init__(
+        self,
+        host: str = 'localhost',
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        timeout: float = 5.0
+    ) -> None:
+
+        self.host: str = host
+        self.port: int = port
+        self.db: int = db
+        self.password: Optional[str] = password
+        self.timeout: float = timeout
+        self._local = threading.local()
+
+
+    def _connect(self):
+        """
+        Return the connection (socket, reader) of the current thread.
+        """
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            connection = (sock, sock.makefile('rb'))
+            self._local.connection = connection
+            if self.password:
+                self._send(connection, 'AUTH', self.password)
+            if self.db:
+                self._send(connection, 'SELECT', self.db)
+        return connection
+
+
+    def _close(self) -> None:
+
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+
+
+    @staticmethod
+    def _encode_command(*args) -> bytes:
+
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+
+    def _read_reply(self, reader) -> Any:
+
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("The Redis connection was closed")
+
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("The Redis connection was closed")
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length == -1 else [self._read_reply(reader) for _ in range(length)]
+        raise RedisError(f"Unknown reply from the Redis server: {line!r}")
+
+
+    def _send(self, connection, *args) -> Any:
+
+        sock, reader = connection
+        sock.sendall(self._encode_command(*args))
+        return self._read_reply(reader)
+
+
+    def execute(self, *args) -> Any:
+        """
+        Send a command and return its reply.
+        """
+
+        for attempt in range(2):
+            try:
+                return self._send(self._connect(), *args)
+            except (ConnectionError, socket.timeout, OSError):
+                self._close()
+                if attempt == 1:
+                    raise
+
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> list:
+        return [] if ttl is None else ['PX', max(int(ttl * 1000), 1)]
+
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute('GET', key)
+
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.execute('SET', key, value, *self._expiry(ttl))
+
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return self.execute('SET', key, value, 'NX', *self._expiry(ttl)) == 'OK'
+
+
+    def delete(self, key: str) -> None:
+        self.execute('DEL', key)
+
+
+def backend_from_url(url: str) -> CacheBackend:
+    """
+    Create the backend of a sqlite:///<file> or a redis://[:password@]host[:port][/db] URL.
+    """
+
+    parsed = urlparse(url)
+
+    if parsed.scheme == 'sqlite':
+        db_file = url[len('sqlite://'):]
+        if not db_file:
+            raise ValueError(f"Missing the database file of the shared cache: {url}")
+        return SQLiteBackend(db_file)
+
+    if parsed.scheme == 'redis':
+        db = parsed.path.strip('/')
+        return RedisBackend(
+            host=parsed.hostname or 'localhost',
+            port=parsed.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parsed.password) if parsed.password else None
+        )
+
+    raise ValueError(f"Unknown shared cache backend: {url}. Use a sqlite:// or a redis:// URL")
+
+
+class SharedCache:
+
+    """
+    A cache of any picklable value, shared through the backend.
+
+    Args:
+        backend: The storage of the entries.
+        namespace: Prefix of the keys, e.g. separating the tickers from the figures.
+        ttl: The default time to live of an entry in seconds (None means no expiry).
+        lock_timeout: How long a replica waits for another one loading the same key.
+        dictionary: Optional compression dictionary of the entries (see src.compression).
+
+    The backend errors don't break the app: the value is loaded as if it wasn't cached
+    and the error is counted in the statistics.
+
+    An example of usage:
+
+    cache = SharedCache(backend_from_url('redis://localhost:6379/0'), namespace='bundle', ttl=3600)
+    data = cache.get_or_load('MSFT', load_function)
+    cache.stats()
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        namespace: str = 'default',
+        ttl: Optional[float] = None,
+        lock_timeout: float = LOCK_TIMEOUT,
+        dictionary: Optional[bytes] = None
+    ) -> None:
+
+        self.backend: CacheBackend = backend
+        self.namespace: str = namespace
+        self.ttl: Optional[float] = ttl
+        self.lock_timeout: float = lock_timeout
+        self.dictionary: Optional[bytes] = dictionary
+        self._lock = threading.Lock()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._loads: int = 0
+        self._waits: int = 0
+        self._errors: int = 0
+        self._bytes_read: int = 0
+        self._bytes_written: int = 0
+        self._raw_bytes_written: int = 0
+
+
+    def _key(self, key: Any) -> str:
+        return f'{self.namespace}:v{FORMAT_VERSION}:{key}'
+
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+
+    def get(self, key: Any) -> Any:
+        """
+        Return the cached value, or None if it's missing, expired or unreadable.
+        """
+
+        full_key = self._key(key)
+        try:
+            entry = self.backend.get(full_key)
+        except Exception:
+            self._count('_errors')
+            return None
+
+        if entry is None:
+            self._count('_misses')
+            return None
+
+        try:
+            value = decode_value(entry)
+        except Exception:
+            # A corrupt entry is removed, so it's loaded again
+            self._count('_errors')
+            self._count('_misses')
+            self._safe_delete(full_key)
+            return None
+
+        self._count('_hits')
+        self._count('_bytes_read', len(entry))
+        return value
+
+
+    def put(self, key: Any, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store the value. Returns False if the backend couldn't store it.
+        """
+
+        ttl = self.ttl if ttl is None else ttl
+        raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        entry = _pack(raw, self.dictionary)
+
+        try:
+            self.backend.set(self._key(key), entry, ttl)
+        except Exception:
+            self._count('_errors')
+            return False
+
+        self._count('_bytes_written', len(entry))
+        self._count('_raw_bytes_written', len(raw))
+        return True
+
+
+    def _safe_delete(self, full_key: str) -> None:
+        try:
+            self.backend.delete(full_key)
+        except Exception:
+            self._count('_errors')
+
+
+    def get_or_load(self, key: Any, loader: Callable[[Any], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Return the cached value, or load and store it. Only one replica loads a missing key,
+        the others wait for its result (at most lock_timeout seconds, then they load it too).
+        """
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        lock_key = self._key(key) + ':lock'
+        try:
+            acquired = self.backend.add(lock_key, b'1', self.lock_timeout)
+        except Exception:
+            self._count('_errors')
+            acquired = True
+
+        if not acquired:
+            self._count('_waits')
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                value = self.get(key)
+                if value is not None:
+                    return value
+
+        try:
+            value = loader(key)
+            self._count('_loads')
+            self.put(key, value, ttl)
+        finally:
+            if acquired:
+                self._safe_delete(lock_key)
+
+        return value
+
+
+    def invalidate(self, key: Any) -> None:
+        """
+        Remove the key for every replica.
+        """
+
+        self._safe_delete(self._key(key))
+
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the hit/miss statistics, the transferred bytes and the compression ratio.
+        """
+
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                'backend': type(self.backend).__name__,
+                'namespace': self.namespace,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / requests, 4) if requests else 0.0,
+                'loads': self._loads,
+                'waits': self._waits,
+                'errors': self._errors,
+                'bytes_read': self._bytes_read,
+                'bytes_written': self._bytes_written,
+                'compression_ratio': round(self._raw_bytes_written / self._bytes_written, 2) if self._bytes_written else 0.0,
+            }
+
+
+def shared_cache_from_env(namespace: str, dictionary: Optional[bytes] = None) -> Optional[SharedCache]:
+    """
+    Create the shared cache of SHARED_CACHE_URL (with the CACHE_TTL), or None if it's not set.
+    """
+
+    url = getenv("SHARED_CACHE_URL")
+    if not url:
+        return None
+
+    ttl = getenv("CACHE_TTL")
+    return SharedCache(
+        backend_from_url(url),
+        namespace=namespace,
+        ttl=float(ttl) if ttl else None,
+        dictionary=dictionary
+    )
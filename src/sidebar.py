@@ -0,0 +1,267 @@
+"""
+This module containing the page setup and the sidebar of our Streamlit page.
+
+It only imports lightweight modules, so the page chrome and the sidebar are drawn
+before the heavy libraries (pandas, yfinance, requests) are loaded. Those are
+imported when a ticker is chosen or added.
+"""
+
+from typing import Callable, Optional
+from os import getenv # type: ignore
+import streamlit as st # type: ignore
+
+from src.json_io import check_ticker_on_list, delete_ticker, add_ticker, read_ticker_list
+from src.circuit_breaker import breaker_stats
+from src.retry import retry_stats
+from src.tracing import REGISTRY, Trace
+
+import time 
+from dotenv import load_dotenv
+from streamlit.delta_generator import DeltaGenerator
+
+# Loading the .env file and the ticker file path from it
+load_dotenv()
+TICKER_FILE: str = getenv("TICKER_FILE") # type: ignore
+
+
+def _set_page_width() -> DeltaGenerator:
+    """
+    Workaround the set the streamlit page wider, because using streamlit wide mode doesn't result the desired page structure.
+    """
+
+    css="""
+    <style>
+        section.main > div {max-width:60rem}
+    </style>
+    """
+    return st.markdown(css, unsafe_allow_html=True)
+
+
+def basic_page_setup() -> None:
+
+    # Basic page setups
+    st.set_page_config(page_title="Stonks$$",page_icon="📉",)
+    _set_page_width()
+
+
+
+def add_sidebar_ticker_form(
+    on_ticker_added: Optional[Callable[[str], None]] = None,
+    validator: Optional[Callable[[str], bool]] = None
+) -> Optional[str]:
+    """ 
+    Method to setup the streamlit sidebar part of the page.
+    Including:
+        - A selection box to choose from saved tickers.
+        - A ticker form to add new tickers and delete them from the saved tickers list
+
+    Args:
+        on_ticker_added: Optional callback, called with the ticker after it has been saved.
+        validator: Optional check of the new tickers, defaults to the Polygon API's check_ticker_validity.
+
+    """
+
+    ticker_options = read_ticker_list(TICKER_FILE)
+
+    option = st.sidebar.selectbox(
+        "Choose ticker",
+        ticker_options,
+        index=None,
+        placeholder="Select ticker...",
+    )
+
+    # Sidebar: add/delete ticker part
+
+    # Streamlit has a unique control flow. It runs the entire script from top to bottom
+    # every time there is interaction with a button. Due to this, I need to implement a workaround:
+    # I save the state of those buttons and store it in the session_state. When the script reruns,
+    # the button's state is retrieved from the session_state, preventing it from being forgotten.
+
+    def get_add_ticker_form_state() -> bool:
+        if 'add_ticker_form_state' not in st.session_state:
+            st.session_state['add_ticker_form_state'] = None
+        return st.session_state['add_ticker_form_state']
+
+    def get_delete_ticker_form_state() -> bool:
+        if 'delete_ticker_form_state' not in st.session_state:
+            st.session_state['delete_ticker_form_state'] = None
+        return st.session_state['delete_ticker_form_state']
+
+    # If the add_ticker button is active this method returns True
+    if get_add_ticker_form_state():
+        with st.sidebar.form('form'):
+            temp_add_input = st.text_input('Add new ticker')
+            cols = st.columns(2)
+            if cols[0].form_submit_button('submit'):
+                ticker_to_add = temp_add_input.upper()
+
+                # Importing the API module (and requests) only when it's needed
+                if validator is None:
+                    from src.polygon_api import check_ticker_validity
+                    validator = check_ticker_validity
+
+                # Checking if the given ticker is valid
+                if validator(ticker_to_add):
+
+                    # Checking if the given ticker is already in the ticker list
+                    if check_ticker_on_list(TICKER_FILE, ticker_to_add):
+
+                        st.warning('The ticker is already on the list!')
+                        # Keep the warning lane visibile for a while
+                        time.sleep(0.7)
+                    else:
+                        add_ticker(TICKER_FILE,ticker_to_add)
+                        if on_ticker_added is not None:
+                            on_ticker_added(ticker_to_add)
+                        st.success(f'{ticker_to_add} successfully saved!')
+                        # Keep the success lane visibile for a while
+                        time.sleep(0.7)
+
+                else:
+                    st.error(f'{ticker_to_add} is not a valid ticker or its not available!')
+                    # Keep the error lane visibile for a while
+                    time.sleep(1)
+                    st.rerun()
+                st.session_state['add_ticker_form_state']=False
+                st.rerun()
+
+            if cols[1].form_submit_button('cancel'):
+                st.session_state['add_ticker_form_state']=False
+                st.rerun()
+
+    # If the delete ticker button is active this method returns True
+    elif get_delete_ticker_form_state():
+        with st.sidebar.form('form'):
+            pass
+            temp_del_input = st.selectbox(
+                "Choose ticker to delete",
+                ticker_options,
+                index=None
+            )
+
+            cols = st.columns(2)
+            if cols[0].form_submit_button('delete'):
+                ticker_to_del = temp_del_input
+
+                if ticker_to_del is None:
+                    st.warning("Choose a ticker first!")
+        
+                else: 
+                    if delete_ticker(TICKER_FILE,ticker_to_del):
+                        st.success(f'{ticker_to_del} successfully deleted!')
+                        time.sleep(0.5)
+                    else:
+                        st.warning(f'The deletion was unsuccessful!')
+                        time.sleep(0.5)
+
+                st.session_state['delete_ticker_form_state']=False
+                st.rerun()
+
+            if cols[1].form_submit_button('cancel'):
+                st.session_state['delete_ticker_form_state']=False
+                st.rerun()
+
+    else:
+        button_cols = st.sidebar.columns(2)
+        if button_cols[0].button('Add new ticker'):
+            st.session_state['add_ticker_form_state'] = True
+            st.rerun()
+
+        if button_cols[1].button('Delete ticker'):
+            st.session_state['delete_ticker_form_state'] = True
+            st.rerun()
+
+
+    return option
+
+
+def add_sidebar_comparison_form(max_tickers: int = 10) -> list[str]:
+    """
+    Multiselect of the saved tickers to compare. If at least two tickers are chosen,
+    the comparison view is shown instead of the single ticker.
+    """
+
+    return st.sidebar.multiselect(
+        "Compare tickers",
+        read_ticker_list(TICKER_FILE),
+        max_selections=max_tickers,
+        placeholder="Select tickers to compare...",
+    )
+
+
+def add_sidebar_cache_stats(
+    stats: dict,
+    figure_stats: Optional[dict] = None,
+    warmer_stats: Optional[dict] = None,
+    shared_stats: Optional[dict] = None
+) -> None:
+    """
+    Show the statistics of the ticker and the figure cache (and the background warmer, the shared cache)
+    in a collapsed sidebar section. The figure statistics are only available after the charts module has been loaded.
+    """
+
+    with st.sidebar.expander("Cache statistics"):
+        st.caption(
+            f"{stats['entries']}/{stats['max_entries']} tickers, "
+            f"{stats['bytes'] / 1024**2:.1f}/{stats['max_bytes'] / 1024**2:.0f} MB"
+        )
+        st.json(stats)
+        if figure_stats is not None:
+            st.caption(
+                f"Figures: {figure_stats['entries']} cached, "
+                f"{figure_stats['avg_saved_per_hit_ms']} ms saved per render"
+            )
+            st.json(figure_stats)
+        if warmer_stats is not None:
+            st.caption(f"Background loading: {warmer_stats['queued']} tickers queued")
+            st.json(warmer_stats)
+        if shared_stats is not None:
+            st.caption(
+                f"Shared cache ({shared_stats['backend']}): {shared_stats['hits']} hits, "
+                f"{shared_stats['compression_ratio']}x compression"
+            )
+            st.json(shared_stats)
+
+
+def add_sidebar_debug_panel(request: Trace, stream_stats: Optional[dict] = None) -> None:
+    """
+    Optional panel with the timings of the current page request, aggregated by stage and span,
+    and the retries of the API calls and the circuit breakers. The statistics of the live
+    price stream are shown too, if it's on. The process-wide metrics can be downloaded in the Prometheus format.
+    """
+
+    if not st.sidebar.toggle("Show timings", value=False):
+        return
+
+    summary = request.summary()
+    with st.sidebar.expander("Timings", expanded=True):
+        st.caption(f"Request {summary['trace_id']}: {summary['wall_ms']:.0f} ms")
+        st.json(summary['stages'])
+        st.dataframe(
+            [{'span': name, **item} for name, item in summary['spans'].items()],
+            use_container_width=True,
+            hide_index=True
+        )
+        retries = retry_stats()
+        if retries:
+            st.caption("API calls and retries (since the start of the server):")
+            st.json(retries, expanded=False)
+        breakers = breaker_stats()
+        if breakers:
+            st.caption("Circuit breakers of the data sources:")
+            st.json(breakers, expanded=False)
+        if stream_stats is not None:
+            st.caption("Live price stream:")
+            st.json(stream_stats, expanded=False)
+        st.download_button(
+            "Prometheus metrics",
+            REGISTRY.to_prometheus(),
+            file_name='metrics.prom',
+            mime='text/plain'
+        )
+        st.download_button(
+            "Request JSON",
+            request.to_json(),
+            file_name=f"trace-{summary['trace_id']}.json",
+            mime='application/json'
+        )
@@ -0,0 +1,471 @@
+"""
+Module for the offline snapshot mode of the dashboard.
+
+A snapshot is a folder with the API payloads and the price frames of the tickers,
+in the same layout as the test fixtures (src/tests/test_resources), but compressed
+(src.compression, the financials with the shared financials dictionary):
+
+    <folder>/manifest.json                  the tickers and the time of the export
+    <folder>/<TICKER>/details.json.cz       PolygonAPI attributes
+    <folder>/<TICKER>/financials.json.cz
+    <folder>/<TICKER>/news.json.cz
+    <folder>/<TICKER>/price_hist.json.cz    PriceAPI attributes (JSON encoded record strings)
+    <folder>/<TICKER>/dividend_hist.json.cz
+    <folder>/<TICKER>/earning_dates.json.cz
+
+If SNAPSHOT_DIR is set in the .env file, the app loads the tickers only from the snapshot,
+without any network request. The gzipped files of the older snapshots and the uncompressed
+fixture files are read too, so the test fixtures can be served as a snapshot as well.
+
+Export the saved tickers (from the repository root):
+
+    python -m src.snapshot export /tmp/snapshot
+    python -m src.snapshot export /tmp/snapshot --tickers MSFT GOOGL
+
+The financials of a regular load are the filings since 2010. The backfill loads every filing
+of the tickers, page by page, into their financials files (the normalized filings, see
+polygon_api.normalize_filing). The later writes (e.g. of src.ingest) add the new filings to the
+stored ones, so the full history is kept:
+
+    python -m src.snapshot backfill /tmp/snapshot --tickers MSFT
+
+The heavy modules (pandas and the APIs) are imported only when a ticker is loaded or written.
+"""
+
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+from src.compression import compress, decompress, financials_dictionary
+from src.json_io import file_lock
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from src.data_processor import DataProcessor
+    from src.polygon_api import PolygonAPI
+
+
+MANIFEST_FILE = 'manifest.json'
+
+# The attributes of the PolygonAPI and the PriceAPI
+PAYLOADS = ('details', 'financials', 'news')
+FRAMES = ('price_hist', 'dividend_hist', 'earning_dates')
+# The attributes loaded from each data source
+SOURCE_ATTRIBUTES = {'polygon': PAYLOADS, 'yfinance': FRAMES}
+
+
+class SnapshotNotFoundError(Exception):
+    def __init__(self, message="The ticker isn't in the snapshot"):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _atomic_write(file: str, content: bytes) -> None:
+    """
+    Write the file through a temporary file, so the app never reads a half written one.
+    """
+
+    handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(file), prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(content)
+        os.replace(temp_file, file)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+
+
+# The suffixes of the stored files, the preferred one first
+SUFFIXES = ('.cz', '.gz', '')
+
+
+def _write_json(file: str, value: Any, dictionary: Optional[bytes] = None) -> None:
+
+    _atomic_write(file + '.cz', compress(json.dumps(value, separators=(',', ':')).encode(), dictionary=dictionary))
+    # The file of an older snapshot would be read instead of the new one
+    if os.path.exists(file + '.gz'):
+        os.remove(file + '.gz')
+
+
+def _stored_file(file: str) -> str:
+    """
+    The compressed, the gzipped or the uncompressed version of the file, whichever exists.
+    """
+
+    for suffix in SUFFIXES[:-1]:
+        if os.path.exists(file + suffix):
+            return file + suffix
+    return file
+
+
+def _read_json(file: str) -> Any:
+    """
+    Read the compressed file, the gzipped one of an older snapshot, or the uncompressed one.
+    """
+
+    stored = _stored_file(file)
+    with open(stored, 'rb') as f:
+        content = f.read()
+    if stored.endswith('.cz'):
+        content = decompress(content)
+    elif stored.endswith('.gz'):
+        content = gzip.decompress(content)
+    return json.loads(content)
+
+
+def _filing_key(filing: dict) -> tuple:
+    return (filing['timeframe'], str(filing['fiscal_year']), filing['fiscal_period'])
+
+
+def merge_filings(newer: Iterable[dict], older: Iterable[dict]) -> list[dict]:
+    """
+    Merge the filings of a ticker, a filing of newer replaces the one of the same period in older.
+    The filings are ordered like the API responses, the latest period first.
+    """
+
+    merged = {_filing_key(filing): filing for filing in older}
+    for filing in newer:
+        merged[_filing_key(filing)] = filing
+    return sorted(merged.values(), key=lambda filing: (filing['end_date'], filing.get('filing_date', '')), reverse=True)
+
+
+def _frame_to_json(df: "pd.DataFrame") -> str:
+    return df.reset_index().to_json(orient='records')
+
+
+def _frame_from_json(data: str) -> "pd.DataFrame":
+    """
+    Parse a frame the same way as the test fixtures are parsed (src.tests.test_data_processor.init_data_local).
+    """
+
+    from io import StringIO
+    import pandas as pd
+
+    df = pd.read_json(StringIO(data))
+    if 'Earnings Date' in df.columns:
+        df['Earnings Date'] = pd.to_datetime(df['Earnings Date'], unit='ms')
+        df.index = pd.Index(df['Earnings Date'])
+        df.drop(columns=['Earnings Date'], inplace=True)
+    else:
+        df.index = pd.Index(df['Date'])
+        df.drop(columns=['Date'], inplace=True)
+    return df
+
+
+def load_from_apis(ticker: str, parts: Optional[dict] = None, allow_partial: bool = False) -> "DataProcessor":
+    """
+    Load the ticker from the Polygon API and yfinance (the online mode of the app).
+    If FINANCIALS_FULL_HISTORY is set, every filing of the ticker is loaded (not only the ones since 2010).
+    The API objects are put into the optional parts dict before the requests, so the
+    data loaded so far can be read while the ticker is loading (see partial_data).
+
+    With allow_partial, a source which is down (a failure of its circuit breaker) doesn't fail
+    the load: its error is put into the unavailable dict of the data, and its attributes which
+    couldn't be loaded are None. The error is raised if both sources are down.
+    """
+
+    from src import daily_price_api, polygon_api
+    from src.circuit_breaker import CircuitOpenError
+    from src.data_processor import DataProcessor
+
+    fin_api = polygon_api.PolygonAPI(ticker)
+    price_api = daily_price_api.PriceAPI(ticker)
+    if parts is not None:
+        parts.update(fin_api=fin_api, price_api=price_api)
+
+    get_financials = functools.partial(fin_api.get_financials, full_history=bool(os.getenv("FINANCIALS_FULL_HISTORY")))
+
+    sources = (
+        ('polygon', polygon_api.BREAKER, (fin_api.get_ticker_details, get_financials, fin_api.get_news)),
+        ('yfinance', daily_price_api.BREAKER, (price_api.get_history, price_api.get_earnings_dates)),
+    )
+    unavailable: dict[str, str] = {}
+    for source, breaker, requests in sources:
+        try:
+            for request in requests:
+                request()
+        except Exception as error:
+            if not allow_partial or not (isinstance(error, CircuitOpenError) or breaker.is_failure(error)):
+                raise
+            unavailable[source] = getattr(error, 'message', None) or str(error) or type(error).__name__
+            if len(unavailable) == len(sources):
+                raise
+
+    data = DataProcessor(
+        fin_api=fin_api,
+        price_api=price_api
+    )
+    data.unavailable = unavailable
+    return data
+
+
+def partial_data(parts: dict) -> Optional["DataProcessor"]:
+    """
+    Create a DataProcessor from the API objects of a load in progress (load_from_apis),
+    or None if they haven't been created yet. The attributes not loaded yet are None.
+    """
+
+    if 'fin_api' not in parts:
+        return None
+
+    from src.data_processor import DataProcessor
+
+    return DataProcessor(
+        fin_api=parts['fin_api'],
+        price_api=parts['price_api']
+    )
+
+
+def write_ticker(directory: str, data: "DataProcessor") -> str:
+    """
+    Write the data of a ticker into the snapshot. Returns the folder of the ticker.
+    The stored filings which aren't in the data (e.g. the ones of a backfill) are kept.
+    """
+
+    folder = os.path.join(directory, data.ticker)
+    os.makedirs(folder, exist_ok=True)
+
+    for name in PAYLOADS:
+        file = os.path.join(folder, f'{name}.json')
+        value = getattr(data, name)
+        dictionary = None
+        if name == 'financials':
+            # The line items of the filings repeat across the tickers, the shared dictionary has them
+            dictionary = financials_dictionary()
+            if value is not None and os.path.exists(_stored_file(file)):
+                value = merge_filings(value, _read_json(file) or [])
+        _write_json(file, value, dictionary)
+    for name in FRAMES:
+        _write_json(os.path.join(folder, f'{name}.json'), _frame_to_json(getattr(data, name)))
+
+    return folder
+
+
+def load_ticker(directory: str, ticker: str) -> "DataProcessor":
+    """
+    Create the DataProcessor of the ticker from the snapshot, without any network request.
+    Its data_version is the bundle_version of the files.
+    Raises SnapshotNotFoundError if the ticker isn't in the snapshot.
+    """
+
+    from src.polygon_api import PolygonAPI
+    from src.daily_price_api import PriceAPI
+    from src.data_processor import DataProcessor
+
+    version = bundle_version(directory, ticker)
+    if version is None:
+        raise SnapshotNotFoundError(f"{ticker} isn't in the snapshot {directory}")
+
+    folder = os.path.join(directory, ticker.upper())
+
+    fin_api = PolygonAPI(ticker)
+    for name in PAYLOADS:
+        setattr(fin_api, name, _read_json(os.path.join(folder, f'{name}.json')))
+
+    price_api = PriceAPI(ticker)
+    for name in FRAMES:
+        setattr(price_api, name, _frame_from_json(_read_json(os.path.join(folder, f'{name}.json'))))
+
+    data = DataProcessor(
+        fin_api=fin_api,
+        price_api=price_api
+    )
+    # The same files get the same version, so e.g. the cached figures stay valid after a reload
+    data.data_version = version
+    return data
+
+
+def _ticker_files(directory: str, ticker: str) -> list[str]:
+    """
+    The files of the ticker, the compressed, the gzipped or the uncompressed ones.
+    """
+
+    folder = os.path.join(directory, ticker.upper())
+    return [_stored_file(os.path.join(folder, f'{name}.json')) for name in PAYLOADS + FRAMES]
+
+
+def bundle_version(directory: str, ticker: str) -> Optional[str]:
+    """
+    Identify the current files of the ticker by their modification times and sizes,
+    without reading them. It's None if the ticker isn't in the snapshot.
+    """
+
+    signature = []
+    for file in _ticker_files(directory, ticker):
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            return None
+        signature.append(f'{stat.st_mtime_ns}:{stat.st_size}')
+    return f'{ticker.upper()}:' + hashlib.sha1(','.join(signature).encode()).hexdigest()[:16]
+
+
+def has_ticker(directory: str, ticker: str) -> bool:
+    """
+    Check if every file of the ticker is in the snapshot.
+    """
+
+    return all(os.path.exists(file) for file in _ticker_files(directory, ticker))
+
+
+def read_manifest(directory: str) -> Optional[dict[str, Any]]:
+    """
+    Read the manifest of the snapshot, or None if it doesn't have one (e.g. the test fixtures).
+    """
+
+    file = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(file):
+        return None
+    with open(file, 'r') as f:
+        return json.load(f)
+
+
+def update_manifest(directory: str, tickers: Iterable[str], failed: dict[str, str], source: str = 'export') -> dict[str, Any]:
+    """
+    Add the written tickers to the manifest (the tickers of the earlier writes stay in it),
+    and set the time of the update and the failed tickers (with the error).
+    The manifest is updated under its lock, so the concurrent writers (e.g. the ingestion
+    worker and a backfill) don't lose each other's tickers.
+    """
+
+    file = os.path.join(directory, MANIFEST_FILE)
+    with file_lock(file):
+        previous = read_manifest(directory) or {}
+        manifest = {
+            **previous,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'source': source,
+            'tickers': sorted(set(previous.get('tickers', [])) | set(tickers)),
+            'failed': failed,
+        }
+        _atomic_write(file, json.dumps(manifest, indent=2).encode())
+    return manifest
+
+
+def record_backfill(directory: str, tickers: Iterable[str], failed: dict[str, str]) -> dict[str, Any]:
+    """
+    Add the backfilled tickers to the manifest, under its 'backfill' key. The source and the
+    time of the data stay the ones of the last export or ingestion pass.
+    """
+
+    file = os.path.join(directory, MANIFEST_FILE)
+    with file_lock(file):
+        previous = read_manifest(directory) or {}
+        backfill = previous.get('backfill', {})
+        manifest = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'source': 'backfill',
+            'failed': {},
+            **previous,
+            # The tickers which weren't in the snapshot have been exported by the backfill
+            'tickers': sorted(set(previous.get('tickers', [])) | set(tickers)),
+            'backfill': {
+                'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'tickers': sorted(set(backfill.get('tickers', [])) | set(tickers)),
+                'failed': failed,
+            },
+        }
+        _atomic_write(file, json.dumps(manifest, indent=2).encode())
+    return manifest
+
+
+def export_snapshot(directory: str, tickers: Iterable[str], loader=load_from_apis) -> dict[str, Any]:
+    """
+    Load every ticker and write it into the snapshot. The manifest is written at the end.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    exported: list[str] = []
+    failed: dict[str, str] = {}
+    for ticker in tickers:
+        try:
+            write_ticker(directory, loader(ticker))
+        except Exception as error:
+            failed[ticker] = type(error).__name__
+        else:
+            exported.append(ticker)
+
+    return update_manifest(directory, exported, failed)
+
+
+def backfill_financials(directory: str, ticker: str, fin_api: Optional["PolygonAPI"] = None) -> int:
+    """
+    Load every filing of the ticker into its financials file, merged with the stored ones.
+    The filings are streamed page by page (PolygonAPI.iter_financials), only the normalized
+    filings are held. Returns the number of the stored filings.
+    """
+
+    from src.polygon_api import PolygonAPI
+
+    if fin_api is None:
+        fin_api = PolygonAPI(ticker)
+    file = os.path.join(directory, ticker.upper(), 'financials.json')
+    stored = _read_json(file) if os.path.exists(_stored_file(file)) else None
+
+    filings = merge_filings(fin_api.iter_financials(), stored or [])
+    _write_json(file, filings, financials_dictionary())
+    return len(filings)
+
+
+def backfill_snapshot(directory: str, tickers: Iterable[str], loader=load_from_apis, backfill=backfill_financials) -> dict[str, Any]:
+    """
+    Backfill the financials of every ticker. The tickers which aren't in the snapshot yet are exported first.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    done: list[str] = []
+    failed: dict[str, str] = {}
+    for ticker in tickers:
+        try:
+            if not has_ticker(directory, ticker):
+                write_ticker(directory, loader(ticker))
+            backfill(directory, ticker)
+        except Exception as error:
+            failed[ticker] = type(error).__name__
+        else:
+            done.append(ticker)
+
+    return record_backfill(directory, done, failed)
+
+
+def main() -> None:
+
+    from dotenv import load_dotenv
+    from src.json_io import read_ticker_list
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Export the tickers into an offline snapshot.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export = subparsers.add_parser('export', help="Load the tickers from the APIs and write them into the snapshot.")
+    export.add_argument('directory')
+    export.add_argument('--tickers', nargs='+', default=None, help="Defaults to the saved tickers (TICKER_FILE).")
+
+    backfill = subparsers.add_parser('backfill', help="Load every filing of the tickers into the snapshot.")
+    backfill.add_argument('directory')
+    backfill.add_argument('--tickers', nargs='+', default=None, help="Defaults to the saved tickers (TICKER_FILE).")
+
+    args = parser.parse_args()
+
+    tickers = args.tickers or read_ticker_list(os.getenv('TICKER_FILE'))
+    if args.command == 'backfill':
+        failed = backfill_snapshot(args.directory, [ticker.upper() for ticker in tickers])['backfill']['failed']
+        print(f"{len(tickers) - len(failed)} tickers backfilled in {args.directory}")
+    else:
+        failed = export_snapshot(args.directory, [ticker.upper() for ticker in tickers])['failed']
+        print(f"{len(tickers) - len(failed)} tickers exported to {args.directory}")
+    for ticker, error in failed.items():
+        print(f"{ticker}: {error}")
+
+
+if __name__ == '__main__':
+    main()
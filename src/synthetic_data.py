@@ -0,0 +1,685 @@
+"""
+Module generating synthetic, API-shaped data for scale testing.
+
+The recorded fixtures (src/tests/test_resources) contain three tickers and a few years
+of filings. This module generates any number of tickers with decades of history in
+the same shapes as the APIs return them:
+    - Polygon: financials (Q1-Q3 quarterly and FY annual filings), details and news
+    - yfinance: price history, dividend history and earnings dates frames
+
+The tickers have random fiscal year ends (including 52/53-week calendars like JNJ's),
+and a part of them can get the anomalies seen in the real data, which make
+DataProcessor.calculate_quarterly_data raise an IncorrectDataError.
+
+Everything is deterministic for the same seed and end date. An example of usage:
+
+for synthetic in generate_universe(1000, years=30, seed=1):
+    data = make_data_processor(synthetic)
+    data.get_ttm_profit_margin()
+
+The generated tickers can also be written in the format of the test fixtures:
+
+    python -m src.synthetic_data --tickers 100 --years 30 --out /tmp/synthetic
+
+"""
+
+import argparse
+import calendar
+import json
+import os
+from datetime import date, timedelta
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+
+
+# The edge cases of the real data which can be injected into a ticker, and how
+# DataProcessor.calculate_quarterly_data handles them
+ANOMALIES = (
+    'missing_quarter',      # a quarterly filing is missing: the history is cut at that year
+    'mislabeled_period',    # a quarterly filing has the period of a year earlier (JNJ): IncorrectDataError
+    'shifted_fiscal_year',  # an FY filing has the previous fiscal year: wrong Q4 values, no error
+    'missing_metric',       # the net income is missing from a filing: IncorrectDataError for that metric
+)
+
+SIC_CODES = {
+    '7372': 'SERVICES-PREPACKAGED SOFTWARE',
+    '2834': 'PHARMACEUTICAL PREPARATIONS',
+    '3674': 'SEMICONDUCTORS & RELATED DEVICES',
+    '6022': 'STATE COMMERCIAL BANKS',
+    '5331': 'RETAIL-VARIETY STORES',
+    '2911': 'PETROLEUM REFINING',
+}
+
+PUBLISHERS = ['Benzinga', 'The Motley Fool', 'Zacks Investment Research', 'GlobeNewswire Inc.']
+
+# The labels of the generated line items, by statement
+LABELS: dict[str, dict[str, str]] = {
+    'income_statement': {
+        'revenues': 'Revenues',
+        'cost_of_revenue': 'Cost Of Revenue',
+        'gross_profit': 'Gross Profit',
+        'research_and_development': 'Research and Development',
+        'other_operating_expenses': 'Other Operating Expenses',
+        'operating_expenses': 'Operating Expenses',
+        'costs_and_expenses': 'Costs And Expenses',
+        'operating_income_loss': 'Operating Income/Loss',
+        'nonoperating_income_loss': 'Nonoperating Income/Loss',
+        'income_loss_from_continuing_operations_before_tax': 'Income/Loss From Continuing Operations Before Tax',
+        'income_tax_expense_benefit': 'Income Tax Expense/Benefit',
+        'income_loss_from_continuing_operations_after_tax': 'Income/Loss From Continuing Operations After Tax',
+        'net_income_loss': 'Net Income/Loss',
+        'net_income_loss_attributable_to_noncontrolling_interest': 'Net Income/Loss Attributable To Noncontrolling Interest',
+        'net_income_loss_attributable_to_parent': 'Net Income/Loss Attributable To Parent',
+        'net_income_loss_available_to_common_stockholders_basic': 'Net Income/Loss Available To Common Stockholders, Basic',
+        'basic_average_shares': 'Basic Average Shares',
+        'diluted_average_shares': 'Diluted Average Shares',
+        'basic_earnings_per_share': 'Basic Earnings Per Share',
+        'diluted_earnings_per_share': 'Diluted Earnings Per Share',
+    },
+    'balance_sheet': {
+        'assets': 'Assets',
+        'current_assets': 'Current Assets',
+        'cash': 'Cash',
+        'inventory': 'Inventory',
+        'other_current_assets': 'Other Current Assets',
+        'noncurrent_assets': 'Noncurrent Assets',
+        'fixed_assets': 'Fixed Assets',
+        'liabilities': 'Liabilities',
+        'current_liabilities': 'Current Liabilities',
+        'accounts_payable': 'Accounts Payable',
+        'noncurrent_liabilities': 'Noncurrent Liabilities',
+        'long_term_debt': 'Long-term Debt',
+        'equity': 'Equity',
+        'equity_attributable_to_parent': 'Equity Attributable To Parent',
+        'equity_attributable_to_noncontrolling_interest': 'Equity Attributable To Noncontrolling Interest',
+        'liabilities_and_equity': 'Liabilities And Equity',
+    },
+    'cash_flow_statement': {
+        'net_cash_flow_from_operating_activities': 'Net Cash Flow From Operating Activities',
+        'net_cash_flow_from_investing_activities': 'Net Cash Flow From Investing Activities',
+        'net_cash_flow_from_financing_activities': 'Net Cash Flow From Financing Activities',
+        'net_cash_flow': 'Net Cash Flow',
+    },
+    'comprehensive_income': {
+        'comprehensive_income_loss': 'Comprehensive Income/Loss',
+        'comprehensive_income_loss_attributable_to_parent': 'Comprehensive Income/Loss Attributable To Parent',
+        'other_comprehensive_income_loss': 'Other Comprehensive Income/Loss',
+    },
+}
+
+# Share counts and per share values aren't in USD
+_UNITS = {
+    'basic_average_shares': 'shares',
+    'diluted_average_shares': 'shares',
+    'basic_earnings_per_share': 'USD / shares',
+    'diluted_earnings_per_share': 'USD / shares',
+}
+
+
+class SyntheticTicker:
+
+    """
+    The generated data of a single ticker, in the shapes of the PolygonAPI and the PriceAPI attributes.
+
+    Besides the API data it keeps the true fiscal quarterly values (quarterly_truth) and the
+    injected anomalies, so the results of the DataProcessor can be checked.
+    """
+
+    def __init__(
+        self,
+        ticker: str,
+        details: dict,
+        financials: list[dict],
+        news: list[dict],
+        price_hist: pd.DataFrame,
+        dividend_hist: pd.DataFrame,
+        earning_dates: pd.DataFrame,
+        quarterly_truth: pd.DataFrame,
+        fiscal_year_end_month: int,
+        week_based: bool,
+        anomalies: tuple[str, ...]
+    ) -> None:
+
+        self.ticker = ticker
+        self.details = details
+        self.financials = financials
+        self.news = news
+        self.price_hist = price_hist
+        self.dividend_hist = dividend_hist
+        self.earning_dates = earning_dates
+        self.quarterly_truth = quarterly_truth
+        self.fiscal_year_end_month = fiscal_year_end_month
+        self.week_based = week_based
+        self.anomalies = anomalies
+
+
+def ticker_symbol(index: int) -> str:
+    """
+    Unique symbol of the index-th synthetic ticker (SYAAA, SYAAB, ...).
+    """
+
+    letters = []
+    for _ in range(3):
+        index, remainder = divmod(index, 26)
+        letters.append(chr(ord('A') + remainder))
+    suffix = str(index) if index else ''
+    return 'SY' + ''.join(reversed(letters)) + suffix
+
+
+def _period_end(year: int, month: int, week_based: bool) -> date:
+    """
+    The last day of the month, or the Sunday closest to it for a 52/53-week calendar.
+    """
+
+    month_end = date(year, month, calendar.monthrange(year, month)[1])
+    if not week_based:
+        return month_end
+
+    forward = (6 - month_end.weekday()) % 7
+    return month_end + timedelta(days=forward if forward <= 3 else forward - 7)
+
+
+def _fiscal_quarters(first_year: int, last_year: int, end_month: int, week_based: bool) -> pd.DataFrame:
+    """
+    The fiscal quarters of the fiscal years (labeled with the calendar year they end in).
+    """
+
+    rows = []
+    for fiscal_year in range(first_year, last_year + 1):
+        for quarter in range(1, 5):
+            # Q4 ends at the fiscal year end, the others 3, 6 and 9 months earlier
+            months_back = 3 * (4 - quarter)
+            year, month = divmod(fiscal_year * 12 + end_month - 1 - months_back, 12)
+            rows.append({
+                'fiscal_year': fiscal_year,
+                'quarter': quarter,
+                'end_date': _period_end(year, month + 1, week_based),
+            })
+
+    df = pd.DataFrame(rows)
+    df['start_date'] = df['end_date'].shift(1).map(lambda d: d + timedelta(days=1) if pd.notnull(d) else None)
+    df.loc[0, 'start_date'] = df.loc[0, 'end_date'] - timedelta(days=91)
+    return df
+
+
+def _line_items(rng: np.random.Generator, quarters: int) -> dict[str, np.ndarray]:
+    """
+    Generate the fiscal quarterly values of every line item.
+    The flow items are per quarter, the balance sheet items are the quarter end values.
+    """
+
+    t = np.arange(quarters)
+    yearly_growth = rng.normal(0.08, 0.06)
+    seasonality = np.roll(np.array([0.0, 0.02, 0.04, 0.1]) * rng.uniform(0, 1), rng.integers(4))
+    revenue = (
+        rng.lognormal(20, 1.5)
+        * (1 + yearly_growth) ** (t / 4)
+        * (1 + seasonality[t % 4])
+        * rng.normal(1, 0.03, quarters)
+    )
+
+    gross_margin = np.clip(rng.normal(0.45, 0.15) + rng.normal(0, 0.02, quarters), 0.05, 0.95)
+    rd_ratio, other_ratio = rng.uniform(0, 0.2), rng.uniform(0.05, 0.2)
+
+    items: dict[str, np.ndarray] = {'revenues': revenue}
+    items['cost_of_revenue'] = revenue * (1 - gross_margin)
+    items['gross_profit'] = revenue - items['cost_of_revenue']
+    items['research_and_development'] = revenue * rd_ratio
+    items['other_operating_expenses'] = revenue * other_ratio
+    items['operating_expenses'] = items['research_and_development'] + items['other_operating_expenses']
+    items['costs_and_expenses'] = items['cost_of_revenue'] + items['operating_expenses']
+    items['operating_income_loss'] = items['gross_profit'] - items['operating_expenses']
+    items['nonoperating_income_loss'] = revenue * rng.normal(0, 0.01, quarters)
+    pretax = items['operating_income_loss'] + items['nonoperating_income_loss']
+    items['income_loss_from_continuing_operations_before_tax'] = pretax
+    items['income_tax_expense_benefit'] = np.maximum(pretax, 0) * rng.uniform(0.1, 0.25)
+    net_income = pretax - items['income_tax_expense_benefit']
+    items['income_loss_from_continuing_operations_after_tax'] = net_income
+    items['net_income_loss'] = net_income
+    items['net_income_loss_attributable_to_noncontrolling_interest'] = net_income * rng.uniform(0, 0.02)
+    items['net_income_loss_attributable_to_parent'] = net_income - items['net_income_loss_attributable_to_noncontrolling_interest']
+    items['net_income_loss_available_to_common_stockholders_basic'] = items['net_income_loss_attributable_to_parent']
+
+    shares = rng.lognormal(20, 1) * (1 - rng.uniform(0, 0.01)) ** t
+    items['basic_average_shares'] = shares
+    items['diluted_average_shares'] = shares * rng.uniform(1, 1.02)
+    items['basic_earnings_per_share'] = items['net_income_loss_attributable_to_parent'] / shares
+    items['diluted_earnings_per_share'] = items['net_income_loss_attributable_to_parent'] / items['diluted_average_shares']
+
+    # The equity grows with the retained earnings
+    payout = rng.uniform(0, 0.6)
+    equity = revenue[0] * rng.uniform(1, 4) + np.cumsum(items['net_income_loss_attributable_to_parent'] * (1 - payout))
+    equity = np.maximum(equity, revenue * 0.1)
+    assets = equity * rng.uniform(1.3, 3.5)
+    items['equity'] = equity
+    items['equity_attributable_to_noncontrolling_interest'] = equity * 0.01
+    items['equity_attributable_to_parent'] = equity * 0.99
+    items['assets'] = assets
+    items['liabilities'] = assets - equity
+    items['liabilities_and_equity'] = assets
+    items['current_assets'] = assets * 0.4
+    items['cash'] = items['current_assets'] * 0.35
+    items['inventory'] = items['current_assets'] * 0.2
+    items['other_current_assets'] = items['current_assets'] - items['cash'] - items['inventory']
+    items['noncurrent_assets'] = assets - items['current_assets']
+    items['fixed_assets'] = items['noncurrent_assets'] * 0.5
+    items['current_liabilities'] = items['liabilities'] * 0.35
+    items['accounts_payable'] = items['current_liabilities'] * 0.4
+    items['noncurrent_liabilities'] = items['liabilities'] - items['current_liabilities']
+    items['long_term_debt'] = items['noncurrent_liabilities'] * 0.7
+
+    operating = net_income * rng.normal(1.25, 0.1, quarters)
+    investing = -revenue * rng.uniform(0.02, 0.15) * rng.normal(1, 0.2, quarters)
+    financing = -items['net_income_loss_attributable_to_parent'].clip(min=0) * payout * rng.normal(1, 0.2, quarters)
+    items['net_cash_flow_from_operating_activities'] = operating
+    items['net_cash_flow_from_investing_activities'] = investing
+    items['net_cash_flow_from_financing_activities'] = financing
+    items['net_cash_flow'] = operating + investing + financing
+
+    oci = revenue * rng.normal(0, 0.005, quarters)
+    items['other_comprehensive_income_loss'] = oci
+    items['comprehensive_income_loss'] = net_income + oci
+    items['comprehensive_income_loss_attributable_to_parent'] = items['net_income_loss_attributable_to_parent'] + oci
+
+    return items
+
+
+def _filing_values(items: dict[str, np.ndarray], indexes: list[int]) -> dict[str, dict]:
+    """
+    The 'financials' dict of a filing covering the given fiscal quarters.
+    The flow items are summed, the balance sheet and the per share counts are taken at the end.
+    """
+
+    last = indexes[-1]
+    financials: dict[str, dict] = {}
+    for statement, labels in LABELS.items():
+        values = {}
+        for order, (metric, label) in enumerate(labels.items()):
+            series = items[metric]
+            if statement == 'balance_sheet' or metric.endswith('_shares'):
+                value = series[last]
+            else:
+                value = series[indexes].sum()
+            values[metric] = {
+                'value': round(float(value), 2),
+                'unit': _UNITS.get(metric, 'USD'),
+                'label': label,
+                'order': (order + 1) * 100,
+            }
+        financials[statement] = values
+    return financials
+
+
+def _financials(
+    ticker: str,
+    cik: str,
+    company_name: str,
+    sic: str,
+    quarters: pd.DataFrame,
+    items: dict[str, np.ndarray],
+    end: date
+) -> list[dict]:
+    """
+    The Polygon financials: Q1-Q3 quarterly and FY annual filings (there's no Q4 filing),
+    only the ones filed until the end date, the newest first.
+    """
+
+    filings = []
+    for fiscal_year, group in quarters.groupby('fiscal_year'):
+        indexes = list(group.index)
+        periods = [(f'Q{q}', 'quarterly', [i]) for q, i in zip(group['quarter'], indexes) if q < 4]
+        if len(indexes) == 4:
+            periods.append(('FY', 'annual', indexes))
+
+        for fiscal_period, timeframe, covered in periods:
+            start_date = quarters.loc[covered[0], 'start_date']
+            end_date = quarters.loc[covered[-1], 'end_date']
+            filing_date = end_date + timedelta(days=30 if timeframe == 'quarterly' else 45)
+            if filing_date > end:
+                continue
+
+            filings.append({
+                'id': f'{cik}:{fiscal_year}:{fiscal_period}',
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'filing_date': filing_date.isoformat(),
+                'acceptance_datetime': f'{filing_date.isoformat()}T20:05:00Z',
+                'timeframe': timeframe,
+                'fiscal_period': fiscal_period,
+                'fiscal_year': str(fiscal_year),
+                'cik': cik,
+                'sic': sic,
+                'tickers': [ticker],
+                'company_name': company_name.upper(),
+                'financials': _filing_values(items, covered),
+            })
+
+    filings.sort(key=lambda filing: filing['end_date'], reverse=True)
+    return filings
+
+
+def _inject_anomalies(rng: np.random.Generator, filings: list[dict], anomalies: tuple[str, ...]) -> None:
+    """
+    Modify the filings in place. The anomalies are put into the recent years (where the
+    dashboard looks, from 2018), but not into the newest and the oldest ones.
+    """
+
+    candidates = filings[4:min(len(filings) - 8, 24)]
+    quarterly = [filing for filing in candidates if filing['timeframe'] == 'quarterly']
+    annual = [filing for filing in candidates if filing['timeframe'] == 'annual']
+
+    def shift_year(day: str, years: int) -> str:
+        shifted = date.fromisoformat(day)
+        return date(shifted.year + years, shifted.month, min(shifted.day, 28)).isoformat()
+
+    for anomaly in anomalies:
+        if anomaly == 'missing_quarter' and quarterly:
+            filings.remove(quarterly.pop(int(rng.integers(len(quarterly)))))
+
+        elif anomaly == 'mislabeled_period' and quarterly:
+            # The filing is reported with the period of a year earlier, so a calendar
+            # year gets 5 quarters and another one only 3 (like the JNJ data)
+            filing = quarterly.pop(int(rng.integers(len(quarterly))))
+            filing['start_date'] = shift_year(filing['start_date'], -1)
+            filing['end_date'] = shift_year(filing['end_date'], -1)
+            filing['fiscal_period'] = 'Q4'
+
+        elif anomaly == 'shifted_fiscal_year' and annual:
+            # The Q4 values derived from this FY filing are silently wrong
+            filing = annual.pop(int(rng.integers(len(annual))))
+            filing['fiscal_year'] = str(int(filing['fiscal_year']) - 1)
+
+        elif anomaly == 'missing_metric' and candidates:
+            filing = candidates[int(rng.integers(len(candidates)))]
+            filing['financials']['income_statement'].pop('net_income_loss_attributable_to_parent', None)
+
+
+def _price_frames(rng: np.random.Generator, start: date, end: date) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Daily OHLCV prices (geometric Brownian motion on the business days) and the dividends.
+    """
+
+    index = pd.bdate_range(start, end, name='Date')
+    days = len(index)
+
+    log_returns = rng.normal(rng.normal(0.0003, 0.0003), rng.uniform(0.01, 0.03), days)
+    close = rng.uniform(10, 500) * np.exp(np.cumsum(log_returns))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * rng.normal(1, 0.004, days)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, days)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, days)))
+    volume = rng.lognormal(16, 0.5, days).astype(np.int64)
+
+    price_hist = pd.DataFrame(
+        {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+        index=index
+    )
+
+    # Quarterly dividends of a third of the tickers, about 2% yearly yield
+    dividends = np.zeros(days)
+    if rng.uniform() < 0.66:
+        payment_days = np.arange(int(rng.integers(1, 63)), days, 63)
+        dividends[payment_days] = np.round(close[payment_days] * rng.uniform(0.003, 0.008), 2)
+    dividend_hist = pd.DataFrame({'Dividends': dividends}, index=index)
+
+    return price_hist, dividend_hist
+
+
+def _earning_dates(
+    rng: np.random.Generator,
+    quarters: pd.DataFrame,
+    items: dict[str, np.ndarray],
+    end: date
+) -> pd.DataFrame:
+    """
+    The last 8 reported and the next 4 upcoming earnings dates, the newest first.
+    """
+
+    offsets = rng.integers(20, 35, len(quarters) + 4)
+    report_dates = [end_date + timedelta(days=int(offset)) for end_date, offset in zip(quarters['end_date'], offsets)]
+    reported = [i for i, report_date in enumerate(report_dates) if report_date <= end][-8:]
+
+    # The not yet reported quarters and the next fiscal quarters
+    last_end = quarters['end_date'].iloc[-1]
+    upcoming = [report_date for report_date in report_dates if report_date > end]
+    upcoming += [last_end + timedelta(days=91 * i + int(offsets[-i])) for i in range(1, 5)]
+
+    rows = []
+    for i in reported:
+        eps = items['diluted_earnings_per_share'][i]
+        estimate = eps * rng.normal(0.97, 0.05)
+        rows.append({
+            'Earnings Date': pd.Timestamp(report_dates[i]) + pd.Timedelta(hours=16),
+            'EPS Estimate': round(float(estimate), 2),
+            'Reported EPS': round(float(eps), 2),
+            'Surprise(%)': round(float((eps - estimate) / abs(estimate)), 4) if estimate else np.nan,
+        })
+    for upcoming_date in upcoming[:4]:
+        rows.append({
+            'Earnings Date': pd.Timestamp(upcoming_date) + pd.Timedelta(hours=16),
+            'EPS Estimate': np.nan,
+            'Reported EPS': np.nan,
+            'Surprise(%)': np.nan,
+        })
+
+    df = pd.DataFrame(rows).set_index('Earnings Date').sort_index(ascending=False)
+    return df
+
+
+def _news(rng: np.random.Generator, ticker: str, company_name: str, end: date, count: int) -> list[dict]:
+
+    news = []
+    for i in range(count):
+        published = pd.Timestamp(end) - pd.Timedelta(hours=int(rng.integers(1, 24 * 30)))
+        publisher = PUBLISHERS[int(rng.integers(len(PUBLISHERS)))]
+        domain = publisher.lower().replace(' ', '').replace('.', '') + '.com'
+        news.append({
+            'id': f'{ticker}-{i:04d}-{int(rng.integers(10**9))}',
+            'publisher': {
+                'name': publisher,
+                'homepage_url': f'https://www.{domain}/',
+                'logo_url': f'https://s3.polygon.io/public/assets/news/logos/{domain}.svg',
+                'favicon_url': f'https://s3.polygon.io/public/assets/news/favicons/{domain}.ico',
+            },
+            'title': f'{company_name} shares move after quarterly update #{i}',
+            'author': 'Synthetic Newsroom',
+            'published_utc': published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'article_url': f'https://www.{domain}/markets/{ticker.lower()}-{i}',
+            'tickers': [ticker],
+            'amp_url': f'https://www.{domain}/amp/{ticker.lower()}-{i}',
+            'image_url': f'https://cdn.{domain}/images/{ticker.lower()}-{i}.png',
+            'description': f'A synthetic article about {company_name}.',
+            'keywords': ['News', 'Earnings'],
+        })
+
+    news.sort(key=lambda item: item['published_utc'], reverse=True)
+    return news
+
+
+def generate_ticker(
+    ticker: str,
+    seed: int = 0,
+    years: int = 20,
+    end: Optional[date] = None,
+    fiscal_year_end_month: Optional[int] = None,
+    week_based: Optional[bool] = None,
+    anomalies: tuple[str, ...] = (),
+    news_count: int = 10
+) -> SyntheticTicker:
+    """
+    Generate the data of a single ticker.
+
+    Args:
+        ticker: Symbol of the ticker.
+        seed: Seed of the random generator.
+        years: Years of filings and price history.
+        end: The "today" of the data, defaults to the current date.
+        fiscal_year_end_month: Month of the fiscal year end, random (mostly December) if not given.
+        week_based: 52/53-week fiscal calendar (periods end on the Sunday closest to the month end),
+            random (10%) if not given.
+        anomalies: Edge cases to inject, see ANOMALIES.
+        news_count: Number of the news articles.
+    """
+
+    unknown = set(anomalies) - set(ANOMALIES)
+    if unknown:
+        raise ValueError(f"Unknown anomalies: {sorted(unknown)}")
+
+    rng = np.random.default_rng(seed)
+    end = end or date.today()
+
+    if fiscal_year_end_month is None:
+        fiscal_year_end_month = 12 if rng.uniform() < 0.7 else int(rng.integers(1, 12))
+    if week_based is None:
+        week_based = bool(rng.uniform() < 0.1)
+
+    # The fiscal years covering the history and the current, unfinished one
+    quarters = _fiscal_quarters(end.year - years, end.year + 1, fiscal_year_end_month, week_based)
+    quarters = quarters.loc[quarters['end_date'] <= end].reset_index(drop=True)
+    items = _line_items(rng, len(quarters))
+
+    sic = list(SIC_CODES)[int(rng.integers(len(SIC_CODES)))]
+    cik = f'{int(rng.integers(1, 2_000_000)):010d}'
+    company_name = f'{ticker.title()} Holdings Inc'
+
+    financials = _financials(ticker, cik, company_name, sic, quarters, items, end)
+    _inject_anomalies(rng, financials, anomalies)
+
+    price_hist, dividend_hist = _price_frames(rng, end - timedelta(days=365 * years), end)
+    earning_dates = _earning_dates(rng, quarters, items, end)
+
+    shares = float(items['basic_average_shares'][-1])
+    details = {
+        'ticker': ticker,
+        'name': company_name,
+        'market': 'stocks',
+        'locale': 'us',
+        'primary_exchange': 'XNAS',
+        'type': 'CS',
+        'active': True,
+        'currency_name': 'usd',
+        'cik': cik,
+        'market_cap': float(price_hist['Close'].iloc[-1]) * shares,
+        'address': {'address1': '1 SYNTHETIC WAY', 'city': 'SPRINGFIELD', 'state': 'CA', 'postal_code': '90000'},
+        'description': f'{company_name} is a synthetic company generated for scale testing.',
+        'sic_code': sic,
+        'sic_description': SIC_CODES[sic],
+        'ticker_root': ticker,
+        'homepage_url': f'https://www.{ticker.lower()}.example.com',
+        'total_employees': int(rng.integers(100, 300_000)),
+        'list_date': (end - timedelta(days=365 * years)).isoformat(),
+        'share_class_shares_outstanding': int(shares),
+        'weighted_shares_outstanding': int(shares),
+        'round_lot': 100,
+    }
+
+    truth = quarters[['fiscal_year', 'quarter', 'end_date']].copy()
+    for metric in ('revenues', 'net_income_loss_attributable_to_parent', 'equity_attributable_to_parent', 'net_cash_flow'):
+        truth[metric] = items[metric]
+
+    return SyntheticTicker(
+        ticker=ticker,
+        details=details,
+        financials=financials,
+        news=_news(rng, ticker, company_name, end, news_count),
+        price_hist=price_hist,
+        dividend_hist=dividend_hist,
+        earning_dates=earning_dates,
+        quarterly_truth=truth,
+        fiscal_year_end_month=fiscal_year_end_month,
+        week_based=week_based,
+        anomalies=tuple(anomalies),
+    )
+
+
+def generate_universe(
+    count: int,
+    seed: int = 0,
+    years: int = 20,
+    end: Optional[date] = None,
+    anomaly_rate: float = 0.05
+) -> Iterator[SyntheticTicker]:
+    """
+    Lazily generate many tickers. A random anomaly is injected into anomaly_rate of them.
+    """
+
+    rng = np.random.default_rng(seed)
+    end = end or date.today()
+
+    for index in range(count):
+        anomalies: tuple[str, ...] = ()
+        if rng.uniform() < anomaly_rate:
+            anomalies = (ANOMALIES[int(rng.integers(len(ANOMALIES)))],)
+        yield generate_ticker(
+            ticker_symbol(index),
+            seed=int(rng.integers(2**32)),
+            years=years,
+            end=end,
+            anomalies=anomalies
+        )
+
+
+def make_data_processor(synthetic: SyntheticTicker):
+    """
+    Create a DataProcessor from the synthetic data, the same way as the fixtures are loaded in the tests.
+    """
+
+    from src.data_processor import DataProcessor
+    from src.polygon_api import PolygonAPI
+    from src.daily_price_api import PriceAPI
+
+    fin_api = PolygonAPI(synthetic.ticker)
+    fin_api.details = synthetic.details
+    fin_api.financials = synthetic.financials
+    fin_api.news = synthetic.news
+
+    price_api = PriceAPI(synthetic.ticker)
+    price_api.price_hist = synthetic.price_hist
+    price_api.dividend_hist = synthetic.dividend_hist
+    price_api.earning_dates = synthetic.earning_dates
+
+    return DataProcessor(fin_api=fin_api, price_api=price_api)
+
+
+def write_fixture(synthetic: SyntheticTicker, directory: str) -> str:
+    """
+    Write the ticker in the format of src/tests/test_resources/<ticker>. Returns the folder.
+    """
+
+    folder = os.path.join(directory, synthetic.ticker)
+    os.makedirs(folder, exist_ok=True)
+
+    for name, value in (('details', synthetic.details), ('financials', synthetic.financials), ('news', synthetic.news)):
+        with open(os.path.join(folder, f'{name}.json'), 'w') as file:
+            json.dump(value, file)
+
+    # The yfinance frames are stored as JSON encoded record strings, like the recorded fixtures
+    for name, df in (
+        ('price_hist', synthetic.price_hist),
+        ('dividend_hist', synthetic.dividend_hist),
+        ('earning_dates', synthetic.earning_dates),
+    ):
+        with open(os.path.join(folder, f'{name}.json'), 'w') as file:
+            json.dump(df.reset_index().to_json(orient='records'), file)
+
+    return folder
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Generate synthetic tickers in the format of the test fixtures.")
+    parser.add_argument('--tickers', type=int, default=100)
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--anomaly-rate', type=float, default=0.05)
+    parser.add_argument('--end', type=date.fromisoformat, default=None, help="The 'today' of the data (YYYY-MM-DD).")
+    parser.add_argument('--out', required=True, help="Output folder.")
+    args = parser.parse_args()
+
+    for synthetic in generate_universe(args.tickers, args.seed, args.years, args.end, args.anomaly_rate):
+        write_fixture(synthetic, args.out)
+    print(f"{args.tickers} tickers written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
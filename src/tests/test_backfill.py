@@ -0,0 +1,204 @@
+import os
+import sys
+from datetime import date
+from urllib.parse import parse_qs, urlparse
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src import polygon_api
+from src.data_processor import DataProcessor
+from src.polygon_api import PolygonAPI, TickerNotFoundError, normalize_filing
+from src.snapshot import (
+    backfill_financials,
+    backfill_snapshot,
+    load_ticker,
+    merge_filings,
+    read_manifest,
+    update_manifest,
+    write_ticker,
+)
+from src.synthetic_data import generate_ticker, make_data_processor
+
+
+END = date(2023, 11, 10)
+
+
+class _Response:
+
+    def __init__(self, body):
+        self.status_code = 200
+        self.headers = {}
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class FakeFinancials:
+    """
+    The financials endpoint of Polygon, serving the filings in pages linked by next_url.
+    """
+
+    def __init__(self, filings, page_size=40):
+        self.filings = filings
+        self.page_size = page_size
+        self.urls = []
+
+    def get(self, url, headers, timeout):
+        self.urls.append(url)
+        query = parse_qs(urlparse(url).query)
+        offset = int(query.get('cursor', ['0'])[0])
+        filings = self.filings
+        if 'filing_date.gte' in query:
+            filings = [filing for filing in filings if filing['filing_date'] >= query['filing_date.gte'][0]]
+
+        page = filings[offset:offset + self.page_size]
+        body = {'status': 'OK', 'results': page}
+        if offset + self.page_size < len(filings):
+            body['next_url'] = f"https://api.polygon.io/vX/reference/financials?cursor={offset + self.page_size}"
+        return _Response(body)
+
+
+@pytest.fixture(scope='module')
+def synthetic():
+    return generate_ticker('SYAAA', seed=2, years=30, end=END)
+
+
+@pytest.fixture
+def fake_api(monkeypatch, synthetic):
+    fake = FakeFinancials(synthetic.financials)
+    monkeypatch.setattr(polygon_api.requests, 'get', fake.get)
+    monkeypatch.setattr(polygon_api.RATE_LIMITER, 'acquire', lambda timeout=None: True)
+    return fake
+
+
+def recent_data(synthetic) -> DataProcessor:
+    """
+    The data of a regular load, with the filings since 2010 only.
+    """
+
+    data = make_data_processor(synthetic)
+    data.financials = [filing for filing in synthetic.financials if filing['filing_date'] >= '2010-10-01']
+    return data
+
+
+def test_every_page_is_streamed(fake_api, synthetic):
+    filings = PolygonAPI('SYAAA').iter_financials()
+
+    first = next(filings)
+    # The following pages are requested only when they are reached
+    assert len(fake_api.urls) == 1
+    assert 'limit=100' in fake_api.urls[0]
+
+    rest = list(filings)
+    assert [first] + rest == [normalize_filing(filing) for filing in synthetic.financials]
+    assert len(fake_api.urls) == -(-len(synthetic.financials) // fake_api.page_size)
+    assert 'cursor=40' in fake_api.urls[1]
+
+
+def test_normalized_filings(synthetic):
+    filing = normalize_filing(synthetic.financials[0])
+    item = next(iter(filing['financials']['income_statement'].values()))
+
+    assert set(item) == {'value', 'unit'}
+    assert filing['fiscal_period'] == synthetic.financials[0]['fiscal_period']
+
+
+def test_full_history(fake_api, synthetic):
+    api = PolygonAPI('SYAAA')
+    api.get_financials(full_history=True)
+
+    assert len(api.financials) == len(synthetic.financials)
+
+
+def test_no_filings(fake_api):
+    fake_api.filings = []
+
+    with pytest.raises(TickerNotFoundError):
+        list(PolygonAPI('SYAAA').iter_financials())
+    # Nothing new since the given date isn't an error
+    assert list(PolygonAPI('SYAAA').iter_financials(filed_from='2030-01-01')) == []
+
+
+def test_merge_filings(synthetic):
+    old = synthetic.financials[10:]
+    restated = dict(synthetic.financials[10], filing_date='2023-11-01')
+
+    merged = merge_filings(synthetic.financials[:11] + [restated], old)
+
+    assert len(merged) == len(synthetic.financials)
+    assert merged[10] is restated
+    end_dates = [filing['end_date'] for filing in merged]
+    assert end_dates == sorted(end_dates, reverse=True)
+
+
+def test_backfill_makes_the_full_history_available(tmp_path, fake_api, synthetic):
+    store = str(tmp_path)
+    recent = recent_data(synthetic)
+    write_ticker(store, recent)
+
+    count = backfill_financials(store, 'SYAAA')
+
+    assert count == len(synthetic.financials)
+    data = load_ticker(store, 'SYAAA')
+    history = data.calculate_quarterly_data('income_statement', 'revenues', year_from=1995)
+    assert history['year'].min() < 2000
+    # The recent years are the same as before the backfill
+    assert data.calculate_quarterly_data('income_statement', 'revenues').equals(
+        recent.calculate_quarterly_data('income_statement', 'revenues')
+    )
+
+    # A later regular load (e.g. of src.ingest) keeps the history
+    write_ticker(store, recent_data(synthetic))
+    assert len(load_ticker(store, 'SYAAA').financials) == len(synthetic.financials)
+
+
+def test_old_filings_dont_fail_the_recent_years(synthetic):
+    data = make_data_processor(synthetic)
+    # An old filing without the metric
+    data.financials = [*synthetic.financials[:-1], dict(synthetic.financials[-1], financials={'income_statement': {}})]
+
+    assert not data.calculate_quarterly_data('income_statement', 'revenues').empty
+
+
+def test_backfill_snapshot(tmp_path, synthetic):
+    backfilled = []
+
+    def backfill(directory, ticker):
+        backfilled.append(ticker)
+        if ticker == 'BAD':
+            raise TickerNotFoundError()
+        return 0
+
+    manifest = backfill_snapshot(
+        str(tmp_path), ['SYAAA', 'BAD'],
+        loader=lambda ticker: recent_data(synthetic),
+        backfill=backfill
+    )
+
+    assert backfilled == ['SYAAA', 'BAD']
+    assert manifest['tickers'] == ['SYAAA']
+    assert manifest['backfill']['tickers'] == ['SYAAA']
+    assert manifest['backfill']['failed'] == {'BAD': 'TickerNotFoundError'}
+    assert manifest['source'] == 'backfill'
+
+
+def test_backfill_keeps_the_ingest_manifest(tmp_path, synthetic):
+    store = str(tmp_path)
+    ingested = update_manifest(store, ['MSFT'], {'GOOGL': 'ServerError'}, source='ingest')
+
+    backfill_snapshot(store, ['SYAAA'], loader=lambda ticker: recent_data(synthetic), backfill=lambda directory, ticker: 0)
+
+    manifest = read_manifest(store)
+    assert manifest['source'] == 'ingest'
+    assert manifest['created_at'] == ingested['created_at']
+    assert manifest['failed'] == {'GOOGL': 'ServerError'}
+    assert manifest['tickers'] == ['MSFT', 'SYAAA']
+    assert manifest['backfill']['tickers'] == ['SYAAA']
+
+    # The next ingestion pass keeps the record of the backfill
+    update_manifest(store, ['MSFT'], {}, source='ingest')
+    assert read_manifest(store)['backfill']['tickers'] == ['SYAAA']
@@ -0,0 +1,87 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.batch_report import HEADER_METRICS, SERIES, run_batch, ticker_report, write_report
+from src.tests.test_data_processor import init_data_local
+
+
+@pytest.fixture(scope='module')
+def datas():
+    return {ticker: init_data_local(ticker) for ticker in ['MSFT', 'GOOGL', 'JNJ']}
+
+
+@pytest.fixture
+def loader(datas):
+    calls = []
+
+    def load(ticker):
+        calls.append(ticker)
+        if ticker not in datas:
+            raise KeyError(ticker)
+        return datas[ticker]
+
+    load.calls = calls
+    return load
+
+
+def test_ticker_report(datas):
+    report = ticker_report(datas['MSFT'])
+
+    assert set(HEADER_METRICS) <= set(report['header'])
+    assert report['header']['name'] == datas['MSFT'].get_name()
+    assert report['header']['pe'] == pytest.approx(datas['MSFT'].get_pe())
+    assert {row['series'] for row in report['series']} == set(SERIES)
+
+
+def test_ticker_report_incorrect_data(datas):
+    # The financial data of JNJ is incorrect, only the series are missing
+    report = ticker_report(datas['JNJ'])
+
+    assert report['header']['name'] == datas['JNJ'].get_name()
+    assert 'revenue_quarterly: IncorrectDataError' in report['header']['errors']
+    assert report['series'] == []
+
+
+def test_run_batch_resumes_from_checkpoints(tmp_path, loader):
+    progress = []
+
+    summary = run_batch(['MSFT', 'XXXX'], str(tmp_path), loader, workers=2, progress=lambda *args: progress.append(args))
+    assert summary['processed'] == ['MSFT']
+    assert list(summary['failed']) == ['XXXX']
+    assert len(progress) == 2
+
+    # Only the new and the failed tickers are loaded again
+    summary = run_batch(['MSFT', 'XXXX', 'googl'], str(tmp_path), loader, progress=None)
+    assert summary['resumed'] == ['MSFT']
+    assert sorted(loader.calls) == ['GOOGL', 'MSFT', 'XXXX', 'XXXX']
+
+    summary = run_batch(['MSFT'], str(tmp_path), loader, restart=True, progress=None)
+    assert summary['processed'] == ['MSFT']
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_write_report(tmp_path, loader, fmt):
+    run_batch(['MSFT', 'GOOGL', 'XXXX'], str(tmp_path), loader, progress=None)
+
+    header_file, series_file = write_report(str(tmp_path), ['MSFT', 'GOOGL', 'XXXX'], fmt)
+
+    read = pd.read_csv if fmt == 'csv' else pd.read_parquet
+    header = read(header_file)
+    series = read(series_file)
+    assert list(header['ticker']) == ['MSFT', 'GOOGL']
+    assert set(series['ticker']) == {'MSFT', 'GOOGL'}
+
+    msft = series.loc[(series['ticker'] == 'MSFT') & (series['series'] == 'revenue_ttm')]
+    expected = init_data_local('MSFT').get_ttm_data('income_statement','revenues')
+    assert list(msft['value']) == pytest.approx(list(expected['value']))
+
+
+def test_write_report_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        write_report(str(tmp_path), ['MSFT'], 'xlsx')
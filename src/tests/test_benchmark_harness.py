@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from benchmarks.harness import compare, time_call
+
+
+def test_time_call():
+    calls = []
+    result = time_call(lambda: calls.append(1), rounds=3, min_time=0.001)
+
+    # The calibration call isn't counted
+    assert len(calls) == result['calls'] + 1
+    assert 0 < result['min_us'] <= result['median_us']
+
+
+def test_time_call_setup_isnt_timed():
+    state = {'ready': False}
+
+    def setup():
+        state['ready'] = True
+
+    def func():
+        assert state['ready']
+        state['ready'] = False
+
+    time_call(func, rounds=2, min_time=0.001, setup=setup)
+
+
+def test_compare():
+    baseline = {'fast': {'min_us': 100.0}, 'slow': {'min_us': 100.0}, 'removed': {'min_us': 1.0}}
+    current = {'fast': {'min_us': 110.0}, 'slow': {'min_us': 200.0}, 'new': {'min_us': 5.0}, 'err': {'error': 'X'}}
+
+    regressions = compare(current, baseline, threshold=0.25)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith('slow')
+
+
+def test_load_test_stand_ins(tmp_path):
+    from benchmarks.load_test import build_stand_ins
+    from src.snapshot import has_ticker
+
+    ticker_file, selectable, new_tickers = build_stand_ins(str(tmp_path), sessions=2)
+
+    # Every ticker is served from the snapshot, the new ones aren't on the list yet
+    assert len(new_tickers) == 2
+    assert not set(new_tickers) & set(selectable)
+    assert all(has_ticker(str(tmp_path / 'snapshot'), ticker) for ticker in selectable + new_tickers)
+    with open(ticker_file, 'r') as file:
+        assert json.load(file) == selectable
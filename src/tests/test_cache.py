@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+import pandas as pd
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.cache import BundleCache, estimate_size
+
+
+class FakeClock:
+    """
+    A controllable time source for the TTL tests.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_estimate_size_dataframe():
+    df = pd.DataFrame({'Close': range(1000)})
+    assert estimate_size(df) == df.memory_usage(deep=True, index=True).sum()
+
+
+def test_estimate_size_nested_object():
+
+    class Bundle:
+        def __init__(self):
+            self.frame = pd.DataFrame({'Close': range(1000)})
+            self.details = {'name': 'Test Corp'}
+
+    assert estimate_size(Bundle()) > estimate_size(pd.DataFrame({'Close': range(1000)}))
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        BundleCache(policy='fifo')
+
+
+def test_hit_and_miss():
+    cache = BundleCache()
+    assert cache.get('MSFT') is None
+    cache.put('MSFT', [1, 2, 3])
+    assert cache.get('MSFT') == [1, 2, 3]
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_lru_eviction_by_entries():
+    cache = BundleCache(max_entries=2)
+    cache.put('A', 1)
+    cache.put('B', 2)
+    cache.get('A')
+    cache.put('C', 3)
+
+    assert 'A' in cache
+    assert 'B' not in cache
+    assert 'C' in cache
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lfu_eviction_by_entries():
+    cache = BundleCache(max_entries=2, policy='lfu')
+    cache.put('A', 1)
+    cache.put('B', 2)
+    cache.get('B')
+    cache.get('B')
+    cache.get('A')
+    cache.put('C', 3)
+
+    assert 'A' not in cache
+    assert 'B' in cache
+
+
+def test_eviction_by_memory_ceiling():
+    frame = pd.DataFrame({'Close': range(10000)})
+    size = estimate_size(frame)
+    cache = BundleCache(max_bytes=int(size * 2.5))
+
+    cache.put('A', frame)
+    cache.put('B', frame.copy())
+    cache.put('C', frame.copy())
+
+    assert 'A' not in cache
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_too_large_entry_is_rejected():
+    cache = BundleCache(max_bytes=100)
+    assert cache.put('A', pd.DataFrame({'Close': range(10000)})) == False
+    assert cache.stats()['rejected'] == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = BundleCache(ttl=10, clock=clock)
+    cache.put('A', 1)
+    cache.put('B', 2, ttl=100)
+
+    clock.now = 11
+    assert cache.get('A') is None
+    assert cache.get('B') == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_get_or_load_loads_once():
+    cache = BundleCache()
+    calls = []
+
+    def loader(key):
+        calls.append(key)
+        return key.lower()
+
+    threads = [threading.Thread(target=cache.get_or_load, args=('MSFT', loader)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.get_or_load('MSFT', loader) == 'msft'
+    assert calls == ['MSFT']
@@ -0,0 +1,206 @@
+import os
+import sys
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src import daily_price_api, polygon_api
+from src.circuit_breaker import (
+    BREAKERS,
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    breaker_stats,
+    unavailable_sources,
+)
+from src.polygon_api import PolygonAPI, ServerError, TickerNotFoundError
+from src.snapshot import load_from_apis
+from src.tracing import REGISTRY
+
+
+class FakeClock:
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    breaker = CircuitBreaker('test', failures=(ServerError,), failure_threshold=3, recovery_timeout=10, clock=clock)
+    yield breaker
+    BREAKERS.pop('test', None)
+
+
+def fail():
+    raise ServerError()
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ServerError):
+            breaker.call(fail)
+
+
+def test_the_breaker_opens_after_consecutive_failures(breaker):
+    with pytest.raises(ServerError):
+        breaker.call(fail)
+    # A success resets the count
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.stats()['consecutive_failures'] == 0
+
+    trip(breaker)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()['trips'] == 1
+
+
+def test_an_open_breaker_fails_fast(breaker, clock):
+    trip(breaker)
+    calls = []
+
+    clock.now = 4
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(calls.append, 1)
+
+    assert calls == []
+    assert error.value.source == 'test'
+    assert error.value.retry_in == 6
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_half_open_trial_call(breaker, clock):
+    trip(breaker)
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+
+    # A failed trial opens the breaker again, for another recovery timeout
+    with pytest.raises(ServerError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    assert breaker.stats()['trips'] == 2
+
+    clock.now = 20
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_a_single_trial_call_at_a_time(breaker, clock):
+    trip(breaker)
+    clock.now = 10
+
+    def trial():
+        # The other calls are rejected while the trial is running
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: 'other')
+        return 'trial'
+
+    assert breaker.call(trial) == 'trial'
+    assert breaker.state == CLOSED
+
+
+def test_other_errors_are_not_counted(breaker, clock):
+    for _ in range(5):
+        with pytest.raises(TickerNotFoundError):
+            breaker.call(lambda: (_ for _ in ()).throw(TickerNotFoundError()))
+    assert breaker.state == CLOSED
+    assert breaker.stats()['failures'] == 0
+
+    # They don't close a half-open breaker either, the next call makes the trial
+    trip(breaker)
+    clock.now = 10
+    with pytest.raises(TickerNotFoundError):
+        breaker.call(lambda: (_ for _ in ()).throw(TickerNotFoundError()))
+    assert breaker.state == HALF_OPEN
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_breaker_stats_and_metrics(breaker):
+    trip(breaker)
+
+    assert breaker_stats()['test']['state'] == OPEN
+    assert breaker_stats()['test']['last_error'] == 'ServerError: The Polygon API returned a server error'
+    assert 'test' in unavailable_sources()
+
+    metrics = REGISTRY.to_prometheus()
+    assert 'stock_dashboard_circuit_breaker_state{source="test"} 2' in metrics
+    assert 'stock_dashboard_circuit_breaker_trips_total{source="test"} 1' in metrics
+
+    breaker.reset()
+    assert 'test' not in unavailable_sources()
+
+
+def test_polygon_fails_fast_when_it_is_down(monkeypatch, clock):
+    requested = []
+
+    class Response:
+        status_code = 503
+        headers: dict = {}
+
+    def get(url, headers, timeout):
+        requested.append(url)
+        return Response()
+
+    monkeypatch.setattr(polygon_api.requests, 'get', get)
+    monkeypatch.setattr(polygon_api.RATE_LIMITER, 'acquire', lambda timeout=None: True)
+    monkeypatch.setattr(polygon_api.RETRY_POLICY, '_sleep', lambda seconds: None)
+    monkeypatch.setattr(polygon_api, 'BREAKER', CircuitBreaker(
+        'polygon', failures=polygon_api.BREAKER.failures, failure_threshold=2, clock=clock
+    ))
+
+    api = PolygonAPI('MSFT')
+    # The breaker opens during the retries, and the rest of them are rejected right away
+    with pytest.raises(CircuitOpenError):
+        api.get_news()
+    with pytest.raises(CircuitOpenError):
+        api.get_financials()
+
+    assert len(requested) == 2
+
+
+def test_the_page_is_loaded_without_the_source_which_is_down(monkeypatch):
+    def unavailable(self):
+        raise CircuitOpenError("polygon is unavailable", source='polygon')
+
+    def history(self):
+        self.price_hist = 'prices'
+
+    monkeypatch.setattr(polygon_api.PolygonAPI, 'get_ticker_details', unavailable)
+    monkeypatch.setattr(daily_price_api.PriceAPI, 'get_history', history)
+    monkeypatch.setattr(daily_price_api.PriceAPI, 'get_earnings_dates', lambda self: None)
+
+    data = load_from_apis('MSFT', allow_partial=True)
+    assert data.unavailable == {'polygon': 'polygon is unavailable'}
+    assert data.details is None
+    assert data.price_hist == 'prices'
+
+    # Without allow_partial (e.g. the ingestion worker) the error is raised
+    with pytest.raises(CircuitOpenError):
+        load_from_apis('MSFT')
+
+    # Both sources are down
+    monkeypatch.setattr(daily_price_api.PriceAPI, 'get_history', unavailable)
+    with pytest.raises(CircuitOpenError):
+        load_from_apis('MSFT', allow_partial=True)
+
+
+def test_other_errors_fail_the_partial_load(monkeypatch):
+    def not_found(self):
+        raise TickerNotFoundError()
+
+    monkeypatch.setattr(polygon_api.PolygonAPI, 'get_ticker_details', not_found)
+
+    with pytest.raises(TickerNotFoundError):
+        load_from_apis('XXXX', allow_partial=True)
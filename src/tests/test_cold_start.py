@@ -0,0 +1,27 @@
+import json
+import os
+import subprocess
+import sys
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+BUDGET_FILE = os.path.join(src_dir, 'benchmarks', 'budget.json')
+
+
+def test_main_doesnt_import_heavy_modules():
+    # The sidebar has to be drawn before pandas, yfinance, requests and the charts are loaded
+    with open(BUDGET_FILE, 'r') as file:
+        forbidden = json.load(file)['cold_start_forbidden_modules']
+
+    code = f"import sys, main; print([m for m in {forbidden!r} if m in sys.modules])"
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=src_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    assert result.stdout.strip().splitlines()[-1] == '[]'
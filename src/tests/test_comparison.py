@@ -0,0 +1,117 @@
+import os
+import sys
+import uuid
+import numpy as np
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.comparison import ComparisonMatrix, extract_columns
+from src.price_stream import Tick, ticks_to_bars
+from src.tests.test_data_processor import init_data_local
+
+
+@pytest.fixture(scope='module')
+def datas():
+    return {ticker: init_data_local(ticker) for ticker in ['MSFT', 'GOOGL', 'JNJ']}
+
+
+def test_extract_columns(datas):
+    columns = extract_columns(datas['MSFT'])
+
+    assert columns['price'].index.is_monotonic_increasing
+    # MSFT has a shifted fiscal year, the quarters are converted to calendar quarter ends
+    assert columns['revenue'].index.is_quarter_end.all()
+    margin = columns['net_income'] / columns['revenue'] * 100
+    assert np.allclose(columns['profit_margin'], margin.dropna())
+
+
+def test_extract_columns_incorrect_data(datas):
+    # The financial data of JNJ is incorrect, only its price is comparable
+    columns = extract_columns(datas['JNJ'])
+
+    assert not columns['price'].empty
+    assert columns['revenue'].empty
+    assert columns['profit_margin'].empty
+
+
+def test_aligned_price_is_normalized(datas):
+    df = ComparisonMatrix().aligned('price', [datas['MSFT'], datas['GOOGL']])
+
+    assert list(df.columns) == ['MSFT', 'GOOGL']
+    assert (df.iloc[0] == 0).all()
+    assert df.notnull().all().all()
+
+    msft = datas['MSFT'].price_hist['Close']
+    expected = (msft.iloc[-1] / msft.loc[df.index[0]] - 1) * 100
+    assert df['MSFT'].iloc[-1] == pytest.approx(expected)
+
+
+def test_aligned_quarters_are_shared(datas):
+    matrix = ComparisonMatrix()
+    df = matrix.aligned('revenue', [datas['MSFT'], datas['GOOGL'], datas['JNJ']])
+
+    msft = extract_columns(datas['MSFT'])['revenue']
+    googl = extract_columns(datas['GOOGL'])['revenue']
+
+    assert list(df.columns) == ['MSFT', 'GOOGL']
+    assert list(df.index) == sorted(set(msft.index) & set(googl.index))
+
+
+def test_unknown_metric(datas):
+    with pytest.raises(KeyError):
+        ComparisonMatrix().aligned('dividends', [datas['MSFT']])
+
+
+def test_adding_ticker_extracts_only_the_new_one(datas):
+    matrix = ComparisonMatrix()
+    matrix.aligned('revenue', [datas['MSFT'], datas['GOOGL']])
+    assert matrix.stats()['extractions'] == 2
+
+    matrix.aligned('revenue', [datas['MSFT'], datas['GOOGL'], datas['JNJ']])
+    matrix.aligned('price', [datas['MSFT'], datas['GOOGL'], datas['JNJ']])
+    assert matrix.stats()['extractions'] == 3
+
+    # Same tickers and versions, the frame itself is served from the cache
+    matrix.aligned('price', [datas['MSFT'], datas['GOOGL'], datas['JNJ']])
+    assert matrix.stats()['frame_hits'] == 1
+
+
+def test_new_data_version_is_extracted_again(datas):
+    matrix = ComparisonMatrix()
+    data = init_data_local('MSFT')
+    matrix.aligned('price', [data, datas['GOOGL']])
+
+    data.data_version = uuid.uuid4().hex
+    matrix.aligned('price', [data, datas['GOOGL']])
+
+    assert matrix.stats()['extractions'] == 3
+
+
+def test_live_prices_update_the_price_frame(datas):
+    matrix = ComparisonMatrix()
+    data = init_data_local('MSFT')
+    matrix.aligned('price', [data, datas['GOOGL']])
+    matrix.aligned('revenue', [data, datas['GOOGL']])
+
+    # A trade of 2023-11-10 15:00 in New York updates the last bar without a new data version
+    data.update_last_bar(ticks_to_bars(data.price_hist, [Tick('MSFT', 380.0, 100, 1699646400.0)]))
+    price = matrix.aligned('price', [data, datas['GOOGL']])
+    matrix.aligned('revenue', [data, datas['GOOGL']])
+
+    close = data.price_hist['Close']
+    assert price['MSFT'].iloc[-1] == pytest.approx((380.0 / close.loc[price.index[0]] - 1) * 100)
+    stats = matrix.stats()
+    assert stats['frame_hits'] == 1
+    # Only the price of MSFT is extracted again
+    assert stats['extractions'] == 3
+
+
+def test_aligned_returns_copy(datas):
+    matrix = ComparisonMatrix()
+    df = matrix.aligned('price', [datas['MSFT'], datas['GOOGL']])
+    df['MSFT'] = 0
+
+    assert matrix.aligned('price', [datas['MSFT'], datas['GOOGL']])['MSFT'].iloc[-1] != 0
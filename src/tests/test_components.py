@@ -60,7 +60,99 @@ def test_candlestick_chart():
         'Low': [80, 140, 170, 210],
         'Close': [110, 160, 200, 215]
     }, index=pd.date_range(start='2022-01-01', periods=4))
-    start_date = datetime(2022, 1, 1)
-    end_date = datetime(2022, 1, 4)
-    fig = components._candlestick_chart(hist_data, start_date, end_date)
+    fig = components._candlestick_chart(hist_data)
     assert isinstance(fig, go.Figure)
+
+    fig = components._show_period(fig, hist_data, datetime(2022, 1, 2), datetime(2022, 1, 3))
+    assert fig.layout.xaxis.range == ('2022-01-02T00:00:00', '2022-01-03T00:00:00')
+    # The price axis is fitted to the lows and highs of the period
+    assert fig.layout.yaxis.range == pytest.approx((140 - 2.5, 190 + 2.5))
+
+
+def test_candlestick_chart_with_overlays():
+    hist_data = pd.DataFrame({
+        'Open': [100, 150, 180, 220],
+        'High': [120, 170, 190, 230],
+        'Low': [80, 140, 170, 210],
+        'Close': [110, 160, 200, 215]
+    }, index=pd.date_range(start='2022-01-01', periods=4))
+    overlays = {
+        'SMA 20': pd.DataFrame({'SMA 20': [100, 110, 120, 130]}, index=hist_data.index),
+        'RSI 14': pd.DataFrame({'RSI 14': [40, 50, 60, 70]}, index=hist_data.index),
+    }
+    fig = components._candlestick_chart(hist_data, overlays)
+    assert isinstance(fig, go.Figure)
+    assert len(fig.data) == 3
+    assert fig.data[2].yaxis == 'y2'
+
+
+def test_valuation_lineplot():
+    valuation_data = pd.DataFrame({
+        'date': pd.date_range(start='2022-01-01', periods=4),
+        'pe': [20.1, 20.5, 21.0, 20.8],
+    })
+    fig = components._valuation_lineplot(valuation_data, 'pe')
+    assert isinstance(fig, go.Figure)
+
+
+def test_comparison_lineplot():
+    df = pd.DataFrame(
+        {'MSFT': [0.0, 1.5, 2.0], 'GOOGL': [0.0, -0.5, 3.0]},
+        index=pd.to_datetime(['2023-11-08', '2023-11-09', '2023-11-10'])
+    )
+    result = components._comparison_lineplot(df)
+    assert isinstance(result, go.Figure)
+    assert [trace.name for trace in result.data] == ['MSFT', 'GOOGL']
+
+
+def test_center_panel_marks_the_sections_pending():
+    from streamlit.testing.v1 import AppTest
+
+    def app():
+        import os, sys
+        sys.path.append(os.getcwd())
+        from src.components import add_center_panel
+        from src.tests.test_data_processor import init_data_local
+
+        data = init_data_local('MSFT')
+        # Only the prices have been loaded before the deadline
+        data.details = data.financials = data.news = data.earning_dates = None
+        add_center_panel(data, complete=False)
+
+    at = AppTest.from_function(app, default_timeout=30).run()
+
+    assert not at.exception
+    assert [info.value for info in at.info] == [
+        "Company overview: still loading...",
+        "Net income and revenue: still loading...",
+        "Margins and cash flow: still loading...",
+        "Valuation history: still loading...",
+        "News: still loading...",
+    ]
+    # The price chart is ready
+    assert at.toggle[0].label == 'Show candlestick chart'
+
+
+def test_center_panel_marks_the_unavailable_sections():
+    from streamlit.testing.v1 import AppTest
+
+    def app():
+        import os, sys
+        sys.path.append(os.getcwd())
+        from src.components import add_center_panel
+        from src.tests.test_data_processor import init_data_local
+
+        data = init_data_local('MSFT')
+        # The Polygon API was down when the ticker was loaded
+        data.details = data.financials = data.news = None
+        data.unavailable = {'polygon': 'polygon is unavailable'}
+        add_center_panel(data)
+
+    at = AppTest.from_function(app, default_timeout=30).run()
+
+    assert not at.exception
+    assert len(at.warning) == 5
+    assert at.warning[0].value == "Company overview: the data source is unavailable, it will show up when it's back."
+    assert not at.info
+    # The price chart is rendered from yfinance
+    assert at.toggle[0].label == 'Show candlestick chart'
@@ -0,0 +1,100 @@
+import json
+import os
+import re
+import sys
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src import compression
+from src.compression import (
+    CODECS,
+    CompressionError,
+    compress,
+    decompress,
+    financials_dictionary,
+    get_codec,
+    train_dictionary,
+)
+
+TEST_RESOURCES_PATH = "src/tests/test_resources"
+
+AVAILABLE_CODECS = [name for name, codec in CODECS.items() if codec.available()]
+
+
+def read_financials(ticker):
+    with open(os.path.join(TEST_RESOURCES_PATH, ticker, 'financials.json'), 'r') as f:
+        return json.load(f)
+
+
+def filings(ticker):
+    return [json.dumps(filing, separators=(',', ':')).encode() for filing in read_financials(ticker)]
+
+
+@pytest.mark.parametrize('codec', AVAILABLE_CODECS)
+def test_round_trip(codec):
+    data = json.dumps(read_financials('MSFT')).encode()
+
+    assert decompress(compress(data, codec=codec)) == data
+    assert decompress(compress(data, codec=codec, dictionary=financials_dictionary())) == data
+    assert len(compress(data, codec=codec)) < len(data) / 5
+
+
+def test_codec_choice(monkeypatch):
+    monkeypatch.setenv('COMPRESSION_CODEC', 'zlib')
+    assert get_codec().name == 'zlib'
+
+    monkeypatch.setenv('COMPRESSION_CODEC', 'auto')
+    assert get_codec().name == ('zstd' if CODECS['zstd'].available() else 'zlib')
+
+    with pytest.raises(ValueError):
+        get_codec('brotli')
+
+    monkeypatch.setattr(CODECS['zstd'], 'module', 'not_installed_module')
+    with pytest.raises(ValueError):
+        get_codec('zstd')
+    assert get_codec('auto').name == 'zlib'
+
+
+def test_invalid_frames(monkeypatch):
+    with pytest.raises(CompressionError):
+        decompress(b'garbage')
+
+    frame = compress(b'{"a":1}' * 10, codec='zlib', dictionary=b'"a":1,"b":2')
+    # The dictionary isn't known by a new process
+    monkeypatch.setattr(compression, '_DICTIONARIES', {})
+    with pytest.raises(CompressionError):
+        decompress(frame)
+
+    with pytest.raises(CompressionError):
+        decompress(frame[:10])
+
+
+def test_the_shipped_dictionary_is_registered_when_needed(monkeypatch):
+    frame = compress(filings('MSFT')[0], codec='zlib', dictionary=financials_dictionary())
+
+    monkeypatch.setattr(compression, '_DICTIONARIES', {})
+    monkeypatch.setattr(compression, '_financials_dictionary', None)
+
+    assert decompress(frame) == filings('MSFT')[0]
+
+
+def test_trained_dictionary_improves_the_ratio():
+    # Trained on two tickers, tested on the third one
+    dictionary = train_dictionary(
+        [json.dumps(read_financials(ticker), separators=(',', ':')).encode() for ticker in ('GOOGL', 'JNJ')],
+        size=16 * 1024
+    )
+    assert len(dictionary) <= 16 * 1024
+    assert b'"unit":"USD"' in dictionary
+    # The values of the samples aren't kept, only the structure
+    assert not re.search(rb'\d', dictionary)
+
+    samples = filings('MSFT')
+    plain = sum(len(compress(sample, codec='zlib')) for sample in samples)
+    trained = sum(len(compress(sample, codec='zlib', dictionary=dictionary)) for sample in samples)
+
+    assert trained < plain * 0.8
+
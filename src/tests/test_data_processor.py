@@ -560,3 +560,50 @@ def test_get_news_html_local(data_local_msft):
 
 
 
+
+
+def test_get_indicators_local(data_local_msft):
+    indicators = data_local_msft.get_indicators(['SMA 20', 'MACD'])
+    assert list(indicators.keys()) == ['SMA 20', 'MACD']
+    assert (indicators['SMA 20'].index == data_local_msft.price_hist.index).all()
+    assert round(indicators['SMA 20']['SMA 20'].iloc[-1], 4) == round(data_local_msft.price_hist['Close'].iloc[-20:].mean(), 4)
+    # The second call is served from the cached engine
+    assert data_local_msft.get_indicators(['SMA 20'])['SMA 20'].equals(indicators['SMA 20'])
+
+
+def test_get_valuation_history_local(data_local_google):
+    result = data_local_google.get_valuation_history()
+    assert list(result.columns) == ['date', 'end_date', 'pe', 'ps', 'pb', 'earnings_yield']
+    # The last day matches the current P/E
+    assert round(result['pe'].iloc[-1], 2) == 24.61
+    assert round(result['earnings_yield'].iloc[-1] * result['pe'].iloc[-1], 6) == 1
+    # Every day uses the latest quarter which has already been filed
+    assert (result['end_date'] <= result['date']).all()
+    # The 2023-09-30 quarter was filed on 2023-10-25
+    assert (result.loc[result['date'] == '2023-10-24', 'end_date'] == '2023-06-30').all()
+    assert (result.loc[result['date'] == '2023-10-25', 'end_date'] == '2023-09-30').all()
+
+
+def test_valuation_history_without_filing_dates(data_local_google, monkeypatch):
+    financials = [
+        {key: value for key, value in filing.items() if key != 'filing_date'}
+        for filing in data_local_google.financials
+    ]
+    monkeypatch.setattr(data_local_google, 'financials', financials)
+    monkeypatch.setattr(data_local_google, '_derived_cache', {})
+
+    result = data_local_google.get_valuation_history()
+
+    # The quarter is used only a conservative lag after its end
+    assert (result['date'] - result['end_date'] >= pd.Timedelta(days=90)).all()
+
+
+def test_get_valuation_history_cached(data_local_google):
+    result = data_local_google.get_valuation_history()
+    result['pe'] = 0
+    assert (data_local_google.get_valuation_history()['pe'] != 0).all()
+
+
+def test_get_valuation_history_incorrect_data(data_local_jnj):
+    with pytest.raises(IncorrectDataError):
+        data_local_jnj.get_valuation_history()
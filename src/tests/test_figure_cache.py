@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.figure_cache import FigureCache, CachedFigure
+
+
+def build_figure():
+    return go.Figure(data=go.Scatter(x=[1, 2, 3], y=[4, 5, 6]))
+
+
+def test_miss_then_hit():
+    cache = FigureCache()
+    key = ('MSFT', 'revenue_quarterly', 'v1', ())
+
+    fig = cache.get_or_build(key, build_figure)
+    assert not isinstance(fig, CachedFigure)
+
+    cached = cache.get_or_build(key, lambda: 1 / 0)
+    assert isinstance(cached, CachedFigure)
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_cached_figure_renders_the_same_spec():
+    cache = FigureCache()
+    key = ('MSFT', 'revenue_quarterly', 'v1', ())
+    fig = cache.get_or_build(key, build_figure)
+    cached = cache.get_or_build(key, build_figure)
+
+    assert cached.to_dict() == fig.to_dict()
+    assert pio.to_json(cached.to_dict(), validate=False) == pio.to_json(fig.to_dict(), validate=False)
+
+
+def test_layout_updates_of_a_cached_figure():
+    cache = FigureCache()
+    key = ('MSFT', 'candlestick', 'v1', ())
+    fig = cache.get_or_build(key, build_figure)
+    cached = cache.get_or_build(key, build_figure)
+
+    fig.update_layout(xaxis=dict(range=[1, 2]))
+    cached.update_layout(xaxis=dict(range=[1, 2]))
+
+    assert cached.to_dict() == fig.to_dict()
+    assert json.loads(cached.to_json()) == cached.to_dict()
+    # The stored spec isn't changed
+    assert 'range' not in cache.get_or_build(key, build_figure).to_dict()['layout'].get('xaxis', {})
+
+
+def test_params_are_part_of_the_key():
+    cache = FigureCache()
+    cache.get_or_build(('MSFT', 'valuation', 'v1', ('P/E',)), build_figure)
+    cache.get_or_build(('MSFT', 'valuation', 'v1', ('P/S',)), build_figure)
+    assert cache.stats()['misses'] == 2
+
+
+def test_new_data_version_invalidates():
+    cache = FigureCache()
+    cache.get_or_build(('MSFT', 'revenue_quarterly', 'v1', ()), build_figure)
+    cache.get_or_build(('MSFT', 'revenue_yearly', 'v1', ()), build_figure)
+    cache.get_or_build(('GOOGL', 'revenue_yearly', 'v1', ()), build_figure)
+
+    fig = cache.get_or_build(('MSFT', 'revenue_quarterly', 'v2', ()), build_figure)
+    assert not isinstance(fig, CachedFigure)
+
+    stats = cache.stats()
+    assert stats['invalidations'] == 2
+    assert stats['entries'] == 2
+
+
+def test_invalidate_ticker():
+    cache = FigureCache()
+    cache.get_or_build(('MSFT', 'revenue_quarterly', 'v1', ()), build_figure)
+    cache.invalidate('MSFT')
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_limit():
+    cache = FigureCache(max_entries=2)
+    for kind in ['a', 'b', 'c']:
+        cache.get_or_build(('MSFT', kind, 'v1', ()), build_figure)
+    assert cache.stats()['entries'] == 2
+    assert not isinstance(cache.get_or_build(('MSFT', 'a', 'v1', ()), build_figure), CachedFigure)
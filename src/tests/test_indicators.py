@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.indicators import INDICATORS, IndicatorEngine, sma, ema, bollinger, rsi
+
+
+def make_price_hist(periods=1260, seed=42):
+    """
+    Create a random walk price history in the format of the PriceAPI's price_hist.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+    open_ = close * (1 + rng.normal(0, 0.003, periods))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, periods)),
+        'Low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, periods)),
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 5_000_000, periods),
+    }, index=pd.bdate_range('2019-01-01', periods=periods))
+
+
+@pytest.fixture(scope='module')
+def price_hist():
+    return make_price_hist()
+
+
+def test_sma_matches_pandas(price_hist):
+    result, _ = sma(price_hist, window=20)
+    expected = price_hist['Close'].rolling(20).mean()
+    np.testing.assert_allclose(result['SMA 20'], expected)
+
+
+def test_ema_matches_pandas(price_hist):
+    result, _ = ema(price_hist, span=20)
+    expected = price_hist['Close'].ewm(span=20, adjust=False).mean()
+    np.testing.assert_allclose(result['EMA 20'], expected)
+
+
+def test_missing_prices_keep_the_previous_state(price_hist):
+    price_hist = price_hist.copy()
+    price_hist.iloc[[100, 500, 501, 1000], price_hist.columns.get_loc('Close')] = np.nan
+    close = price_hist['Close']
+
+    result, _ = ema(price_hist, span=20)
+    expected = close.ewm(span=20, adjust=False, ignore_na=True).mean()
+    np.testing.assert_allclose(result['EMA 20'], expected)
+
+    result, _ = rsi(price_hist, window=14)
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).where(delta.notna()).ewm(alpha=1 / 14, adjust=False, ignore_na=True).mean()
+    avg_loss = (-delta).clip(lower=0).where(delta.notna()).ewm(alpha=1 / 14, adjust=False, ignore_na=True).mean()
+    expected = 100 - 100 / (1 + avg_gain / avg_loss)
+    np.testing.assert_allclose(result['RSI 14'], expected)
+    assert not np.isnan(result['RSI 14'][-1])
+
+    # The incremental computation skips them the same way
+    engine = IndicatorEngine(price_hist.iloc[:-300])
+    engine.get('MACD')
+    engine.append(price_hist.iloc[-300:])
+    np.testing.assert_allclose(engine.get('MACD').values, IndicatorEngine(price_hist).get('MACD').values, rtol=1e-9)
+    assert not np.isnan(engine.get('MACD').values[-1]).any()
+
+
+def test_bollinger_matches_pandas(price_hist):
+    result, _ = bollinger(price_hist, window=20, num_std=2)
+    rolling = price_hist['Close'].rolling(20)
+    np.testing.assert_allclose(result['BB upper'], rolling.mean() + 2 * rolling.std(ddof=0))
+
+
+@pytest.mark.parametrize("name", list(INDICATORS))
+def test_indicator_shape(price_hist, name):
+    result = IndicatorEngine(price_hist).get(name)
+    assert (result.index == price_hist.index).all()
+    assert result.iloc[-1].notnull().all()
+
+
+@pytest.mark.parametrize("name", list(INDICATORS))
+def test_incremental_append(price_hist, name):
+    engine = IndicatorEngine(price_hist.iloc[:1000])
+    engine.get(name)
+    engine.append(price_hist.iloc[1000:1100])
+    engine.append(price_hist.iloc[1100:])
+
+    expected = IndicatorEngine(price_hist).get(name)
+    pd.testing.assert_frame_equal(engine.get(name), expected)
+
+
+@pytest.mark.parametrize("name", list(INDICATORS))
+def test_incremental_replace_last_bar(price_hist, name):
+    engine = IndicatorEngine(price_hist.iloc[:-1])
+    engine.get(name)
+
+    # A still forming bar is updated twice
+    forming = price_hist.iloc[-1:].copy()
+    forming['Close'] = forming['Close'] * 0.9
+    engine.append(forming)
+    engine.append(price_hist.iloc[-1:])
+
+    expected = IndicatorEngine(price_hist).get(name)
+    pd.testing.assert_frame_equal(engine.get(name), expected)
+
+
+def test_append_before_last_bar(price_hist):
+    engine = IndicatorEngine(price_hist)
+    with pytest.raises(ValueError):
+        engine.append(price_hist.iloc[:1])
+
+
+def test_unknown_indicator(price_hist):
+    with pytest.raises(KeyError):
+        IndicatorEngine(price_hist).get('NOTANINDICATOR')
+
+
+def test_all_indicators_for_100_tickers_under_a_second():
+    hists = [make_price_hist(seed=i) for i in range(100)]
+
+    start = time.perf_counter()
+    for hist in hists:
+        engine = IndicatorEngine(hist)
+        for name in INDICATORS:
+            engine.get(name)
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,113 @@
+import os
+import sys
+from datetime import datetime, timezone
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.ingest import MARKET_TIMEZONE, RETRY_DELAY, IngestionWorker, due_reason, last_close
+from src.snapshot import has_ticker, load_ticker, read_manifest
+from src.tests.test_data_processor import init_data_local
+
+
+def ny_time(*args) -> datetime:
+    return datetime(*args, tzinfo=MARKET_TIMEZONE)
+
+
+class Clock:
+
+    def __init__(self, now: datetime) -> None:
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+@pytest.fixture(scope='module')
+def datas():
+    return {ticker: init_data_local(ticker) for ticker in ['MSFT', 'GOOGL']}
+
+
+@pytest.fixture
+def loader(datas):
+    calls = []
+
+    def load(ticker):
+        calls.append(ticker)
+        if ticker not in datas:
+            raise KeyError(ticker)
+        return datas[ticker]
+
+    load.calls = calls
+    return load
+
+
+def test_last_close():
+    # Wednesday after and before the close
+    assert last_close(ny_time(2023, 10, 18, 17, 0)) == ny_time(2023, 10, 18, 16, 30)
+    assert last_close(ny_time(2023, 10, 18, 12, 0)) == ny_time(2023, 10, 17, 16, 30)
+    # Monday morning and Sunday go back to Friday
+    assert last_close(ny_time(2023, 10, 23, 9, 0)) == ny_time(2023, 10, 20, 16, 30)
+    assert last_close(ny_time(2023, 10, 22, 18, 0)) == ny_time(2023, 10, 20, 16, 30)
+    # The timezone of the input doesn't matter
+    assert last_close(datetime(2023, 10, 18, 21, 0, tzinfo=timezone.utc)) == ny_time(2023, 10, 18, 16, 30)
+
+
+def test_due_reason():
+    now = ny_time(2023, 10, 18, 12, 0)
+
+    assert due_reason(None, now) == 'new'
+    assert due_reason({'loaded_at': ny_time(2023, 10, 17, 17, 0).isoformat()}, now) is None
+    assert due_reason({'loaded_at': ny_time(2023, 10, 17, 16, 0).isoformat()}, now) == 'market close'
+
+    # The report was on Thursday, the filing shows up 2 days later (on Saturday, without a close)
+    entry = {'loaded_at': ny_time(2023, 10, 20, 17, 0).isoformat(), 'next_report_date': '2023-10-19'}
+    assert due_reason(entry, ny_time(2023, 10, 21, 16, 0)) is None
+    assert due_reason(entry, ny_time(2023, 10, 21, 16, 45)) == 'filing'
+
+    failed = {'error': 'KeyError', 'failed_at': now.isoformat()}
+    assert due_reason(failed, now + RETRY_DELAY / 2) is None
+    assert due_reason(failed, now + RETRY_DELAY) == 'retry'
+
+
+def test_worker_loads_the_due_tickers(tmp_path, loader):
+    clock = Clock(ny_time(2023, 10, 18, 12, 0))
+    tickers = ['MSFT']
+    worker = IngestionWorker(str(tmp_path), lambda: tickers, loader=loader, clock=clock)
+
+    assert worker.run_once() == {'loaded': {'MSFT': 'new'}, 'failed': {}}
+    assert has_ticker(str(tmp_path), 'MSFT')
+    assert read_manifest(str(tmp_path))['source'] == 'ingest'
+    assert load_ticker(str(tmp_path), 'MSFT').get_name() == 'Microsoft Corp'
+
+    # Nothing to do until the next close, except the newly saved tickers
+    tickers.append('GOOGL')
+    assert worker.run_once()['loaded'] == {'GOOGL': 'new'}
+    assert worker.run_once()['loaded'] == {}
+
+    clock.now = ny_time(2023, 10, 18, 17, 0)
+    assert worker.run_once()['loaded'] == {'MSFT': 'market close', 'GOOGL': 'market close'}
+    assert loader.calls == ['MSFT', 'GOOGL', 'MSFT', 'GOOGL']
+
+
+def test_worker_retries_the_failed_tickers(tmp_path, loader):
+    clock = Clock(ny_time(2023, 10, 18, 12, 0))
+    worker = IngestionWorker(str(tmp_path), lambda: ['XXXX'], loader=loader, clock=clock)
+
+    assert list(worker.run_once()['failed']) == ['XXXX']
+    assert worker.run_once() == {'loaded': {}, 'failed': {}}
+
+    clock.now += RETRY_DELAY
+    assert list(worker.run_once()['failed']) == ['XXXX']
+    assert loader.calls == ['XXXX', 'XXXX']
+
+
+def test_worker_state_survives_restart(tmp_path, loader):
+    clock = Clock(ny_time(2023, 10, 18, 12, 0))
+    IngestionWorker(str(tmp_path), lambda: ['MSFT'], loader=loader, clock=clock).run_once()
+
+    restarted = IngestionWorker(str(tmp_path), lambda: ['MSFT'], loader=loader, clock=clock)
+    assert restarted.due_tickers() == {}
+    assert restarted.state['MSFT']['next_report_date'] == '2024-01-22'
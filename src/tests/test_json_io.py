@@ -1,11 +1,16 @@
 import os
 import sys
+import json
+import multiprocessing
+import threading
+import pytest
 
 # Add the 'src' folder to the Python path
 src_dir = os.path.join(os.path.dirname(__file__), '../..')
 sys.path.append(src_dir)
 
 from src.json_io import read_ticker_list, add_ticker, delete_ticker, check_ticker_on_list
+import src.json_io as json_io
 TEST_JSON_PATH = 'src/tests/test_tickers.json'
 
 
@@ -60,3 +65,126 @@ def test_delete_json():
     """
 
     os.remove(TEST_JSON_PATH)
+    if os.path.exists(TEST_JSON_PATH + '.lock'):
+        os.remove(TEST_JSON_PATH + '.lock')
+
+
+def test_read_ticker_list_uses_cache(tmp_path, monkeypatch):
+    ticker_file = str(tmp_path / 'tickers.json')
+    read_ticker_list(ticker_file)
+    add_ticker(ticker_file, 'GOOGL')
+
+    # Nothing changed, so the file shouldn't be parsed again
+    def fail(*args, **kwargs):
+        raise AssertionError("The file was read again")
+
+    monkeypatch.setattr(json_io.json, 'load', fail)
+    assert read_ticker_list(ticker_file) == ['GOOGL']
+    assert check_ticker_on_list(ticker_file, 'GOOGL') == True
+
+
+def test_read_ticker_list_detects_external_change(tmp_path):
+    ticker_file = str(tmp_path / 'tickers.json')
+    read_ticker_list(ticker_file)
+
+    # Another process rewrites the file
+    with open(ticker_file + '.tmp', 'w') as file:
+        json.dump(['MSFT', 'JNJ'], file)
+    os.replace(ticker_file + '.tmp', ticker_file)
+
+    assert read_ticker_list(ticker_file) == ['MSFT', 'JNJ']
+    assert check_ticker_on_list(ticker_file, 'JNJ') == True
+
+
+def test_read_ticker_list_returns_copy(tmp_path):
+    ticker_file = str(tmp_path / 'tickers.json')
+    read_ticker_list(ticker_file).append('MSFT')
+    assert read_ticker_list(ticker_file) == []
+
+
+def _add_many(ticker_file, prefix, count):
+    for i in range(count):
+        add_ticker(ticker_file, f'{prefix}{i}')
+
+
+def test_concurrent_adds_from_processes(tmp_path):
+    """
+    Several processes add tickers at the same time, none of the updates can get lost.
+    """
+    ticker_file = str(tmp_path / 'tickers.json')
+    read_ticker_list(ticker_file)
+
+    processes = [
+        multiprocessing.Process(target=_add_many, args=(ticker_file, f'P{p}T', 25))
+        for p in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    with open(ticker_file) as file:
+        tickers = json.load(file)
+    assert len(tickers) == 100
+    assert len(set(tickers)) == 100
+
+
+def test_concurrent_adds_and_deletes_from_threads(tmp_path):
+    ticker_file = str(tmp_path / 'tickers.json')
+    read_ticker_list(ticker_file)
+    _add_many(ticker_file, 'DEL', 20)
+
+    def delete_all():
+        for i in range(20):
+            delete_ticker(ticker_file, f'DEL{i}')
+
+    threads = [threading.Thread(target=_add_many, args=(ticker_file, f'T{t}X', 20)) for t in range(3)]
+    threads.append(threading.Thread(target=delete_all))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    tickers = read_ticker_list(ticker_file)
+    assert len(tickers) == 60
+    assert not any(ticker.startswith('DEL') for ticker in tickers)
+
+
+def test_failed_write_keeps_the_old_file(tmp_path, monkeypatch):
+    ticker_file = str(tmp_path / 'tickers.json')
+    read_ticker_list(ticker_file)
+    add_ticker(ticker_file, 'MSFT')
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json_io.os, 'replace', crash)
+    with pytest.raises(OSError):
+        add_ticker(ticker_file, 'GOOGL')
+
+    with open(ticker_file) as file:
+        assert json.load(file) == ['MSFT']
+    # No temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == ['tickers.json', 'tickers.json.lock']
+
+
+def test_write_keeps_the_permissions(tmp_path):
+    ticker_file = str(tmp_path / 'tickers.json')
+    read_ticker_list(ticker_file)
+    os.chmod(ticker_file, 0o644)
+
+    add_ticker(ticker_file, 'MSFT')
+
+    assert os.stat(ticker_file).st_mode & 0o777 == 0o644
+
+
+def test_new_file_gets_the_permissions_of_the_umask(tmp_path):
+    ticker_file = str(tmp_path / 'tickers.json')
+    umask = os.umask(0o027)
+    try:
+        read_ticker_list(ticker_file)
+    finally:
+        os.umask(umask)
+
+    assert os.stat(ticker_file).st_mode & 0o777 == 0o640
+    assert json_io._umask() == umask
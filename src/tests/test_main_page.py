@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+import pytest
+import streamlit as st
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src import snapshot
+
+MAIN_FILE = os.path.join(src_dir, 'main.py')
+TEST_RESOURCES_PATH = os.path.join(src_dir, 'src', 'tests', 'test_resources')
+
+
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    """
+    The app in the offline mode over the test fixtures, with fresh process-wide resources.
+    """
+
+    ticker_file = tmp_path / 'tickers.json'
+    ticker_file.write_text(json.dumps(['MSFT', 'GOOGL']))
+    monkeypatch.setenv('SNAPSHOT_DIR', TEST_RESOURCES_PATH)
+    monkeypatch.setenv('TICKER_FILE', str(ticker_file))
+    monkeypatch.setattr('src.sidebar.TICKER_FILE', str(ticker_file))
+    # The fixtures are read with paths relative to the repository root
+    monkeypatch.chdir(src_dir)
+
+    st.cache_resource.clear()
+    yield
+    st.cache_resource.clear()
+
+
+def test_comparison_with_a_degraded_ticker(app_env, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    load_ticker = snapshot.load_ticker
+
+    def degraded_load(directory, ticker):
+        data = load_ticker(directory, ticker)
+        if ticker == 'GOOGL':
+            data.unavailable = {'polygon': 'The circuit breaker of polygon is open'}
+        return data
+
+    monkeypatch.setattr(snapshot, 'load_ticker', degraded_load)
+
+    at = AppTest.from_file(MAIN_FILE, default_timeout=30).run()
+    # A degraded ticker which isn't pending doesn't rerun the page
+    at.sidebar.multiselect[0].set_value(['MSFT', 'GOOGL']).run()
+
+    assert not at.exception
+    assert [warning.value for warning in at.main.warning] == ["A data source is unavailable, not compared: GOOGL"]
+    assert not at.main.info
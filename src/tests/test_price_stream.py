@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.cache import BundleCache
+from src.indicators import IndicatorEngine
+from src.price_stream import LocalFeed, PolygonFeed, PriceFeed, PriceStreamer, StreamError, Tick, ticks_to_bars
+from src.tests.test_data_processor import init_data_local
+
+
+def epoch(day: str, time_of_day: str = '15:00') -> float:
+    """
+    Epoch seconds of a New York time.
+    """
+
+    return pd.Timestamp(f'{day} {time_of_day}', tz='America/New_York').timestamp()
+
+
+@pytest.fixture
+def msft():
+    # The last bar of the fixture is 2023-11-10: open 361.49, high 369.53, low 361.07, close 369.23
+    return init_data_local('MSFT')
+
+
+def test_ticks_update_the_last_bar(msft):
+    ticks = [
+        Tick('MSFT', 370.0, 100, epoch('2023-11-10', '15:00')),
+        Tick('MSFT', 360.0, 200, epoch('2023-11-10', '15:30')),
+        Tick('MSFT', 365.0, 50, epoch('2023-11-09', '15:30')),
+    ]
+
+    bars = ticks_to_bars(msft.price_hist, ticks)
+
+    assert list(bars.index) == [pd.Timestamp('2023-11-10')]
+    bar = bars.iloc[0]
+    assert bar['Open'] == pytest.approx(361.49, abs=0.01)
+    assert bar['High'] == 370.0
+    assert bar['Low'] == 360.0
+    assert bar['Close'] == 360.0
+    assert bar['Volume'] == msft.price_hist['Volume'].iloc[-1] + 300
+
+
+def test_ticks_of_a_new_day_open_a_new_bar(msft):
+    ticks = [
+        Tick('MSFT', 372.0, 100, epoch('2023-11-13', '09:30')),
+        Tick('MSFT', 375.0, 100, epoch('2023-11-13', '10:00')),
+    ]
+
+    bars = ticks_to_bars(msft.price_hist, ticks)
+
+    assert list(bars.index) == [pd.Timestamp('2023-11-13')]
+    assert bars.iloc[0][['Open', 'High', 'Low', 'Close', 'Volume']].tolist() == [372.0, 375.0, 372.0, 375.0, 200]
+    assert (bars.dtypes == msft.price_hist.dtypes).all()
+
+
+def test_update_last_bar(msft):
+    indicators = msft.get_indicators(['SMA 20', 'RSI 14'])
+    valuation = msft.get_valuation_history()
+    rows = len(msft.price_hist)
+
+    msft.update_last_bar(ticks_to_bars(msft.price_hist, [Tick('MSFT', 380.0, 100, epoch('2023-11-13'))]))
+
+    assert len(msft.price_hist) == rows + 1
+    assert msft.price_version == 1
+    assert msft.get_curr_prev_price()['current'] == 380.0
+    assert msft.get_valuation_history()['date'].iloc[-1] == pd.Timestamp('2023-11-13')
+    assert len(valuation) + 1 == len(msft.get_valuation_history())
+
+    # The indicators are extended incrementally, with the same values as a full computation
+    updated = msft.get_indicators(['SMA 20', 'RSI 14'])
+    full = IndicatorEngine(msft.price_hist)
+    for name in ('SMA 20', 'RSI 14'):
+        assert len(updated[name]) == len(indicators[name]) + 1
+        np.testing.assert_allclose(updated[name].values, full.get(name).values, rtol=1e-9)
+
+
+def test_update_last_bar_replaces_the_history(msft):
+    before = msft.price_hist
+    msft.get_indicators(['SMA 20'])
+    engine = msft._indicator_engine
+
+    msft.update_last_bar(ticks_to_bars(msft.price_hist, [Tick('MSFT', 380.0, 100, epoch('2023-11-10'))]))
+
+    # The readers of the old state aren't affected
+    assert before['Close'].iloc[-1] != 380.0
+    assert len(engine.get('SMA 20')) == len(before)
+    assert msft.price_hist['Close'].iloc[-1] == 380.0
+
+
+def test_streamer_applies_the_trades(msft):
+    cache = BundleCache()
+    cache.put('MSFT', msft)
+    feed = LocalFeed()
+    streamer = PriceStreamer(feed, resolve=cache.peek)
+
+    streamer.watch('MSFT')
+    assert feed.tickers() == {'MSFT'}
+
+    streamer._on_tick(Tick('MSFT', 371.0, 100, epoch('2023-11-10')))
+    streamer._on_tick(Tick('MSFT', 372.0, 100, epoch('2023-11-10', '15:01')))
+    # Not loaded, the trades are dropped
+    streamer._on_tick(Tick('GOOGL', 130.0, 100, epoch('2023-11-10')))
+
+    assert streamer.flush() == ['MSFT']
+    assert msft.price_hist['Close'].iloc[-1] == 372.0
+    # A single update for the batch
+    assert msft.price_version == 1
+    assert streamer.last_trade('MSFT').timestamp() == epoch('2023-11-10', '15:01')
+
+    stats = streamer.stats()
+    assert stats['ticks'] == 3
+    assert stats['updates'] == 1
+    assert stats['dropped'] == 1
+    # The cache statistics aren't affected by the stream
+    assert cache.stats()['hits'] == 0
+
+
+def test_idle_tickers_are_unsubscribed():
+    now = [0.0]
+    feed = LocalFeed()
+    streamer = PriceStreamer(feed, resolve=lambda ticker: None, idle_timeout=60, clock=lambda: now[0])
+
+    streamer.watch('MSFT')
+    streamer.watch('GOOGL')
+    now[0] = 50
+    streamer.watch('MSFT')
+    now[0] = 100
+    streamer.flush()
+
+    assert feed.tickers() == {'MSFT'}
+    assert streamer.stats()['watched'] == ['MSFT']
+
+
+def test_streamer_threads_with_the_local_feed(msft):
+    feed = LocalFeed(interval=0.01)
+    streamer = PriceStreamer(feed, resolve=lambda ticker: msft, flush_interval=0.01)
+    streamer.start()
+    try:
+        streamer.watch('MSFT')
+        # The trades of the unsubscribed tickers aren't delivered
+        feed.push(Tick('GOOGL', 130.0, 100, epoch('2023-11-10')))
+        feed.push(Tick('MSFT', 390.0, 100, epoch('2023-11-10')))
+
+        deadline = time.monotonic() + 5
+        while msft.price_version == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        streamer.stop(timeout=5)
+
+    assert msft.price_hist['Close'].iloc[-1] == 390.0
+    assert streamer.stats()['ticks'] == 1
+
+
+def test_a_feed_needs_run():
+
+    class Feed(PriceFeed):
+        pass
+
+    with pytest.raises(TypeError):
+        Feed()
+
+
+def test_random_walk_starts_at_the_last_close():
+    feed = LocalFeed(random_walk=True, start_prices=lambda ticker: 100.0)
+    feed.subscribe(['MSFT'])
+    feed._walk()
+
+    tick = feed._queue.get_nowait()
+    assert tick.ticker == 'MSFT'
+    assert 99.9 <= tick.price <= 100.1
+
+
+def test_polygon_messages():
+    raw = json.dumps([
+        {'ev': 'status', 'status': 'auth_success'},
+        {'ev': 'T', 'sym': 'MSFT', 'p': 370.12, 's': 100, 't': 1699646400000},
+    ])
+
+    assert PolygonFeed.parse_messages(raw) == [Tick('MSFT', 370.12, 100.0, 1699646400.0)]
+
+    with pytest.raises(StreamError):
+        PolygonFeed.parse_messages(json.dumps([{'ev': 'status', 'status': 'auth_failed', 'message': 'bad key'}]))
+
+
+@pytest.fixture
+def polygon_server():
+    """
+    A stand-in of the Polygon websocket: it checks the key and sends a trade of every subscribed ticker.
+    """
+
+    from tornado.httpserver import HTTPServer
+    from tornado.netutil import bind_sockets
+    from tornado.websocket import WebSocketHandler
+
+    received = []
+
+    class Handler(WebSocketHandler):
+
+        def on_message(self, message):
+            message = json.loads(message)
+            received.append(message)
+            if message['action'] == 'auth':
+                status = 'auth_success' if message['params'] == 'key' else 'auth_failed'
+                self.write_message(json.dumps([{'ev': 'status', 'status': status}]))
+            elif message['action'] == 'subscribe':
+                for param in message['params'].split(','):
+                    trade = {'ev': 'T', 'sym': param[2:], 'p': 370.5, 's': 10, 't': 1699646400000}
+                    self.write_message(json.dumps([trade]))
+
+    from tornado.web import Application
+
+    sockets = bind_sockets(0, '127.0.0.1')
+    port = sockets[0].getsockname()[1]
+    started = threading.Event()
+    loop_holder = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = HTTPServer(Application([('/stocks', Handler)]))
+        server.add_sockets(sockets)
+        loop_holder['loop'] = loop
+        started.set()
+        loop.run_forever()
+        server.stop()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait(5)
+    yield f'ws://127.0.0.1:{port}/stocks', received
+    loop_holder['loop'].call_soon_threadsafe(loop_holder['loop'].stop)
+    thread.join(5)
+
+
+def test_polygon_feed(polygon_server):
+    url, received = polygon_server
+    feed = PolygonFeed('key', url=url)
+    feed.subscribe(['MSFT'])
+    ticks = []
+    stop = threading.Event()
+
+    def on_tick(tick):
+        ticks.append(tick)
+        stop.set()
+
+    thread = threading.Thread(target=feed.run, args=(on_tick, stop), daemon=True)
+    thread.start()
+    thread.join(10)
+
+    assert not thread.is_alive()
+    assert ticks == [Tick('MSFT', 370.5, 10.0, 1699646400.0)]
+    assert received[0] == {'action': 'auth', 'params': 'key'}
+    assert received[1] == {'action': 'subscribe', 'params': 'T.MSFT'}
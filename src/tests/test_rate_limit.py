@@ -0,0 +1,62 @@
+import os
+import sys
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.rate_limit import RateLimiter
+
+
+class FakeTime:
+    """
+    A controllable clock, sleeping just moves it forward.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_invalid_limit():
+    with pytest.raises(ValueError):
+        RateLimiter(max_calls=0, period=60)
+
+
+def test_try_acquire_within_window():
+    fake = FakeTime()
+    limiter = RateLimiter(max_calls=5, period=60, clock=fake.clock, sleep=fake.sleep)
+
+    assert all(limiter.try_acquire() for _ in range(5))
+    assert limiter.try_acquire() == False
+    assert limiter.available() == 0
+
+    fake.now = 60
+    assert limiter.available() == 5
+
+
+def test_acquire_waits_for_the_window():
+    fake = FakeTime()
+    limiter = RateLimiter(max_calls=2, period=60, clock=fake.clock, sleep=fake.sleep)
+
+    limiter.acquire()
+    fake.now = 10
+    limiter.acquire()
+    limiter.acquire()
+
+    # The third call has to wait until the first one leaves the window
+    assert fake.now >= 60
+
+
+def test_acquire_timeout():
+    fake = FakeTime()
+    limiter = RateLimiter(max_calls=1, period=60, clock=fake.clock, sleep=fake.sleep)
+
+    limiter.acquire()
+    assert limiter.acquire(timeout=5) == False
+    assert fake.now < 60
@@ -0,0 +1,194 @@
+import os
+import sys
+from datetime import datetime, timezone
+import pytest
+import requests
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src import polygon_api
+from src.daily_price_api import _is_transient
+from src.polygon_api import LimitReachedError, PolygonAPI, ServerError, TickerNotFoundError
+from src.retry import RetryPolicy, parse_retry_after, retry_after, retry_stats
+from src.tracing import trace
+
+
+class FakeTime:
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_policy(fake, **kwargs):
+    options = dict(
+        retryable=(ServerError, LimitReachedError),
+        clock=fake.clock,
+        sleep=fake.sleep,
+        rand=lambda: 0.5
+    )
+    options.update(kwargs)
+    return RetryPolicy('test', **options)
+
+
+def failing(errors, result='ok'):
+    errors = list(errors)
+
+    def func():
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return func
+
+
+def test_parse_retry_after():
+    now = datetime(2023, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after('Wed, 18 Oct 2023 12:00:30 GMT', now=now) == 30
+    assert parse_retry_after('Wed, 18 Oct 2023 11:00:00 GMT', now=now) == 0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+
+
+def test_retry_after_of_the_errors():
+    assert retry_after(LimitReachedError(retry_after=5)) == 5
+    assert retry_after(ServerError()) is None
+
+    response = requests.Response()
+    response.status_code = 503
+    response.headers['Retry-After'] = '7'
+    assert retry_after(requests.HTTPError(response=response)) == 7
+
+
+def test_exponential_backoff_with_jitter():
+    fake = FakeTime()
+    policy = make_policy(fake, base_delay=1, max_delay=3)
+
+    assert policy.call('api', failing([ServerError()] * 3)) == 'ok'
+    # Half of 1, 2 and 3 (capped) seconds
+    assert fake.sleeps == [0.5, 1.0, 1.5]
+
+    full_jitter = make_policy(fake, rand=lambda: 0.999)
+    assert full_jitter.backoff(4, ServerError()) < 8
+
+
+def test_retry_after_is_respected():
+    fake = FakeTime()
+    policy = make_policy(fake, base_delay=1)
+
+    policy.call('api', failing([LimitReachedError(retry_after=10)]))
+
+    assert fake.sleeps == [10.5]
+
+
+def test_non_retryable_errors_fail_right_away():
+    fake = FakeTime()
+    policy = make_policy(fake)
+
+    with pytest.raises(TickerNotFoundError):
+        policy.call('api', failing([TickerNotFoundError()]))
+    assert fake.sleeps == []
+
+
+def test_the_call_gives_up():
+    fake = FakeTime()
+    policy = make_policy(fake, max_attempts=3)
+
+    with pytest.raises(ServerError):
+        policy.call('api', failing([ServerError()] * 5))
+    assert len(fake.sleeps) == 2
+
+    # The next wait would end after the deadline, so it doesn't wait at all
+    policy = make_policy(fake, deadline=30)
+    with pytest.raises(LimitReachedError):
+        policy.call('api', failing([LimitReachedError(retry_after=60)]))
+    assert len(fake.sleeps) == 2
+
+    stats = policy.stats()['api']
+    assert stats['gave_up']['deadline'] == 1
+    assert stats['failures'] == 1
+
+
+def test_retry_budget_per_endpoint():
+    fake = FakeTime()
+    policy = make_policy(fake, base_delay=0.01, budget_per_minute=2)
+
+    policy.call('news', failing([ServerError()] * 2))
+    with pytest.raises(ServerError):
+        policy.call('news', failing([ServerError()]))
+
+    # The other endpoints have their own budget
+    assert policy.call('financials', failing([ServerError()])) == 'ok'
+
+    # The budget is refilled after a minute
+    fake.now += 60
+    assert policy.call('news', failing([ServerError()])) == 'ok'
+    assert policy.stats()['news']['gave_up']['budget'] == 1
+
+
+def test_retries_are_reported():
+    fake = FakeTime()
+    policy = make_policy(fake, base_delay=2)
+
+    with trace('page') as request:
+        policy.call('news', failing([ServerError()]))
+        policy.call('news', failing([]))
+
+    assert request.summary()['spans']['retry.news']['count'] == 1
+    stats = retry_stats()['news']
+    assert stats['calls'] == 2
+    assert stats['retry_rate'] == 0.5
+    assert stats['retry_wait_ms'] == 1000
+    assert stats['max_latency_ms'] == 1000
+
+
+def test_yfinance_transient_errors():
+    response = requests.Response()
+
+    response.status_code = 429
+    assert _is_transient(requests.HTTPError(response=response))
+    response.status_code = 404
+    assert not _is_transient(requests.HTTPError(response=response))
+    assert _is_transient(requests.ConnectionError())
+    assert not _is_transient(KeyError('Earnings Date'))
+
+
+class _Response:
+
+    def __init__(self, status_code, body, headers=None):
+        self.status_code = status_code
+        self._body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self._body
+
+
+def test_polygon_requests_are_retried(monkeypatch):
+    fake = FakeTime()
+    responses = [
+        _Response(503, {}),
+        _Response(429, {'error': 'limit'}, {'Retry-After': '3'}),
+        _Response(200, {'status': 'OK', 'results': [{'title': 'news'}]}),
+    ]
+    monkeypatch.setattr(polygon_api.requests, 'get', lambda url, headers, timeout: responses.pop(0))
+    monkeypatch.setattr(polygon_api.RATE_LIMITER, 'acquire', lambda timeout=None: True)
+    monkeypatch.setattr(polygon_api.RETRY_POLICY, '_sleep', fake.sleep)
+
+    api = PolygonAPI('MSFT')
+    api.get_news()
+
+    assert api.news == [{'title': 'news'}]
+    assert len(fake.sleeps) == 2
+    assert fake.sleeps[1] >= 3
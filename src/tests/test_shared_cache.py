@@ -0,0 +1,261 @@
+import os
+import socketserver
+import sys
+import threading
+import time
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.figure_cache import CachedFigure, FigureCache
+from src.shared_cache import (
+    FORMAT_VERSION,
+    CacheFormatError,
+    RedisBackend,
+    RedisError,
+    SharedCache,
+    SQLiteBackend,
+    backend_from_url,
+    decode_value,
+    encode_value,
+)
+from src.tests.test_data_processor import init_data_local
+from src.tests.test_figure_cache import build_figure
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+
+    """Stand-in of a Redis server with the commands of the RedisBackend."""
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+
+            with server.lock:
+                server.commands.append(command)
+                now = time.monotonic()
+                for key in [key for key, (_, expires_at) in server.data.items() if expires_at and expires_at <= now]:
+                    del server.data[key]
+
+                if command == b'AUTH':
+                    reply = b'+OK\r\n' if args[1] == server.password else b'-WRONGPASS invalid password\r\n'
+                elif command == b'SELECT':
+                    reply = b'+OK\r\n'
+                elif command == b'GET':
+                    reply = self._bulk(server.data.get(args[1], (None, None))[0])
+                elif command == b'SET':
+                    options = [arg.upper() for arg in args[3:]]
+                    expires_at = now + int(options[options.index(b'PX') + 1]) / 1000 if b'PX' in options else None
+                    if b'NX' in options and args[1] in server.data:
+                        reply = b'$-1\r\n'
+                    else:
+                        server.data[args[1]] = (args[2], expires_at)
+                        reply = b'+OK\r\n'
+                elif command == b'DEL':
+                    reply = b':%d\r\n' % int(server.data.pop(args[1], None) is not None)
+                else:
+                    reply = b'-ERR unknown command\r\n'
+
+            self.wfile.write(reply)
+
+
+class _RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+@pytest.fixture
+def resp_server():
+    server = _RespServer(('127.0.0.1', 0), _RespHandler)
+    server.data, server.commands, server.lock, server.password = {}, [], threading.Lock(), b'secret'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def redis(resp_server):
+    return RedisBackend('127.0.0.1', resp_server.server_address[1], db=1, password='secret')
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteBackend(str(tmp_path / 'cache.db'))
+    return request.getfixturevalue('redis')
+
+
+def test_encode_and_decode():
+    entry = encode_value({'a': [1, 2, 3] * 100})
+
+    assert entry[2] == FORMAT_VERSION
+    assert decode_value(entry) == {'a': [1, 2, 3] * 100}
+
+    # The entries of another format version aren't read
+    with pytest.raises(CacheFormatError):
+        decode_value(entry[:2] + bytes([FORMAT_VERSION + 1]) + entry[3:])
+    with pytest.raises(CacheFormatError):
+        decode_value(b'garbage')
+
+
+def test_backend_operations(backend):
+    assert backend.get('key') is None
+
+    backend.set('key', b'\x00value\r\n')
+    assert backend.get('key') == b'\x00value\r\n'
+
+    assert not backend.add('key', b'other')
+    assert backend.add('new', b'other', ttl=60)
+    assert backend.get('new') == b'other'
+
+    backend.delete('key')
+    assert backend.get('key') is None
+
+
+def test_sqlite_expiry(tmp_path):
+    now = [1000.0]
+    backend = SQLiteBackend(str(tmp_path / 'cache.db'), clock=lambda: now[0])
+    backend.set('key', b'value', ttl=10)
+    backend.set('forever', b'value')
+
+    now[0] += 10
+    assert backend.get('key') is None
+    # An expired key can be added again
+    assert backend.add('key', b'new')
+    assert backend.get('forever') == b'value'
+
+    backend.set('old', b'value', ttl=5)
+    now[0] += 5
+    assert backend.purge_expired() == 1
+
+
+def test_redis_client(resp_server, redis):
+    redis.set('key', b'value', ttl=0.05)
+    assert redis.get('key') == b'value'
+    time.sleep(0.1)
+    assert redis.get('key') is None
+
+    assert resp_server.commands[:2] == [b'AUTH', b'SELECT']
+
+    with pytest.raises(RedisError):
+        redis.execute('FLUSHALL')
+
+    # The broken connection is opened again
+    redis._local.connection[0].close()
+    assert redis.get('key') is None
+
+
+def test_backend_from_url(tmp_path, resp_server):
+    assert isinstance(backend_from_url(f'sqlite:///{tmp_path}/cache.db'), SQLiteBackend)
+
+    redis = backend_from_url(f'redis://:secret@127.0.0.1:{resp_server.server_address[1]}/2')
+    assert (redis.port, redis.db, redis.password) == (resp_server.server_address[1], 2, 'secret')
+
+    with pytest.raises(ValueError):
+        backend_from_url('memcached://localhost')
+
+
+def test_replicas_share_the_loaded_tickers(backend):
+    msft = init_data_local('MSFT')
+    loads = []
+
+    def loader(ticker):
+        loads.append(ticker)
+        return msft
+
+    replica_1 = SharedCache(backend, namespace='bundle')
+    replica_2 = SharedCache(backend, namespace='bundle')
+
+    assert replica_1.get_or_load('MSFT', loader) is msft
+    data = replica_2.get_or_load('MSFT', loader)
+
+    assert loads == ['MSFT']
+    assert data.get_pe() == msft.get_pe()
+    assert data.data_version == msft.data_version
+    assert replica_1.stats()['compression_ratio'] > 2
+    assert replica_2.stats()['hits'] == 1
+
+    replica_2.invalidate('MSFT')
+    assert replica_1.get('MSFT') is None
+
+
+def test_only_one_replica_loads_a_missing_key(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'cache.db'))
+    loads = []
+
+    def loader(ticker):
+        loads.append(ticker)
+        time.sleep(0.3)
+        return ticker.lower()
+
+    replicas = [SharedCache(backend, namespace='bundle') for _ in range(4)]
+    results = [None] * 4
+
+    def run(index):
+        results[index] = replicas[index].get_or_load('MSFT', loader)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['msft'] * 4
+    assert loads == ['MSFT']
+    assert sum(replica.stats()['waits'] for replica in replicas) == 3
+
+
+def test_backend_errors_are_treated_as_misses(resp_server, redis):
+    cache = SharedCache(redis, namespace='bundle')
+    cache.put('MSFT', 'value')
+
+    # A corrupt entry is removed
+    resp_server.data[b'bundle:v%d:MSFT' % FORMAT_VERSION] = (b'corrupt', None)
+    assert cache.get('MSFT') is None
+    assert b'bundle:v%d:MSFT' % FORMAT_VERSION not in resp_server.data
+
+    resp_server.shutdown()
+    resp_server.server_close()
+    redis._close()
+
+    assert cache.get_or_load('MSFT', lambda ticker: 'loaded') == 'loaded'
+    assert not cache.put('MSFT', 'value')
+    assert cache.stats()['errors'] >= 3
+
+
+def test_figure_cache_of_the_replicas(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'cache.db'))
+    replica_1 = FigureCache(shared=SharedCache(backend, namespace='figure'))
+    replica_2 = FigureCache(shared=SharedCache(backend, namespace='figure'))
+    key = ('MSFT', 'revenue_quarterly', 'v1', ())
+
+    fig = replica_1.get_or_build(key, build_figure)
+    cached = replica_2.get_or_build(key, lambda: 1 / 0)
+
+    assert isinstance(cached, CachedFigure)
+    assert cached.to_dict() == fig.to_dict()
+    assert replica_2.stats()['shared_hits'] == 1
+    # It's in the memory of the second replica from now on
+    replica_2.get_or_build(key, lambda: 1 / 0)
+    assert replica_2.stats()['hits'] == 1
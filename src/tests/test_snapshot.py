@@ -0,0 +1,98 @@
+import gzip
+import os
+import sys
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.snapshot import (
+    SnapshotNotFoundError,
+    bundle_version,
+    export_snapshot,
+    has_ticker,
+    load_ticker,
+    read_manifest,
+    write_ticker,
+)
+from src.tests.test_data_processor import init_data_local
+
+TEST_RESOURCES_PATH = "src/tests/test_resources"
+
+
+@pytest.fixture(scope='module')
+def msft():
+    return init_data_local('MSFT')
+
+
+def test_write_and_load_ticker(tmp_path, msft):
+    folder = write_ticker(str(tmp_path), msft)
+
+    assert sorted(os.listdir(folder))[0] == 'details.json.cz'
+    data = load_ticker(str(tmp_path), 'MSFT')
+
+    assert data.details == msft.details
+    assert data.financials == msft.financials
+    assert data.news == msft.news
+    assert data.price_hist.equals(msft.price_hist)
+    assert data.dividend_hist.equals(msft.dividend_hist)
+    assert data.earning_dates.equals(msft.earning_dates)
+    assert data.get_pe() == msft.get_pe()
+
+
+def test_fixtures_can_be_served_as_snapshot():
+    assert has_ticker(TEST_RESOURCES_PATH, 'googl')
+    data = load_ticker(TEST_RESOURCES_PATH, 'GOOGL')
+
+    assert data.get_name() == init_data_local('GOOGL').get_name()
+    assert read_manifest(TEST_RESOURCES_PATH) is None
+
+
+def test_missing_ticker(tmp_path):
+    assert not has_ticker(str(tmp_path), 'MSFT')
+    with pytest.raises(SnapshotNotFoundError):
+        load_ticker(str(tmp_path), 'MSFT')
+
+
+def test_export_snapshot(tmp_path, msft):
+    def loader(ticker):
+        if ticker == 'MSFT':
+            return msft
+        raise KeyError(ticker)
+
+    manifest = export_snapshot(str(tmp_path), ['MSFT', 'XXXX'], loader=loader)
+
+    assert manifest['tickers'] == ['MSFT']
+    assert manifest['failed'] == {'XXXX': 'KeyError'}
+    assert read_manifest(str(tmp_path)) == manifest
+    assert has_ticker(str(tmp_path), 'MSFT')
+
+    # The tickers of the earlier exports are kept
+    googl = init_data_local('GOOGL')
+    manifest = export_snapshot(str(tmp_path), ['GOOGL'], loader=lambda ticker: googl)
+    assert manifest['tickers'] == ['GOOGL', 'MSFT']
+
+
+def test_bundle_version(tmp_path, msft):
+    assert bundle_version(str(tmp_path), 'MSFT') is None
+
+    write_ticker(str(tmp_path), msft)
+    version = bundle_version(str(tmp_path), 'MSFT')
+    assert load_ticker(str(tmp_path), 'MSFT').data_version == version
+
+    # A newer bundle of the ticker gets a new version
+    os.utime(os.path.join(str(tmp_path), 'MSFT', 'news.json.cz'), ns=(0, 0))
+    assert bundle_version(str(tmp_path), 'MSFT') != version
+
+
+def test_older_gzipped_snapshots_are_read(tmp_path):
+    folder = tmp_path / 'MSFT'
+    folder.mkdir()
+    for file in os.listdir(os.path.join(TEST_RESOURCES_PATH, 'MSFT')):
+        with open(os.path.join(TEST_RESOURCES_PATH, 'MSFT', file), 'rb') as f:
+            (folder / (file + '.gz')).write_bytes(gzip.compress(f.read()))
+
+    data = load_ticker(str(tmp_path), 'MSFT')
+
+    assert data.financials == init_data_local('MSFT').financials
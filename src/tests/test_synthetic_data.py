@@ -0,0 +1,130 @@
+import os
+import sys
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.data_processor import IncorrectDataError
+from src.synthetic_data import (
+    ANOMALIES,
+    generate_ticker,
+    generate_universe,
+    make_data_processor,
+    ticker_symbol,
+    write_fixture,
+)
+
+
+END = date(2023, 11, 10)
+
+
+def _compare_with_truth(synthetic, metric):
+    """
+    Check the quarterly values of the DataProcessor against the generated fiscal quarters.
+    """
+
+    df = make_data_processor(synthetic).calculate_quarterly_data('income_statement', metric)
+    truth = synthetic.quarterly_truth.copy()
+    truth['fiscal_end_date'] = truth['end_date'].map(lambda d: d.isoformat())
+
+    merged = df.merge(truth[['fiscal_end_date', metric]], on='fiscal_end_date', how='left')
+    assert merged[metric].notnull().all()
+    assert np.allclose(merged['value'], merged[metric], rtol=1e-6, atol=0.1)
+    return df
+
+
+@pytest.mark.parametrize('fiscal_year_end_month,week_based', [(12, False), (6, False), (9, True), (12, True)])
+def test_quarterly_data_matches_truth(fiscal_year_end_month, week_based):
+    synthetic = generate_ticker(
+        'SYAAA', seed=3, end=END,
+        fiscal_year_end_month=fiscal_year_end_month, week_based=week_based
+    )
+
+    df = _compare_with_truth(synthetic, 'revenues')
+
+    # Every quarter since 2018, including the derived Q4s
+    assert df['year'].min() == 2018
+    assert (df.groupby('year')['value'].count().drop([2018, 2023]) == 4).all()
+
+
+def test_same_seed_same_data():
+    first = generate_ticker('SYAAA', seed=7, end=END)
+    second = generate_ticker('SYAAA', seed=7, end=END)
+    other = generate_ticker('SYAAA', seed=8, end=END)
+
+    assert first.financials == second.financials
+    assert first.price_hist.equals(second.price_hist)
+    assert first.financials != other.financials
+
+
+def test_financials_are_filed_until_the_end():
+    synthetic = generate_ticker('SYAAA', seed=1, years=30, end=END)
+
+    assert all(filing['filing_date'] <= END.isoformat() for filing in synthetic.financials)
+    assert {filing['fiscal_period'] for filing in synthetic.financials} == {'Q1', 'Q2', 'Q3', 'FY'}
+    end_dates = [filing['end_date'] for filing in synthetic.financials]
+    assert end_dates == sorted(end_dates, reverse=True)
+    assert synthetic.price_hist.index[-1] <= pd.Timestamp(END)
+
+
+def test_mislabeled_period_raises():
+    data = make_data_processor(generate_ticker('SYAAA', seed=0, end=END, anomalies=('mislabeled_period',)))
+
+    with pytest.raises(IncorrectDataError):
+        data.calculate_quarterly_data('income_statement', 'revenues')
+
+
+def test_missing_metric_raises_for_that_metric():
+    data = make_data_processor(generate_ticker('SYAAA', seed=0, end=END, anomalies=('missing_metric',)))
+
+    with pytest.raises(IncorrectDataError):
+        data.calculate_quarterly_data('income_statement', 'net_income_loss_attributable_to_parent')
+    assert not data.calculate_quarterly_data('income_statement', 'revenues').empty
+
+
+def test_missing_quarter_cuts_the_history():
+    clean = make_data_processor(generate_ticker('SYAAA', seed=0, end=END))
+    missing = make_data_processor(generate_ticker('SYAAA', seed=0, end=END, anomalies=('missing_quarter',)))
+
+    clean_df = clean.calculate_quarterly_data('income_statement', 'revenues')
+    missing_df = missing.calculate_quarterly_data('income_statement', 'revenues')
+
+    assert len(missing_df) < len(clean_df)
+
+
+def test_unknown_anomaly():
+    with pytest.raises(ValueError):
+        generate_ticker('SYAAA', anomalies=('unknown',))
+
+
+def test_generate_universe():
+    universe = list(generate_universe(30, seed=2, years=5, end=END, anomaly_rate=0.5))
+
+    assert len({synthetic.ticker for synthetic in universe}) == 30
+    assert any(synthetic.anomalies for synthetic in universe)
+    assert all(set(synthetic.anomalies) <= set(ANOMALIES) for synthetic in universe)
+    assert ticker_symbol(0) == 'SYAAA'
+    assert ticker_symbol(26 ** 3) == 'SYAAA1'
+
+
+def test_getters_on_synthetic_data():
+    data = make_data_processor(generate_ticker('SYAAA', seed=4, end=END, fiscal_year_end_month=12))
+
+    assert data.get_name() == 'Syaaa Holdings Inc'
+    assert data.get_market_cap() > 0
+    assert not data.get_ttm_profit_margin().empty
+    assert not data.get_valuation_history().empty
+    assert data.get_next_report_date() is not None
+
+
+def test_write_fixture(tmp_path):
+    synthetic = generate_ticker('SYAAA', seed=5, years=3, end=END)
+
+    folder = write_fixture(synthetic, str(tmp_path))
+
+    assert sorted(os.listdir(folder)) == sorted(os.listdir('src/tests/test_resources/MSFT'))
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import pytest
+import requests
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src import daily_price_api, polygon_api
+from src.polygon_api import ServerError
+from src.retry import RetryPolicy
+from src.timeouts import (
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    DeadlineExceededError,
+    check_deadline,
+    page_deadline,
+    remaining,
+    request_timeout,
+)
+
+
+def test_no_deadline_outside_of_a_page():
+    assert remaining() is None
+    assert request_timeout() == (CONNECT_TIMEOUT, READ_TIMEOUT)
+    check_deadline()
+
+
+def test_request_timeout_is_cut_to_the_deadline():
+    with page_deadline(1) as deadline:
+        connect, read = request_timeout()
+        assert read <= 1
+        assert connect == min(CONNECT_TIMEOUT, connect)
+        assert 0 < deadline.remaining() <= 1
+
+    with page_deadline(0):
+        with pytest.raises(DeadlineExceededError):
+            request_timeout()
+
+    # The deadline is reset after the page
+    assert remaining() is None
+
+
+def test_retries_stop_at_the_page_deadline():
+    calls = []
+
+    def func():
+        calls.append(time.monotonic())
+        raise ServerError()
+
+    policy = RetryPolicy('timeouts', retryable=(ServerError,), base_delay=0.5, rand=lambda: 1.0)
+
+    with page_deadline(0.2):
+        start = time.monotonic()
+        with pytest.raises(ServerError):
+            policy.call('api', func)
+
+    # The next retry would end after the deadline of the page
+    assert len(calls) == 1
+    assert time.monotonic() - start < 0.2
+    assert policy.stats()['api']['gave_up']['deadline'] == 1
+
+    with page_deadline(0):
+        with pytest.raises(DeadlineExceededError):
+            policy.call('api', func)
+    assert len(calls) == 1
+
+
+def test_polygon_requests_have_timeouts(monkeypatch):
+    timeouts = []
+
+    class Response:
+        status_code = 200
+        headers: dict = {}
+
+        def json(self):
+            return {'status': 'OK', 'results': [{'ticker': 'MSFT'}]}
+
+    def get(url, headers, timeout):
+        timeouts.append(timeout)
+        return Response()
+
+    monkeypatch.setattr(polygon_api.requests, 'get', get)
+    # Not the shared limiter, the other tests may have used up its window
+    monkeypatch.setattr(polygon_api, 'RATE_LIMITER', polygon_api.RateLimiter(100, 60))
+    polygon_api._get('url')
+    with page_deadline(2):
+        polygon_api._get('url')
+
+    assert timeouts[0] == (CONNECT_TIMEOUT, READ_TIMEOUT)
+    assert timeouts[1][1] <= 2
+
+
+def test_rate_limit_wait_stops_at_the_deadline(monkeypatch):
+    monkeypatch.setattr(polygon_api, 'RATE_LIMITER', polygon_api.RateLimiter(1, 60))
+    polygon_api.RATE_LIMITER.acquire()
+
+    with page_deadline(0.1):
+        with pytest.raises(DeadlineExceededError):
+            polygon_api._get('url')
+
+
+def test_yfinance_requests_have_timeouts(monkeypatch):
+    timeouts = []
+
+    def request(self, method, url, *args, **kwargs):
+        timeouts.append(kwargs['timeout'])
+
+    monkeypatch.setattr(requests.Session, 'request', request)
+    session = daily_price_api.SESSION
+
+    session.get('url')
+    session.get('url', timeout=5)
+    with page_deadline(1):
+        session.get('url', timeout=30)
+
+    assert timeouts[0] == (CONNECT_TIMEOUT, READ_TIMEOUT)
+    assert timeouts[1] == (CONNECT_TIMEOUT, min(READ_TIMEOUT, 5))
+    assert timeouts[2][1] <= 1
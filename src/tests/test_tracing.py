@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import time
+import urllib.request
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.tracing import MetricsRegistry, current_trace, span, start_metrics_server, trace, traced
+from src.tests.test_data_processor import init_data_local
+
+
+def test_span_outside_of_trace():
+    assert current_trace() is None
+    with span('test.outside') as record:
+        pass
+    assert record.stage == 'test'
+    assert record.duration >= 0
+
+
+def test_nested_spans_self_time():
+    with trace('test_page') as request:
+        with span('outer.parent'):
+            time.sleep(0.02)
+            with span('inner.child'):
+                time.sleep(0.02)
+
+    summary = request.summary()
+    parent = summary['spans']['outer.parent']
+    child = summary['spans']['inner.child']
+
+    assert parent['total_ms'] >= parent['self_ms'] + child['total_ms'] - 1
+    assert summary['stages']['outer'] == pytest.approx(parent['self_ms'])
+    assert summary['wall_ms'] >= parent['total_ms']
+    assert current_trace() is None
+
+
+def test_traced_decorator_and_errors():
+
+    @traced('test.failing')
+    def failing():
+        raise ValueError()
+
+    assert failing.__name__ == 'failing'
+
+    with trace('test_page') as request:
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                failing()
+
+    item = request.summary()['spans']['test.failing']
+    assert item['count'] == 2
+    assert item['errors'] == 2
+
+
+def test_data_processor_getters_are_traced():
+    data = init_data_local('MSFT')
+
+    with trace('test_page') as request:
+        data.get_ttm_profit_margin()
+
+    spans = request.summary()['spans']
+    assert spans['data_processor.get_ttm_profit_margin']['count'] == 1
+    assert spans['data_processor.get_ttm_data']['count'] == 2
+    assert spans['data_processor.calculate_quarterly_data']['count'] == 2
+
+
+def test_trace_is_logged_as_json(caplog):
+    with caplog.at_level('INFO', logger='src.tracing'):
+        with trace('test_logged'):
+            with span('test.logged'):
+                pass
+
+    logged = json.loads(caplog.records[-1].getMessage())
+    assert logged['name'] == 'test_logged'
+    assert 'test.logged' in logged['spans']
+
+
+def test_prometheus_export():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.observe('polygon.get_news', 'polygon', 0.05)
+    registry.observe('polygon.get_news', 'polygon', 0.5, error=True)
+
+    text = registry.to_prometheus()
+    labels = 'span="polygon.get_news",stage="polygon"'
+
+    assert '# TYPE stock_dashboard_span_duration_seconds histogram' in text
+    assert f'stock_dashboard_span_duration_seconds_bucket{{{labels},le="0.1"}} 1' in text
+    assert f'stock_dashboard_span_duration_seconds_bucket{{{labels},le="1.0"}} 2' in text
+    assert f'stock_dashboard_span_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f'stock_dashboard_span_duration_seconds_count{{{labels}}} 2' in text
+    assert f'stock_dashboard_span_errors_total{{{labels}}} 1' in text
+
+    assert registry.to_dict()['polygon.get_news']['count'] == 2
+
+
+def test_metrics_server():
+    with span('test.served'):
+        pass
+
+    server = start_metrics_server(0, host='127.0.0.1')
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        with urllib.request.urlopen(f'{url}/metrics') as response:
+            assert 'span="test.served"' in response.read().decode()
+        with urllib.request.urlopen(f'{url}/metrics.json') as response:
+            assert 'test.served' in json.load(response)
+    finally:
+        server.shutdown()
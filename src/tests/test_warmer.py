@@ -0,0 +1,215 @@
+import os
+import sys
+import threading
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.cache import BundleCache
+from src.rate_limit import RateLimiter
+from src.polygon_api import LimitReachedError, TickerNotFoundError
+from src.tracing import span, trace
+from src.warmer import CacheWarmer, PageLoader
+
+
+def test_warms_every_ticker():
+    cache = BundleCache()
+    loaded = []
+    warmer = CacheWarmer(cache, lambda ticker: loaded.append(ticker) or ticker.lower(), RateLimiter(100, 60))
+    warmer.start()
+    warmer.enqueue_many(['MSFT', 'GOOGL', 'MSFT'])
+
+    assert warmer.join(timeout=5)
+    warmer.stop()
+
+    assert sorted(loaded) == ['GOOGL', 'MSFT']
+    assert cache.get('GOOGL') == 'googl'
+    assert warmer.stats()['warmed'] == 2
+
+
+def test_skips_cached_and_unwanted_tickers():
+    cache = BundleCache()
+    cache.put('MSFT', 'cached')
+    warmer = CacheWarmer(
+        cache,
+        lambda ticker: ticker,
+        RateLimiter(100, 60),
+        should_warm=lambda ticker: ticker != 'JNJ'
+    )
+    warmer.start()
+    warmer.enqueue_many(['MSFT', 'JNJ'])
+
+    assert warmer.join(timeout=5)
+    warmer.stop()
+
+    assert cache.get('MSFT') == 'cached'
+    assert 'JNJ' not in cache
+    assert warmer.stats()['skipped'] == 2
+
+
+def test_failed_ticker_is_recorded():
+    def loader(ticker):
+        raise TickerNotFoundError()
+
+    warmer = CacheWarmer(BundleCache(), loader, RateLimiter(100, 60))
+    warmer.start()
+    warmer.enqueue('NOTVALIDTICKER')
+
+    assert warmer.join(timeout=5)
+    warmer.stop()
+    assert 'NOTVALIDTICKER' in warmer.stats()['failed']
+
+
+def test_retry_after_limit_reached():
+    calls = []
+
+    def loader(ticker):
+        calls.append(ticker)
+        if len(calls) == 1:
+            raise LimitReachedError()
+        return ticker
+
+    cache = BundleCache()
+    warmer = CacheWarmer(cache, loader, RateLimiter(100, 60), retry_delay=0)
+    warmer.start()
+    warmer.enqueue('MSFT')
+
+    assert warmer.join(timeout=5)
+    warmer.stop()
+    assert calls == ['MSFT', 'MSFT']
+    assert 'MSFT' in cache
+
+
+def test_waits_for_free_rate_limit_capacity():
+    limiter = RateLimiter(5, 60)
+    # The page has just used the whole limit
+    for _ in range(5):
+        limiter.acquire()
+
+    warmer = CacheWarmer(BundleCache(), lambda ticker: ticker, limiter)
+    warmer.start()
+    warmer.enqueue('MSFT')
+
+    assert warmer.join(timeout=1) == False
+    warmer.stop()
+    assert warmer.stats()['warmed'] == 0
+
+
+def test_page_loader_waits_until_the_timeout():
+    cache = BundleCache()
+    release = threading.Event()
+
+    def loader(ticker, parts):
+        parts['name'] = ticker
+        release.wait(5)
+        return ticker.lower()
+
+    page_loader = PageLoader(cache, loader, lambda parts: parts.get('name'))
+
+    # The partial data is returned and the load goes on
+    assert page_loader.load('MSFT', timeout=0.05) == ('MSFT', False)
+    assert page_loader.is_loading('MSFT')
+
+    release.set()
+    assert page_loader.load('MSFT', timeout=5) == ('msft', True)
+    assert not page_loader.is_loading('MSFT')
+    assert cache.get('MSFT') == 'msft'
+    assert page_loader.stats()['timeouts'] == 1
+
+
+def test_page_loader_loads_a_ticker_once():
+    cache = BundleCache()
+    loaded = []
+    release = threading.Event()
+
+    def loader(ticker, parts):
+        loaded.append(ticker)
+        release.wait(5)
+        return ticker.lower()
+
+    page_loader = PageLoader(cache, loader, lambda parts: None)
+    assert page_loader.load('MSFT', timeout=0.01) == (None, False)
+    assert page_loader.load('MSFT', timeout=0.01) == (None, False)
+    release.set()
+
+    assert page_loader.load('MSFT') == ('msft', True)
+    assert loaded == ['MSFT']
+
+
+def test_page_loader_raises_the_errors():
+    def loader(ticker, parts):
+        raise TickerNotFoundError()
+
+    page_loader = PageLoader(BundleCache(), loader, lambda parts: None)
+    with pytest.raises(TickerNotFoundError):
+        page_loader.load('XXXX', timeout=5)
+    assert not page_loader.is_loading('XXXX')
+
+
+def test_page_loader_caches_degraded_data_shortly():
+    now = [0.0]
+    cache = BundleCache(ttl=3600, clock=lambda: now[0])
+    page_loader = PageLoader(
+        cache,
+        lambda ticker, parts: ticker.lower(),
+        lambda parts: None,
+        degraded=lambda data: data == 'degraded',
+        degraded_ttl=30
+    )
+
+    page_loader.load('DEGRADED')
+    page_loader.load('MSFT')
+    now[0] = 31
+
+    # The degraded data is reloaded, e.g. when the source is back
+    assert cache.get('DEGRADED') is None
+    assert cache.get('MSFT') == 'msft'
+    assert page_loader.stats()['degraded'] == 1
+
+
+def test_warmed_degraded_data_expires():
+    now = [0.0]
+    cache = BundleCache(clock=lambda: now[0])
+    page_loader = PageLoader(
+        cache,
+        lambda ticker, parts: 'degraded',
+        lambda parts: None,
+        degraded=lambda data: data == 'degraded',
+        degraded_ttl=30
+    )
+    warmer = CacheWarmer(
+        cache,
+        lambda ticker: page_loader.load(ticker)[0],
+        RateLimiter(max_calls=100, period=60),
+        loader_caches=True
+    )
+
+    warmer._warm('MSFT')
+    assert cache.get('MSFT') == 'degraded'
+    now[0] = 31
+
+    # The warmer doesn't put it again without the ttl
+    assert cache.get('MSFT') is None
+    assert warmer.stats()['warmed'] == 1
+
+
+def test_page_loader_spans_go_to_the_page_trace():
+    from src.timeouts import page_deadline, remaining
+
+    deadlines = []
+
+    def load(ticker, parts):
+        deadlines.append(remaining())
+        with span('polygon.get_financials'):
+            return ticker.lower()
+
+    page_loader = PageLoader(BundleCache(), load, lambda parts: None)
+
+    with trace('test_page') as request, page_deadline(8):
+        page_loader.load('MSFT', timeout=remaining())
+
+    assert [record.name for record in request.spans] == ['polygon.get_financials']
+    # The load isn't limited by the deadline of the page
+    assert deadlines == [None]
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import sqlite3
+import pytest
+
+# Add the 'src' folder to the Python path
+src_dir = os.path.join(os.path.dirname(__file__), '../..')
+sys.path.append(src_dir)
+
+from src.watchlist_store import WatchlistStore
+from src.json_io import read_ticker_list, add_ticker, delete_ticker, check_ticker_on_list
+
+
+@pytest.fixture
+def store(tmp_path):
+    return WatchlistStore(str(tmp_path / 'tickers.db'))
+
+
+def test_add_and_read(store):
+    store.add_ticker('GOOGL')
+    store.add_ticker('pypl')
+    store.add_ticker('GOOGL')
+    assert store.read_ticker_list() == ['GOOGL', 'PYPL']
+
+
+def test_users_are_separated(store):
+    store.add_ticker('GOOGL', user='alice')
+    store.add_ticker('MSFT', user='bob')
+    assert store.read_ticker_list(user='alice') == ['GOOGL']
+    assert store.check_ticker_on_list('MSFT', user='alice') == False
+    assert store.check_ticker_on_list('MSFT', user='bob') == True
+
+
+def test_delete(store):
+    store.add_ticker('GOOGL')
+    assert store.delete_ticker('GOOGL') == True
+    assert store.delete_ticker('GOOGL') == False
+    assert store.read_ticker_list() == []
+
+
+def test_move_ticker(store):
+    store.import_tickers(['A', 'B', 'C', 'D'])
+    store.move_ticker('D', 0)
+    assert store.read_ticker_list() == ['D', 'A', 'B', 'C']
+    with pytest.raises(KeyError):
+        store.move_ticker('E', 0)
+    # The failed move doesn't keep the transaction open
+    store.move_ticker('A', 0)
+    assert store.read_ticker_list() == ['A', 'D', 'B', 'C']
+
+
+def write_during(store, prefix, other_statement, call):
+    """
+    Call the store and let another session try to write when the store runs a statement with the prefix.
+    Returns 'locked' if the store held the write lock at that point.
+    """
+
+    other = sqlite3.connect(store.db_file, timeout=0)
+    attempts = []
+
+    def other_write(statement):
+        if statement.lstrip().startswith(prefix) and not attempts:
+            try:
+                with other:
+                    other.execute(other_statement)
+                attempts.append('written')
+            except sqlite3.OperationalError:
+                attempts.append('locked')
+
+    conn = store._connect()
+    conn.set_trace_callback(other_write)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+        other.close()
+    return attempts
+
+
+def test_move_is_a_single_transaction(store):
+    store.import_tickers(['A', 'B', 'C', 'D'])
+
+    # Another session tries to delete a ticker while the order is being moved
+    attempts = write_during(
+        store, "SELECT ticker FROM watchlist", "DELETE FROM watchlist WHERE ticker = 'B'",
+        lambda: store.move_ticker('D', 0)
+    )
+
+    assert attempts == ['locked']
+    assert store.read_ticker_list() == ['D', 'A', 'B', 'C']
+    positions = [row[0] for row in store._connect().execute("SELECT position FROM watchlist ORDER BY position")]
+    assert positions == [0, 1, 2, 3]
+
+
+def test_import_is_a_single_transaction(store):
+    store.import_tickers(['A', 'B'])
+
+    # Another session tries to append a ticker after the last position was read
+    attempts = write_during(
+        store, "SELECT COALESCE(MAX(position)",
+        "INSERT INTO watchlist (user_id, ticker, position) VALUES ('default', 'X', 2)",
+        lambda: store.import_tickers(['C', 'D'])
+    )
+
+    assert attempts == ['locked']
+    positions = [row[0] for row in store._connect().execute("SELECT position FROM watchlist ORDER BY position")]
+    assert positions == [0, 1, 2, 3]
+
+
+def test_migration_is_a_single_transaction(store, tmp_path):
+    json_file = tmp_path / 'old.json'
+    json_file.write_text(json.dumps(['MSFT', 'GOOGL']))
+
+    # Another process tries to record the same migration after it was checked
+    attempts = write_during(
+        store, "SELECT 1 FROM migrations",
+        f"INSERT INTO migrations (source) VALUES ('{json_file}')",
+        lambda: store.migrate_from_json(str(json_file))
+    )
+
+    assert attempts == ['locked']
+    assert store.read_ticker_list() == ['MSFT', 'GOOGL']
+
+
+def test_tags(store):
+    store.import_tickers(['MSFT', 'JNJ', 'GOOGL'])
+    store.set_tags('MSFT', ['tech', 'dividend'])
+    store.set_tags('GOOGL', ['tech'])
+    assert store.get_tags('MSFT') == ['dividend', 'tech']
+    assert store.tickers_by_tag('tech') == ['MSFT', 'GOOGL']
+
+    # The tags are deleted together with the ticker
+    store.delete_ticker('MSFT')
+    assert store.tickers_by_tag('tech') == ['GOOGL']
+
+
+def test_bulk_import_and_export(store):
+    assert store.import_tickers(['MSFT', 'JNJ'], user='alice') == 2
+    assert store.import_tickers(['JNJ', 'GOOGL'], user='alice') == 1
+    store.set_tags('JNJ', ['health'], user='alice')
+
+    assert store.export() == {'alice': [
+        {'ticker': 'MSFT', 'tags': []},
+        {'ticker': 'JNJ', 'tags': ['health']},
+        {'ticker': 'GOOGL', 'tags': []},
+    ]}
+
+
+def test_migrate_from_json_once(store, tmp_path):
+    json_file = tmp_path / 'old.json'
+    json_file.write_text(json.dumps(['MSFT', 'GOOGL']))
+
+    assert store.migrate_from_json(str(json_file)) == 2
+    store.delete_ticker('MSFT')
+    assert store.migrate_from_json(str(json_file)) == 0
+    assert store.read_ticker_list() == ['GOOGL']
+
+
+def test_json_io_uses_sqlite_store(tmp_path):
+    (tmp_path / 'tickers.json').write_text(json.dumps(['JNJ']))
+    ticker_file = str(tmp_path / 'tickers.db')
+
+    # The JSON file with the same name is migrated on the first use
+    assert read_ticker_list(ticker_file) == ['JNJ']
+    add_ticker(ticker_file, 'msft')
+    assert check_ticker_on_list(ticker_file, 'MSFT') == True
+    assert delete_ticker(ticker_file, 'JNJ') == True
+    assert read_ticker_list(ticker_file) == ['MSFT']
+    assert WatchlistStore(ticker_file).read_ticker_list() == ['MSFT']
@@ -0,0 +1,108 @@
+"""
+Module containing the timeouts of the outbound calls and the deadline budget of a page.
+
+Every Polygon and yfinance request gets a connect and a read timeout (HTTP_CONNECT_TIMEOUT,
+HTTP_READ_TIMEOUT), so a stuck socket can't pin a Streamlit worker. On top of that the page
+has a deadline (PAGE_DEADLINE seconds): the calls made for the page are cut to the rest of
+its budget, and they aren't started at all once it has run out. The loads which can't finish
+in time go on in the background (src.warmer.PageLoader), and the page shows the sections
+which are ready.
+
+The deadline is kept in a context variable, so it only applies to the thread rendering the
+page. The background loads are limited by the timeouts and the retry deadline only.
+
+An example of usage:
+
+with page_deadline(8):
+    ...
+    timeout = request_timeout()   # (connect, read) seconds, at most the rest of the budget
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from os import getenv
+from typing import Iterator, Optional
+from dotenv import load_dotenv
+
+
+load_dotenv()
+CONNECT_TIMEOUT: float = float(getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT: float = float(getenv("HTTP_READ_TIMEOUT", 15))
+PAGE_DEADLINE: float = float(getenv("PAGE_DEADLINE", 8))
+
+
+class DeadlineExceededError(Exception):
+    def __init__(self, message="The deadline of the page has run out"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class Deadline:
+
+    """
+    A point in time (time.monotonic) by which the work has to be done.
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds: float = seconds
+        self.expires_at: float = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar('current_deadline', default=None)
+
+
+@contextmanager
+def page_deadline(seconds: float = PAGE_DEADLINE) -> Iterator[Deadline]:
+    """
+    Set the deadline of the calls made in the block.
+    """
+
+    deadline = Deadline(seconds)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """
+    The seconds left of the current deadline, or None if there's no deadline.
+    """
+
+    deadline = _current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def check_deadline() -> None:
+    """
+    Raise DeadlineExceededError if the current deadline has run out.
+    """
+
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceededError()
+
+
+def request_timeout() -> tuple[float, float]:
+    """
+    The (connect, read) timeouts of the next request, cut to the rest of the current deadline.
+    Raises DeadlineExceededError if the deadline has already run out.
+    """
+
+    check_deadline()
+    left = remaining()
+    if left is None:
+        return (CONNECT_TIMEOUT, READ_TIMEOUT)
+    return (min(CONNECT_TIMEOUT, left), min(READ_TIMEOUT, left))
@@ -0,0 +1,374 @@
+"""
+Module containing lightweight timing spans of the data loading and rendering stages.
+
+Every PolygonAPI/PriceAPI call, DataProcessor getter and chart builder runs in a span.
+The spans are
+    - aggregated per page request (a Trace), for the debug panel of the sidebar,
+    - added to the process-wide MetricsRegistry, exported in the Prometheus text format,
+    - logged as a single JSON line per request (logger 'src.tracing').
+
+The stage of a span is the first part of its name (e.g. 'polygon' of 'polygon.get_news').
+The stage totals use the self time of the spans (the time of their child spans is
+subtracted), so nested spans aren't counted twice.
+
+An example of usage:
+
+with trace('page') as request:
+    with span('polygon.get_news'):
+        ...
+request.summary()
+"""
+
+import bisect
+import functools
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (in seconds) of the Prometheus histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = 'stock_dashboard'
+
+
+class SpanRecord:
+
+    """A finished (or running) span."""
+
+    __slots__ = ('name', 'stage', 'duration', 'child_time', 'error')
+
+    def __init__(self, name: str, stage: str) -> None:
+        self.name = name
+        self.stage = stage
+        self.duration: float = 0.0
+        self.child_time: float = 0.0
+        self.error: bool = False
+
+    @property
+    def self_time(self) -> float:
+        return max(self.duration - self.child_time, 0.0)
+
+
+class Trace:
+
+    """
+    The spans of a single page request.
+    """
+
+    def __init__(self, name: str = 'page') -> None:
+
+        self.name: str = name
+        self.id: str = uuid.uuid4().hex[:12]
+        self.started_at: float = time.time()
+        self.wall_time: Optional[float] = None
+        self.spans: list[SpanRecord] = []
+        self._lock = threading.Lock()
+
+
+    def add(self, record: SpanRecord) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Aggregate the spans by name and by stage. The times are in milliseconds.
+        The wall time of a running trace is the time elapsed so far.
+        """
+
+        wall_time = self.wall_time if self.wall_time is not None else time.time() - self.started_at
+
+        with self._lock:
+            spans = list(self.spans)
+
+        by_name: dict[str, dict[str, Any]] = {}
+        by_stage: dict[str, float] = {}
+        for record in spans:
+            item = by_name.setdefault(
+                record.name,
+                {'stage': record.stage, 'count': 0, 'total_ms': 0.0, 'self_ms': 0.0, 'errors': 0}
+            )
+            item['count'] += 1
+            item['total_ms'] += record.duration * 1000
+            item['self_ms'] += record.self_time * 1000
+            item['errors'] += int(record.error)
+            by_stage[record.stage] = by_stage.get(record.stage, 0.0) + record.self_time * 1000
+
+        for item in by_name.values():
+            item['total_ms'] = round(item['total_ms'], 2)
+            item['self_ms'] = round(item['self_ms'], 2)
+
+        return {
+            'trace_id': self.id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'wall_ms': round(wall_time * 1000, 2),
+            'stages': {stage: round(value, 2) for stage, value in sorted(by_stage.items(), key=lambda item: -item[1])},
+            'spans': dict(sorted(by_name.items(), key=lambda item: -item[1]['total_ms'])),
+        }
+
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary())
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Series:
+
+    """The histogram of a single span name."""
+
+    __slots__ = ('buckets', 'count', 'sum', 'errors')
+
+    def __init__(self, bucket_count: int) -> None:
+        self.buckets: list[int] = [0] * (bucket_count + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.errors: int = 0
+
+
+class MetricsRegistry:
+
+    """
+    Process-wide histograms of the span durations.
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+
+        self.buckets: tuple = buckets
+        self._series: dict[tuple[str, str], _Series] = {}
+        self._collectors: list[Callable[[], str]] = []
+        self._lock = threading.Lock()
+
+
+    def add_collector(self, collector: Callable[[], str]) -> None:
+        """
+        Add a function returning more metrics in the Prometheus text format (e.g. the circuit breakers).
+        """
+
+        with self._lock:
+            self._collectors.append(collector)
+
+
+    def observe(self, name: str, stage: str, duration: float, error: bool = False) -> None:
+
+        key = (name, stage)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+
+            # The counts are stored per bucket (the last one is +Inf) and accumulated on export
+            series.buckets[bisect.bisect_left(self.buckets, duration)] += 1
+            series.count += 1
+            series.sum += duration
+            if error:
+                series.errors += 1
+
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Export the series as a JSON serializable dict.
+        """
+
+        with self._lock:
+            return {
+                name: {
+                    'stage': stage,
+                    'count': series.count,
+                    'sum_seconds': round(series.sum, 6),
+                    'errors': series.errors,
+                    'buckets': dict(zip((str(bound) for bound in self.buckets), itertools.accumulate(series.buckets))),
+                }
+                for (name, stage), series in sorted(self._series.items())
+            }
+
+
+    def to_prometheus(self) -> str:
+        """
+        Export the series in the Prometheus text exposition format.
+        """
+
+        duration = f'{METRIC_PREFIX}_span_duration_seconds'
+        errors = f'{METRIC_PREFIX}_span_errors_total'
+
+        lines = [
+            f'# HELP {duration} Duration of the data loading and rendering spans.',
+            f'# TYPE {duration} histogram',
+        ]
+        error_lines = [
+            f'# HELP {errors} Number of the spans which raised an exception.',
+            f'# TYPE {errors} counter',
+        ]
+
+        with self._lock:
+            for (name, stage), series in sorted(self._series.items()):
+                labels = f'span="{_escape(name)}",stage="{_escape(stage)}"'
+                for bound, count in zip(self.buckets, itertools.accumulate(series.buckets)):
+                    lines.append(f'{duration}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{duration}_bucket{{{labels},le="+Inf"}} {series.count}')
+                lines.append(f'{duration}_sum{{{labels}}} {series.sum:.6f}')
+                lines.append(f'{duration}_count{{{labels}}} {series.count}')
+                error_lines.append(f'{errors}{{{labels}}} {series.errors}')
+            collectors = list(self._collectors)
+
+        return '\n'.join(lines + error_lines) + '\n' + ''.join(collector() for collector in collectors)
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+_span_stack: ContextVar[tuple] = ContextVar('span_stack', default=())
+
+
+def current_trace() -> Optional[Trace]:
+    """
+    Return the trace of the current request, if there's one.
+    """
+
+    return _current_trace.get()
+
+
+class span:
+
+    """
+    Context manager timing the block. The stage defaults to the first part of the name.
+    It's a plain class (not a generator based context manager) to keep the overhead low,
+    as every getter call runs in a span.
+    """
+
+    __slots__ = ('record', '_parent', '_token', '_start')
+
+    def __init__(self, name: str, stage: Optional[str] = None) -> None:
+        self.record = SpanRecord(name, stage or name.split('.', 1)[0])
+
+
+    def __enter__(self) -> SpanRecord:
+        stack = _span_stack.get()
+        self._parent = stack[-1] if stack else None
+        self._token = _span_stack.set(stack + (self.record,))
+        self._start = time.perf_counter()
+        return self.record
+
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        record = self.record
+        record.duration = time.perf_counter() - self._start
+        record.error = exc_type is not None
+        _span_stack.reset(self._token)
+        if self._parent is not None:
+            self._parent.child_time += record.duration
+
+        REGISTRY.observe(record.name, record.stage, record.duration, record.error)
+        request = _current_trace.get()
+        if request is not None:
+            request.add(record)
+
+
+def traced(name: str, stage: Optional[str] = None) -> Callable:
+    """
+    Decorator running the function in a span.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace(name: str = 'page') -> Iterator[Trace]:
+    """
+    Collect the spans of a request. At the end the request is logged as a JSON line
+    and its wall time is added to the registry (stage 'request').
+    """
+
+    request = Trace(name)
+    token = _current_trace.set(request)
+    start = time.perf_counter()
+
+    try:
+        yield request
+    finally:
+        request.wall_time = time.perf_counter() - start
+        _current_trace.reset(token)
+        REGISTRY.observe(name, 'request', request.wall_time)
+        logger.info(request.to_json())
+
+
+@contextmanager
+def attach_trace(request: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """
+    Collect the spans of the block into the given trace, e.g. in a worker thread of the request.
+    """
+
+    token = _current_trace.set(request)
+    try:
+        yield request
+    finally:
+        _current_trace.reset(token)
+
+
+def configure_json_log(file: str) -> logging.Handler:
+    """
+    Write the JSON lines of the requests to the given file.
+    """
+
+    handler = logging.FileHandler(file)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+def start_metrics_server(port: int, registry: MetricsRegistry = REGISTRY, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """
+    Serve the registry in a daemon thread: /metrics in the Prometheus format, /metrics.json as JSON.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self) -> None:
+            if self.path == '/metrics':
+                body = registry.to_prometheus().encode()
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/metrics.json':
+                body = json.dumps(registry.to_dict()).encode()
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # The scrapes aren't logged
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
@@ -0,0 +1,321 @@
+"""
+Module containing the background loading of the tickers.
+
+Without it the first selection of every ticker pays the whole loading time. The
+CacheWarmer loads the saved tickers one by one in a daemon thread, using only the
+spare capacity of the Polygon rate limiter, so the page's own requests aren't
+starved.
+
+The PageLoader loads the ticker of a page in a worker thread, so the page waits only
+until its deadline (src.timeouts). A load which doesn't finish in time goes on and
+puts its result into the cache, while the page shows the parts loaded so far.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Iterable, Optional
+
+from src.cache import BundleCache
+from src.polygon_api import LimitReachedError
+from src.rate_limit import RateLimiter
+from src.tracing import Trace, attach_trace, current_trace
+
+
+logger = logging.getLogger(__name__)
+
+# PolygonAPI requests made by loading a single ticker (details, financials, news)
+POLYGON_CALLS_PER_TICKER = 3
+
+
+class CacheWarmer:
+
+    """
+    Loads the enqueued tickers into the cache in a background thread.
+
+    Args:
+        cache: The cache to fill.
+        loader: Function loading the data of a ticker (the same one the page uses).
+        rate_limiter: The shared Polygon rate limiter. The warmer only starts a ticker
+            when there is enough free capacity for all of its requests.
+        should_warm: Optional filter, e.g. to skip tickers which have been deleted since.
+        retry_delay: Seconds to wait before retrying a ticker after hitting the API limit.
+        loader_caches: The loader puts the data into the cache itself (e.g. PageLoader.load, with
+            the short ttl of the degraded data), the warmer only calls it.
+
+    An example of usage:
+
+    warmer = CacheWarmer(cache, load_function, rate_limiter)
+    warmer.start()
+    warmer.enqueue_many(read_ticker_list(TICKER_FILE))
+    """
+
+    def __init__(
+        self,
+        cache: BundleCache,
+        loader: Callable[[str], Any],
+        rate_limiter: RateLimiter,
+        should_warm: Optional[Callable[[str], bool]] = None,
+        retry_delay: float = 60,
+        loader_caches: bool = False
+    ) -> None:
+
+        self.cache: BundleCache = cache
+        self.loader = loader
+        self.rate_limiter: RateLimiter = rate_limiter
+        self.should_warm = should_warm
+        self.retry_delay: float = retry_delay
+        self.loader_caches: bool = loader_caches
+
+        self._queue: queue.Queue[str] = queue.Queue()
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._warmed: int = 0
+        self._skipped: int = 0
+        self._failed: dict[str, str] = {}
+
+
+    def start(self) -> None:
+        """
+        Start the background thread (only once).
+        """
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+            self._thread.start()
+
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background thread after the current ticker.
+        """
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+    def enqueue(self, ticker: str) -> None:
+        """
+        Add a ticker to the queue, if it isn't waiting there already.
+        """
+
+        with self._lock:
+            if ticker in self._pending:
+                return
+            self._pending.add(ticker)
+        self._queue.put(ticker)
+
+
+    def enqueue_many(self, tickers: Iterable[str]) -> None:
+        for ticker in tickers:
+            self.enqueue(ticker)
+
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the queue is empty. Returns False if the timeout has passed.
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+
+    def _wait_for_capacity(self) -> bool:
+        """
+        Wait until every request of a ticker fits into the rate limit. Returns False if stopped.
+        """
+
+        needed = min(POLYGON_CALLS_PER_TICKER, self.rate_limiter.max_calls)
+        while self.rate_limiter.available() < needed:
+            if self._stop.wait(0.5):
+                return False
+        return True
+
+
+    def _warm(self, ticker: str) -> bool:
+        """
+        Load a single ticker into the cache. Returns True if it has been put back to the queue.
+        """
+
+        if ticker in self.cache or (self.should_warm is not None and not self.should_warm(ticker)):
+            self._skipped += 1
+            return False
+
+        if not self._wait_for_capacity():
+            return False
+
+        try:
+            if self.loader_caches:
+                self.loader(ticker)
+            else:
+                self.cache.get_or_load(ticker, self.loader)
+            self._warmed += 1
+            self._failed.pop(ticker, None)
+        except LimitReachedError:
+            # Put it back to the end of the queue and give the API some rest
+            logger.warning("API limit reached while warming %s, retrying later", ticker)
+            self._stop.wait(self.retry_delay)
+            self._queue.put(ticker)
+            return True
+        except Exception as error:
+            logger.warning("Failed to warm %s: %s", ticker, error)
+            self._failed[ticker] = repr(error)
+
+        return False
+
+
+    def _run(self) -> None:
+
+        while not self._stop.is_set():
+            try:
+                ticker = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            requeued = self._warm(ticker)
+            if not requeued:
+                with self._lock:
+                    self._pending.discard(ticker)
+
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the progress of the warmer.
+        """
+
+        with self._lock:
+            return {
+                'queued': len(self._pending),
+                'warmed': self._warmed,
+                'skipped': self._skipped,
+                'failed': dict(self._failed),
+            }
+
+
+class PageLoader:
+
+    """
+    Loads the tickers of the pages into the cache in worker threads.
+
+    Args:
+        cache: The cache of the loaded tickers.
+        loader: Function loading the data of a ticker. It gets a dict as well, where it
+            puts the API objects as soon as they are created, so the parts loaded so far
+            can be shown before the whole ticker is loaded.
+        partial: Function creating the (incomplete) data from that dict, or None if there's nothing yet.
+        max_workers: The number of the tickers loaded at the same time.
+        degraded: Optional function telling if the loaded data is degraded (e.g. a source was down).
+        degraded_ttl: Seconds a degraded data is cached for, so it's reloaded soon.
+
+    An example of usage:
+
+    loader = PageLoader(cache, load_function, partial_function)
+    data, complete = loader.load('MSFT', timeout=remaining())
+    """
+
+    def __init__(
+        self,
+        cache: BundleCache,
+        loader: Callable[[str, dict], Any],
+        partial: Callable[[dict], Any],
+        max_workers: int = 4,
+        degraded: Optional[Callable[[Any], bool]] = None,
+        degraded_ttl: float = 30.0
+    ) -> None:
+
+        self.cache: BundleCache = cache
+        self.loader = loader
+        self.partial = partial
+        self.degraded = degraded
+        self.degraded_ttl: float = degraded_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='page-loader')
+        self._jobs: dict[str, tuple[Future, dict]] = {}
+        self._lock = threading.Lock()
+
+        self._completed: int = 0
+        self._timeouts: int = 0
+        self._degraded: int = 0
+
+
+    def _load(self, ticker: str, parts: dict, request: Optional[Trace]) -> Any:
+
+        # The loads are deduplicated by the jobs, so the cache's own locks aren't needed
+        # (e.g. the CacheWarmer can load through the PageLoader)
+        try:
+            # The API spans go to the trace of the page which started the load. Only the trace
+            # is passed, not the whole context: the page's deadline doesn't apply to the load.
+            with attach_trace(request):
+                data = self.loader(ticker, parts)
+            if self.degraded is not None and self.degraded(data):
+                with self._lock:
+                    self._degraded += 1
+                self.cache.put(ticker, data, ttl=self.degraded_ttl)
+            else:
+                self.cache.put(ticker, data)
+            return data
+        finally:
+            with self._lock:
+                self._jobs.pop(ticker, None)
+
+
+    def load(self, ticker: str, timeout: Optional[float] = None) -> tuple[Any, bool]:
+        """
+        Return the data of the ticker and whether it's complete. If the ticker isn't loaded
+        within the timeout, its partial data is returned (None if nothing has been loaded yet)
+        and the load goes on in the background. The errors of the load are raised.
+        """
+
+        cached = self.cache.get(ticker)
+        if cached is not None:
+            return cached, True
+
+        with self._lock:
+            job = self._jobs.get(ticker)
+            if job is None:
+                parts: dict = {}
+                future = self._executor.submit(self._load, ticker, parts, current_trace())
+                job = self._jobs[ticker] = (future, parts)
+
+        future, parts = job
+        try:
+            data = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            return self.partial(parts), False
+
+        with self._lock:
+            self._completed += 1
+        return data, True
+
+
+    def is_loading(self, ticker: str) -> bool:
+        with self._lock:
+            return ticker in self._jobs
+
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get the number of the loads in progress, the pages which ran out of their deadline
+        and the degraded loads.
+        """
+
+        with self._lock:
+            return {
+                'loading': sorted(self._jobs),
+                'completed': self._completed,
+                'timeouts': self._timeouts,
+                'degraded': self._degraded,
+            }
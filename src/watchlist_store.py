@@ -0,0 +1,317 @@
+"""
+SQLite backed storage of the saved tickers.
+
+It offers the same operations as the src.json_io module, but every user has
+its own watchlist with an explicit ordering and optional tags. The lookups
+are served by indexes, so the store stays fast with many users and long lists.
+
+The src.json_io functions use this store automatically if the ticker file has a
+SQLite extension (e.g. TICKER_FILE = "src/tickers.db"). The existing JSON list
+can be migrated with:
+
+    python -m src.watchlist_store migrate src/tickers.json src/tickers.db
+
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterable, Optional
+
+
+DEFAULT_USER = 'default'
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist (
+    user_id TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    added_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, ticker)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_watchlist_user_position ON watchlist (user_id, position);
+
+CREATE TABLE IF NOT EXISTS tags (
+    user_id TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (user_id, ticker, tag),
+    FOREIGN KEY (user_id, ticker) REFERENCES watchlist (user_id, ticker) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_tags_user_tag ON tags (user_id, tag);
+
+CREATE TABLE IF NOT EXISTS migrations (
+    source TEXT PRIMARY KEY,
+    migrated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+class WatchlistStore:
+
+    """
+    Per-user watchlists stored in a SQLite database.
+
+    Every thread gets its own connection. The database runs in WAL mode, so readers
+    don't block the writer.
+
+    An example of usage:
+
+    store = WatchlistStore('src/tickers.db')
+    store.add_ticker('MSFT', user='alice')
+    store.set_tags('MSFT', ['tech'], user='alice')
+    store.read_ticker_list(user='alice')
+    """
+
+    def __init__(self, db_file: str) -> None:
+
+        self.db_file: str = db_file
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return the connection of the current thread.
+        """
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+
+    def read_ticker_list(self, user: str = DEFAULT_USER) -> list:
+        """
+        Get the tickers of the user in their order.
+        """
+
+        rows = self._connect().execute(
+            "SELECT ticker FROM watchlist WHERE user_id = ? ORDER BY position",
+            (user,)
+        )
+        return [row[0] for row in rows]
+
+
+    def add_ticker(self, ticker_to_add: str, user: str = DEFAULT_USER) -> None:
+        """
+        Add the ticker to the end of the user's list, if it's not on it yet.
+        """
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO watchlist (user_id, ticker, position)
+                SELECT ?, ?, COALESCE(MAX(position) + 1, 0) FROM watchlist WHERE user_id = ?
+                """,
+                (user, ticker_to_add.upper(), user)
+            )
+
+
+    def delete_ticker(self, ticker_to_delete: str, user: str = DEFAULT_USER) -> bool:
+        """
+        Delete the ticker (and its tags) from the user's list. Returns False if it wasn't on it.
+        """
+
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM watchlist WHERE user_id = ? AND ticker = ?",
+                (user, ticker_to_delete)
+            )
+        return cursor.rowcount > 0
+
+
+    def check_ticker_on_list(self, ticker: str, user: str = DEFAULT_USER) -> bool:
+        """
+        Check if the ticker is on the user's list.
+        """
+
+        row = self._connect().execute(
+            "SELECT 1 FROM watchlist WHERE user_id = ? AND ticker = ?",
+            (user, ticker)
+        ).fetchone()
+        return row is not None
+
+
+    def move_ticker(self, ticker: str, new_position: int, user: str = DEFAULT_USER) -> None:
+        """
+        Move the ticker to the given (0 based) position of the user's list.
+        """
+
+        # The read and the updates are a single write transaction, so the concurrent moves don't interleave
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT ticker FROM watchlist WHERE user_id = ? ORDER BY position",
+                (user,)
+            )
+            tickers = [row[0] for row in rows]
+            if ticker not in tickers:
+                raise KeyError(f"{ticker} is not on the list of {user}")
+
+            tickers.remove(ticker)
+            tickers.insert(new_position, ticker)
+
+            conn.executemany(
+                "UPDATE watchlist SET position = ? WHERE user_id = ? AND ticker = ?",
+                [(position, user, item) for position, item in enumerate(tickers)]
+            )
+
+
+    def set_tags(self, ticker: str, tags: Iterable[str], user: str = DEFAULT_USER) -> None:
+        """
+        Replace the tags of the ticker on the user's list.
+        """
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tags WHERE user_id = ? AND ticker = ?", (user, ticker))
+            conn.executemany(
+                "INSERT OR IGNORE INTO tags (user_id, ticker, tag) VALUES (?, ?, ?)",
+                [(user, ticker, tag) for tag in tags]
+            )
+
+
+    def get_tags(self, ticker: str, user: str = DEFAULT_USER) -> list:
+        """
+        Get the tags of the ticker on the user's list.
+        """
+
+        rows = self._connect().execute(
+            "SELECT tag FROM tags WHERE user_id = ? AND ticker = ? ORDER BY tag",
+            (user, ticker)
+        )
+        return [row[0] for row in rows]
+
+
+    def tickers_by_tag(self, tag: str, user: str = DEFAULT_USER) -> list:
+        """
+        Get the tickers of the user which have the given tag, in the order of the list.
+        """
+
+        rows = self._connect().execute(
+            """
+            SELECT w.ticker FROM tags t
+            JOIN watchlist w ON w.user_id = t.user_id AND w.ticker = t.ticker
+            WHERE t.user_id = ? AND t.tag = ?
+            ORDER BY w.position
+            """,
+            (user, tag)
+        )
+        return [row[0] for row in rows]
+
+
+    def import_tickers(self, tickers: Iterable[str], user: str = DEFAULT_USER) -> int:
+        """
+        Append many tickers to the user's list in a single transaction.
+        Returns the number of the new tickers.
+        """
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._append(conn, tickers, user)
+
+
+    @staticmethod
+    def _append(conn: sqlite3.Connection, tickers: Iterable[str], user: str) -> int:
+        """
+        Append the tickers after the last position of the user's list, in the open write transaction.
+        """
+
+        start = conn.execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM watchlist WHERE user_id = ?",
+            (user,)
+        ).fetchone()[0]
+
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO watchlist (user_id, ticker, position) VALUES (?, ?, ?)",
+            [(user, ticker.upper(), start + i) for i, ticker in enumerate(tickers)]
+        )
+        return conn.total_changes - before
+
+
+    def export(self, user: Optional[str] = None) -> dict[str, list[dict]]:
+        """
+        Export the watchlists (of every user, or the given one) with their tags.
+        """
+
+        query = """
+            SELECT w.user_id, w.ticker, GROUP_CONCAT(t.tag)
+            FROM watchlist w
+            LEFT JOIN tags t ON t.user_id = w.user_id AND t.ticker = w.ticker
+            {where}
+            GROUP BY w.user_id, w.ticker
+            ORDER BY w.user_id, w.position
+        """
+        if user is None:
+            rows = self._connect().execute(query.format(where=''))
+        else:
+            rows = self._connect().execute(query.format(where='WHERE w.user_id = ?'), (user,))
+
+        result: dict[str, list[dict]] = {}
+        for user_id, ticker, tags in rows:
+            result.setdefault(user_id, []).append({
+                'ticker': ticker,
+                'tags': sorted(tags.split(',')) if tags else []
+            })
+        return result
+
+
+    def migrate_from_json(self, json_file: str, user: str = DEFAULT_USER) -> int:
+        """
+        Import the tickers of a src.json_io file once. Calling it again with the same
+        file doesn't do anything. Returns the number of the imported tickers.
+        """
+
+        source = os.path.abspath(json_file)
+
+        with open(json_file, 'r') as file:
+            tickers = json.load(file)
+
+        # The check, the import and the marker are a single write transaction, so a file is imported once
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone():
+                return 0
+
+            imported = self._append(conn, tickers, user)
+            conn.execute("INSERT OR IGNORE INTO migrations (source) VALUES (?)", (source,))
+        return imported
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Manage the SQLite watchlist store.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help="Import a JSON ticker list once.")
+    migrate.add_argument('json_file')
+    migrate.add_argument('db_file')
+    migrate.add_argument('--user', default=DEFAULT_USER)
+
+    export = subparsers.add_parser('export', help="Print the watchlists as JSON.")
+    export.add_argument('db_file')
+    export.add_argument('--user', default=None)
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        imported = WatchlistStore(args.db_file).migrate_from_json(args.json_file, args.user)
+        print(f"{imported} tickers imported")
+    else:
+        print(json.dumps(WatchlistStore(args.db_file).export(args.user), indent=2))
+
+
+if __name__ == '__main__':
+    main()